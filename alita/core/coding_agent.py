@@ -1,5 +1,4 @@
 import json
-import inspect
 import logging
 import re
 from typing import Any, Awaitable, Callable, List, Optional, Dict
@@ -9,10 +8,14 @@ from langchain_core.messages.ai import AIMessage
 from langchain_core.messages.tool import ToolCall
 from langchain_openai import ChatOpenAI
 
+from alita.core.tool_catalog import get_tool_catalog
+from alita.core.tool_executor import ToolExecutor
 from alita.core.tools.files.observation import Observation
 from alita.core.tools.finish_observations import FinishObservation
-from alita.core.utils import FUNCTION_REGISTRY
-from alita.core.prompts.coding_agent_prompt import SYSTEM_PROMPT_TEMPLATE, SYSTEM_PREFIX, RUNNING_EXAMPLE
+from alita.core.tools.tmux_session_pool import sticky_shell as sticky_shell_scope
+from alita.core.prompts.coding_agent_prompt import TASK_PROMPT_TEMPLATE
+from alita.memory.compaction import ContextCompactor
+from alita.memory.conversation import CONTINUE_PROMPT, Conversation
 
 
 logger = logging.getLogger(__name__)
@@ -42,76 +45,48 @@ class CodingAgent():
         model_client: ChatOpenAI,
         tools: List[Callable[..., Any] | Callable[..., Awaitable[Any]]] | None = None,
         memory: Optional[Memory] = None,
+        sticky_shell: bool = False,
+        tool_executor: Optional[ToolExecutor] = None,
+        parallel_tool_calls: bool = True,
+        compactor: Optional[ContextCompactor] = None,
         ) -> None:
         
-        self._model_client = model_client.bind_tools(tools)
-        
-        if tools:
-            self._tools_prompt = self._construct_tools_prompt(tools)
+        # Prompts and tool schemas are built once per tool set and shared between agents
+        self._tool_catalog = get_tool_catalog(tools)
+        self._model_client = self._tool_catalog.bind(model_client)
 
         self._iter_count = 0
+        # Keep cwd and env of bash commands across one run instead of a clean shell per command
+        self._sticky_shell = sticky_shell
+        # Sync tools run on a shared thread pool so the event loop stays free for other agents
+        self._tool_executor = tool_executor or ToolExecutor()
+        # Run all tool calls of one LLM turn concurrently where safe, instead of one after another
+        self._parallel_tool_calls = parallel_tool_calls
+        # Keeps the prompt within a token budget on long runs
+        self._compactor = compactor or ContextCompactor()
         
 
-    def _construct_tools_prompt(self, tools: List[Callable[..., Any] | Callable[..., Awaitable[Any]]]) -> str:
-        tool_prompt = "You have access to following functions/tools:\n\n"
-        index = 0
-        for tool in tools:
-            index += 1
-            tool_prompt += f"---- BEGIN FUNCTION #{index} {tool.__name__} ----\n"
-            tool_prompt += tool.__doc__
-            tool_prompt += f"\n---- END FUNCTION #{index} ----\n\n"
-
-        return tool_prompt
+    def _construct_system_prompt(self) -> str:
+        return self._tool_catalog.system_prompt
 
-    def _construct_full_prompt(self, task: str) -> str:
-        return SYSTEM_PROMPT_TEMPLATE.format(prefix=SYSTEM_PREFIX, tools=self._tools_prompt, example=RUNNING_EXAMPLE, task=task)
+    def _construct_task_prompt(self, task: str) -> str:
+        return TASK_PROMPT_TEMPLATE.format(task=task)
 
 
-    def _call_llm(self) -> AIMessage:
-        return self._model_client.invoke(self._full_system_prompt)
+    async def _call_llm(self) -> AIMessage:
+        return await self._model_client.ainvoke(self._conversation.render())
 
 
-    def _execute_function_call(self,tool_call: ToolCall) -> Observation:
+    async def _execute_function_call(self, tool_call: ToolCall) -> Observation:
         """Execute a function call from the LLM response.
         
         Args:
             tool_call: Dictionary containing function call information
             
         Returns:
-            str: Result of the function execution
+            Observation: Result of the function execution
         """
-        try:
-            # Extract function name and arguments
-            func_name = tool_call.name
-            args = tool_call.args
-            
-            # Get the function from registry
-            func = FUNCTION_REGISTRY.get(func_name)
-            
-            if not func:
-                return f"Error: Function '{func_name}' not found in registry"
-            
-            # Get the function's parameter types
-            sig = inspect.signature(func)
-            params = sig.parameters
-            
-            # Convert arguments to the correct types
-            typed_args = {}
-            for param_name, param in params.items():
-                if param_name in args:
-                    param_type = param.annotation
-                    if param_type != inspect.Parameter.empty:
-                        # Convert to the correct type
-                        typed_args[param_name] = param_type(args[param_name])
-                    else:
-                        typed_args[param_name] = args[param_name]
-            
-            # Call the function with the typed arguments
-            result = func(**typed_args)
-            return result
-            
-        except Exception as e:
-            return Observation(content=f"Error executing function call: {str(e)}")
+        return await self._tool_executor.execute(tool_call.name, tool_call.args)
     
 
     def _parse_tool_call_in_llm_content(self, llm_output: AIMessage) -> List[ToolCall] | None:
@@ -161,55 +136,69 @@ class CodingAgent():
             return self._parse_tool_call_in_llm_content(llm_output)
 
 
-    def _handle_tool_calls(self, llm_output: AIMessage) -> Observation | None:
+    async def _handle_tool_calls(self, llm_output: AIMessage) -> List[tuple[ToolCall, Observation]]:
         tool_calls = self._get_tool_calls(llm_output)
-        if tool_calls:
-            # confirm should only have one tool call per time
-            if len(tool_calls) > 1:
-                logger.warning("Multiple tool calls detected. Only the first tool call will be executed.")
-            tool_call = tool_calls[0]
-            observation = self._execute_function_call(tool_call)
-            logger.info(f"\nFunction call result: {observation}")
-
-            # self._full_system_prompt += f"{observation}\n\n" + "-"*20 + "\n\n"
-            return observation
-        
-        return None
+        if not tool_calls:
+            return []
+
+        if self._parallel_tool_calls and len(tool_calls) > 1:
+            # independent calls run concurrently, conflicting ones in the order given
+            observations = await self._tool_executor.execute_many(
+                [(tool_call.name, tool_call.args) for tool_call in tool_calls]
+            )
+        else:
+            observations = []
+            for tool_call in tool_calls:
+                observations.append(await self._execute_function_call(tool_call))
+
+        results = list(zip(tool_calls, observations))
+        for tool_call, observation in results:
+            logger.info(f"\nFunction call result [{tool_call.id}]: {observation}")
+        return results
 
     
     async def run(self, message: str) -> None:
+        if self._sticky_shell:
+            with sticky_shell_scope():
+                return await self._run(message)
+        return await self._run(message)
+
+
+    async def _run(self, message: str) -> None:
         logger.info(f"Received message: {message}")
         
-        self._full_system_prompt = self._construct_full_prompt(task=message) + "-"*20 + "\n\n"
+        self._conversation = Conversation()
+        self._conversation.add_system(self._construct_system_prompt())
+        self._conversation.add_user(self._construct_task_prompt(task=message))
         
         while True:
             self._iter_count += 1
             print(f'----- Iteration {self._iter_count} -----')
             logger.info(f'----- Iteration {self._iter_count} -----')
-            logger.info(f"Full system prompt: {self._full_system_prompt}")
+            # only what was added since the previous turn
+            self._conversation.log_delta()
+            self._compactor.compact(self._conversation)
+            logger.info(f"Prompt size: {self._conversation.total_tokens} tokens in {len(self._conversation)} messages")
 
             ### - call LLM
-            llm_output: AIMessage = self._call_llm()
-            logger.info(f"LLM Result: {llm_output}")
+            llm_output: AIMessage = await self._call_llm()
+            self._conversation.add_assistant(llm_output)
             
             ### - call tool
-            observation: Observation | None = self._handle_tool_calls(llm_output)
+            results = await self._handle_tool_calls(llm_output)
             
             ### - check whether terminate
-            if isinstance(observation, FinishObservation):
-                logger.info(f"Final Output:\n {observation}")
+            finish_observation = next((o for _, o in results if isinstance(o, FinishObservation)), None)
+            if finish_observation:
+                self._conversation.log_delta()
+                logger.info(f"Final Output:\n {finish_observation}")
                 break
 
-            ### - construct prompt
-            incremental_prompt = ""
-            if observation:
-                incremental_prompt = f"""
-                {llm_output.content}\n{llm_output.tool_calls}\n\n{'-'*20}\n\n{observation}\n\n{'-'*20}\n\n
-                """
-            else:
-                incremental_prompt = f"{llm_output.content}\n\n{'-'*20}\n\n"
-
-            self._full_system_prompt += incremental_prompt
-            
-            
-        
\ No newline at end of file
+            ### - record results
+            # ids only exist for calls made through the API's tool calling, not for ones parsed from content
+            native_ids = {tool_call['id'] for tool_call in llm_output.tool_calls} if llm_output.tool_calls else set()
+            for tool_call, observation in results:
+                tool_call_id = tool_call.id if tool_call.id in native_ids else None
+                self._conversation.add_tool_result(tool_call.name, observation, tool_call_id=tool_call_id)
+            if not results:
+                self._conversation.add_user(CONTINUE_PROMPT)
@@ -0,0 +1,130 @@
+"""
+Bounded event queues with a choice of what happens when they are full.
+"""
+import asyncio
+from collections import deque
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+
+class OverflowPolicy(str, Enum):
+    # Make the producer wait for room.
+    BLOCK = 'block'
+    # Discard the oldest queued event to make room for the new one.
+    DROP_OLDEST = 'drop_oldest'
+    # Discard the new event.
+    DROP_NEWEST = 'drop_newest'
+    # Replace a queued event with the same key in place; block if there is none and no room.
+    COALESCE = 'coalesce'
+
+
+@dataclass
+class QueueConfig:
+    """
+    Capacity and overflow policy of an event queue.
+
+    Args:
+        capacity: Most events held at once; 0 means unbounded
+        policy: What to do with a new event when the queue is full
+        coalesce_key: Maps an event to its key, required by the COALESCE policy
+    """
+    capacity: int = 0
+    policy: OverflowPolicy = OverflowPolicy.BLOCK
+    coalesce_key: Optional[Callable[[Any], Hashable]] = None
+
+    def __post_init__(self) -> None:
+        self.policy = OverflowPolicy(self.policy)
+        if self.policy == OverflowPolicy.COALESCE and self.coalesce_key is None:
+            raise ValueError("The COALESCE policy needs a coalesce_key")
+
+
+@dataclass
+class QueueMetrics:
+    depth: int = 0
+    high_water: int = 0
+    enqueued: int = 0
+    dropped: int = 0
+    coalesced: int = 0
+
+
+class BoundedEventQueue(asyncio.Queue):
+    """
+    An asyncio.Queue that applies a QueueConfig when it is full.
+
+    put() and put_nowait() return False when the event was dropped. With BLOCK (and
+    COALESCE without a matching key) put() waits for room and put_nowait() raises
+    asyncio.QueueFull, like a plain queue.
+    """
+
+    def __init__(self, config: Optional[QueueConfig] = None) -> None:
+        self.config = config or QueueConfig()
+        self._key = self.config.coalesce_key if self.config.policy == OverflowPolicy.COALESCE else None
+        self._high_water = 0
+        self._enqueued = 0
+        self._dropped = 0
+        self._coalesced = 0
+        super().__init__(maxsize=self.config.capacity)
+
+    # Events are held in one-element lists so a coalesced event can replace a queued one in place.
+    def _init(self, maxsize: int) -> None:
+        self._queue: deque = deque()
+        self._slots: Dict[Hashable, List[Any]] = {}
+
+    def _put(self, event: Any) -> None:
+        slot = [event]
+        if self._key is not None:
+            self._slots[self._key(event)] = slot
+        self._queue.append(slot)
+        self._enqueued += 1
+        if len(self._queue) > self._high_water:
+            self._high_water = len(self._queue)
+
+    def _get(self) -> Any:
+        slot = self._queue.popleft()
+        if self._key is not None:
+            key = self._key(slot[0])
+            if self._slots.get(key) is slot:
+                del self._slots[key]
+        return slot[0]
+
+    @property
+    def metrics(self) -> QueueMetrics:
+        return QueueMetrics(
+            depth=self.qsize(),
+            high_water=self._high_water,
+            enqueued=self._enqueued,
+            dropped=self._dropped,
+            coalesced=self._coalesced,
+        )
+
+    def _coalesce(self, event: Any) -> bool:
+        slot = self._slots.get(self._key(event)) if self._key is not None else None
+        if slot is None:
+            return False
+        slot[0] = event
+        self._coalesced += 1
+        return True
+
+    def put_nowait(self, event: Any) -> bool:
+        if self._coalesce(event):
+            return True
+        if self.full():
+            policy = self.config.policy
+            if policy == OverflowPolicy.DROP_NEWEST:
+                self._dropped += 1
+                return False
+            if policy == OverflowPolicy.DROP_OLDEST:
+                self.get_nowait()
+                self.task_done()
+                self._dropped += 1
+        super().put_nowait(event)
+        return True
+
+    async def put(self, event: Any) -> bool:
+        if self.config.policy == OverflowPolicy.BLOCK or (
+            self._key is not None and self._key(event) not in self._slots
+        ):
+            # asyncio.Queue.put waits for room, then calls put_nowait
+            return await super().put(event)
+        return self.put_nowait(event)
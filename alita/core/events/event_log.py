@@ -0,0 +1,262 @@
+"""
+Append-only, segmented JSONL log of published events.
+
+Each line holds one event and its offset, the event's position in the log:
+
+    {"offset":0,"type":"PublishEvent","topic":"test_topic","sender":"a","payload":{"content":"..."}}
+
+The log is split into segment files named after their first offset. A new
+segment is started once the current one exceeds ``segment_bytes``. Writes are
+buffered; fsync runs once ``fsync_batch`` events are pending or ``fsync_interval``
+seconds after the first pending one, whichever comes first. Inside an event
+loop the flush and fsync run on the loop's default executor, one at a time, so
+publishing never waits for the disk. A line torn by a crash is cut off when the
+log is reopened.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from alita.core.events.event_stream import DirectEvent, Event, EventPayload, PublishEvent, Topic
+
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_PREFIX = "events-"
+SEGMENT_SUFFIX = ".jsonl"
+
+EVENT_TYPES = {cls.__name__: cls for cls in (PublishEvent, DirectEvent)}
+
+
+def event_to_dict(event: Event) -> Dict[str, Any]:
+    record = {
+        "type": type(event).__name__,
+        "topic": event.topic.name,
+        "sender": event.sender,
+        "payload": {"content": event.payload.content},
+    }
+    if isinstance(event, DirectEvent):
+        record["receiver"] = event.receiver
+    return record
+
+
+def event_from_dict(record: Dict[str, Any]) -> Event:
+    event_type = EVENT_TYPES[record["type"]]
+    kwargs = {
+        "topic": Topic(record["topic"]),
+        "payload": EventPayload(**record["payload"]),
+        "sender": record["sender"],
+    }
+    if "receiver" in record:
+        kwargs["receiver"] = record["receiver"]
+    return event_type(**kwargs)
+
+
+def _flush_and_fsync(file) -> None:
+    try:
+        file.flush()
+        os.fsync(file.fileno())
+    except ValueError:
+        # Closed by a rotation or close() after a background sync was started; they sync it themselves
+        pass
+
+
+def _segment_path(directory: str, first_offset: int) -> str:
+    return os.path.join(directory, f"{SEGMENT_PREFIX}{first_offset:020d}{SEGMENT_SUFFIX}")
+
+
+class EventLog:
+    """
+    Durable event log kept in ``directory``.
+
+    Args:
+        directory: Where segment files live; created if missing
+        segment_bytes: Size after which a new segment is started
+        fsync_batch: Pending events that force an fsync
+        fsync_interval: Longest time, in seconds, an appended event waits for fsync
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        segment_bytes: int = 64 * 1024 * 1024,
+        fsync_batch: int = 256,
+        fsync_interval: float = 0.05,
+    ) -> None:
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.fsync_batch = fsync_batch
+        self.fsync_interval = fsync_interval
+        self._segments: List[int] = self._list_segments()
+        self._unsynced = 0
+        self._sync_handle: Optional[asyncio.TimerHandle] = None
+        # Flush and fsync running on the executor, if any
+        self._sync_future: Optional[asyncio.Future] = None
+        self._first_unsynced_at = 0.0
+
+        if not self._segments:
+            self._segments.append(0)
+        self._next_offset = self._recover(self._segments[-1])
+        path = _segment_path(directory, self._segments[-1])
+        self._file = open(path, "ab")
+        self._size = self._file.tell()
+
+    @property
+    def next_offset(self) -> int:
+        """Offset the next appended event will get."""
+        return self._next_offset
+
+    @property
+    def segments(self) -> List[str]:
+        return [_segment_path(self.directory, first) for first in self._segments]
+
+    def _list_segments(self) -> List[int]:
+        firsts = []
+        for name in os.listdir(self.directory):
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+                firsts.append(int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]))
+        return sorted(firsts)
+
+    def _recover(self, first_offset: int) -> int:
+        """Return the offset after the last complete line of a segment, cutting off a torn one."""
+        path = _segment_path(self.directory, first_offset)
+        if not os.path.exists(path):
+            return first_offset
+        next_offset = first_offset
+        good_size = 0
+        with open(path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    next_offset = json.loads(line)["offset"] + 1
+                except (ValueError, KeyError):
+                    break
+                good_size += len(line)
+        if good_size < os.path.getsize(path):
+            logger.warning(f"Truncating torn tail of event log segment {path}")
+            with open(path, "r+b") as f:
+                f.truncate(good_size)
+        return next_offset
+
+    def append(self, event: Event) -> int:
+        """Append an event and return its offset."""
+        offset = self._next_offset
+        record = {"offset": offset}
+        record.update(event_to_dict(event))
+        line = json.dumps(record, separators=(",", ":")).encode() + b"\n"
+        if self._size and self._size + len(line) > self.segment_bytes:
+            self._rotate(offset)
+        self._file.write(line)
+        self._size += len(line)
+        self._next_offset += 1
+        self._schedule_sync()
+        return offset
+
+    def append_many(self, events: List[Event]) -> int:
+        """Append events in order and return the offset of the first."""
+        first = self._next_offset
+        for event in events:
+            self.append(event)
+        return first
+
+    def _sync_due(self) -> bool:
+        return self._unsynced >= self.fsync_batch or time.monotonic() - self._first_unsynced_at >= self.fsync_interval
+
+    def _schedule_sync(self) -> None:
+        self._unsynced += 1
+        if self._unsynced == 1:
+            self._first_unsynced_at = time.monotonic()
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            if self._sync_due():
+                self.sync()
+            return
+        if self._sync_due():
+            self._sync_in_background(loop)
+        elif self._sync_handle is None and self._sync_future is None:
+            self._sync_handle = loop.call_later(self.fsync_interval, self._sync_in_background, loop)
+
+    def _sync_in_background(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Start a flush and fsync on the executor, unless one is running; that one starts the next."""
+        if self._sync_handle is not None:
+            self._sync_handle.cancel()
+            self._sync_handle = None
+        if self._sync_future is not None or not self._unsynced or self._file.closed:
+            return
+        self._unsynced = 0
+        self._sync_future = loop.run_in_executor(None, _flush_and_fsync, self._file)
+        self._sync_future.add_done_callback(lambda future: self._background_sync_done(loop, future))
+
+    def _background_sync_done(self, loop: asyncio.AbstractEventLoop, future: asyncio.Future) -> None:
+        self._sync_future = None
+        if not future.cancelled() and future.exception() is not None:
+            logger.error(f"Event log fsync failed: {future.exception()}")
+        # Events appended while it ran
+        if not self._unsynced or self._file.closed:
+            return
+        if self._sync_due():
+            self._sync_in_background(loop)
+        elif self._sync_handle is None:
+            delay = self._first_unsynced_at + self.fsync_interval - time.monotonic()
+            self._sync_handle = loop.call_later(max(0.0, delay), self._sync_in_background, loop)
+
+    def sync(self) -> None:
+        """Flush and fsync everything appended so far, on the calling thread."""
+        if self._sync_handle is not None:
+            self._sync_handle.cancel()
+            self._sync_handle = None
+        if self._file.closed:
+            return
+        # Also covers what a background sync may not have reached yet
+        if self._unsynced or self._sync_future is not None:
+            _flush_and_fsync(self._file)
+        self._unsynced = 0
+
+    def _rotate(self, first_offset: int) -> None:
+        self.sync()
+        self._file.close()
+        self._segments.append(first_offset)
+        self._file = open(_segment_path(self.directory, first_offset), "ab")
+        self._size = 0
+
+    def read(self, from_offset: int = 0, to_offset: Optional[int] = None) -> Iterator[Tuple[int, Event]]:
+        """
+        Yield ``(offset, event)`` for the logged events in ``[from_offset, to_offset)``.
+
+        Events appended while iterating are included if they are within the range.
+        """
+        self._file.flush()
+        start = 0
+        for index, first in enumerate(self._segments):
+            if first <= from_offset:
+                start = index
+        for first in self._segments[start:]:
+            if to_offset is not None and first >= to_offset:
+                return
+            with open(_segment_path(self.directory, first), "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    record = json.loads(line)
+                    offset = record["offset"]
+                    if offset < from_offset:
+                        continue
+                    if to_offset is not None and offset >= to_offset:
+                        return
+                    yield offset, event_from_dict(record)
+
+    def close(self) -> None:
+        self.sync()
+        self._file.close()
+
+    def __enter__(self) -> "EventLog":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
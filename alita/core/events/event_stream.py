@@ -2,16 +2,24 @@
 from dataclasses import dataclass
 import logging
 import asyncio
-from asyncio import CancelledError, Queue
-from typing import Dict, List, Protocol
+import functools
+from asyncio import CancelledError
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Protocol
 from abc import abstractmethod
 
+from alita.core.events.bounded_queue import BoundedEventQueue, QueueConfig, QueueMetrics
+from alita.core.events.topic_index import TopicIndex
+
+if TYPE_CHECKING:
+    from alita.core.events.event_log import EventLog
+    from alita.core.events.transport import Transport
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 
 
-@dataclass(eq=True, frozen=True)
+@dataclass(eq=True, frozen=True, slots=True)
 class Topic():
     _name: str = 'DefaultTopic'
 
@@ -23,26 +31,31 @@ class Topic():
     def name(self, name: str):
         self._name = name
 
-@dataclass
+@dataclass(slots=True)
 class EventPayload:
     content: str
 
-@dataclass
+@dataclass(slots=True)
 class Event:
     topic: Topic
     payload: EventPayload
     sender: str
 
-@dataclass
+@dataclass(slots=True)
 class DirectEvent(Event):
     receiver: str
 
-@dataclass
+@dataclass(slots=True)
 class PublishEvent(Event):
     pass
 
 
 class EventProcessor(Protocol):
+    """
+    A processor may also define ``async def process_batch(self, events: List[Event])``.
+    The stream then hands it micro-batches of queued events instead of calling
+    process_event once per event.
+    """
 
     @abstractmethod
     def process_event(self, event: Event) -> None:
@@ -52,7 +65,7 @@ class EventProcessor(Protocol):
         ...
 
 
-@dataclass
+@dataclass(slots=True)
 class TopicSubscription():
     topic: Topic
     processor: EventProcessor
@@ -61,104 +74,429 @@ class TopicSubscription():
 
 
 
+class ProcessorMailbox:
+    """
+    Events waiting for one processor, fed to it in order by a dedicated worker task.
+
+    For processors with process_batch, the worker takes everything already queued, up
+    to max_batch_size events, and waits up to max_batch_latency seconds for more
+    before delivering a batch.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        processor: EventProcessor,
+        limiter: Optional[asyncio.Semaphore] = None,
+        config: Optional[QueueConfig] = None,
+        max_batch_size: int = 100,
+        max_batch_latency: float = 0.0,
+    ):
+        self.name = name
+        self.processor = processor
+        self._process_batch = getattr(processor, 'process_batch', None)
+        self._max_batch_size = max_batch_size
+        self._max_batch_latency = max_batch_latency
+        self._queue = BoundedEventQueue(config)
+        # Shared by all mailboxes of a stream to cap how many processors run at once
+        self._limiter = limiter
+        self._task: Optional[asyncio.Task] = None
+        self._stopped = False
+        self._waiting_for_event = False
+        self._busy = False
+
+    @property
+    def idle(self) -> bool:
+        return self._queue.empty() and not self._busy
+
+    @property
+    def metrics(self) -> QueueMetrics:
+        return self._queue.metrics
+
+    async def put(self, event: Event) -> bool:
+        """Queue an event; waits for room or drops an event according to the mailbox's policy."""
+        return await self._queue.put(event)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._stopped = False
+            self._task = asyncio.create_task(self._run())
+
+    async def join(self) -> None:
+        await self._queue.join()
+
+    async def stop(self) -> None:
+        """Stop after the event in hand, if any."""
+        self._stopped = True
+        task, self._task = self._task, None
+        if task is None:
+            return
+        if self._waiting_for_event:
+            task.cancel()
+        await task
+
+    async def _collect_batch(self, first: Event) -> List[Event]:
+        batch = [first]
+        queue = self._queue
+        deadline = None
+        while len(batch) < self._max_batch_size:
+            if not queue.empty():
+                batch.append(queue.get_nowait())
+                continue
+            if self._max_batch_latency <= 0:
+                break
+            loop = asyncio.get_running_loop()
+            if deadline is None:
+                deadline = loop.time() + self._max_batch_latency
+            if loop.time() >= deadline:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), max(0, deadline - loop.time())))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _deliver(self, events: List[Event]) -> None:
+        if self._process_batch is not None:
+            await self._process_batch(events)
+        else:
+            await self.processor.process_event(events[0])
+
+    async def _process(self, events: List[Event]) -> None:
+        try:
+            if self._limiter is None:
+                await self._deliver(events)
+            else:
+                async with self._limiter:
+                    await self._deliver(events)
+        except Exception as e:
+            logger.error(f"Error processing event in {self.name}: {e}")
+        finally:
+            self._busy = False
+            for _ in events:
+                self._queue.task_done()
+
+    async def _run(self) -> None:
+        try:
+            while not self._stopped:
+                self._waiting_for_event = True
+                try:
+                    event = await self._queue.get()
+                finally:
+                    self._waiting_for_event = False
+                self._busy = True
+                if self._process_batch is not None:
+                    await self._process(await self._collect_batch(event))
+                else:
+                    await self._process([event])
+        except CancelledError:
+            if self._stopped:
+                return
+            raise
+
+
 class EventStream:
-    """An asynchronous event stream that processes events from a queue."""
+    """
+    An asynchronous event stream that processes events from a queue.
+
+    A dispatcher task routes each event to the mailbox of every processor that should
+    receive it. Each processor has its own worker, so processors run concurrently while
+    each one still sees its events in publish order.
+
+    Both the stream's queue and the mailboxes are unbounded unless configured. When a
+    bounded mailbox is full with the BLOCK policy, the dispatcher waits for room, and
+    once the stream's queue is full too, publishers wait.
+
+    Args:
+        max_concurrency: Most processors allowed to process an event at the same time;
+            unlimited by default
+        queue_config: Capacity and overflow policy of the stream's queue
+        mailbox_config: Default capacity and overflow policy of processor mailboxes
+        max_batch_size: Most events handed to a process_batch call
+        max_batch_latency: Seconds a batch may wait for more events; 0 delivers
+            whatever is queued without waiting
+        event_log: Durable log every accepted event is appended to, for replay()
+        transport: Connects this stream to streams in other loops, processes or
+            machines; events their processors want are forwarded to them
+    """
     
-    def __init__(self):
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        queue_config: Optional[QueueConfig] = None,
+        mailbox_config: Optional[QueueConfig] = None,
+        max_batch_size: int = 100,
+        max_batch_latency: float = 0.0,
+        event_log: Optional["EventLog"] = None,
+        transport: Optional["Transport"] = None,
+    ):
         """Initialize the event stream."""
-        self._event_queue = Queue()
+        self._event_queue = BoundedEventQueue(queue_config)
+        self._mailbox_config = mailbox_config
+        self._max_batch_size = max_batch_size
+        self._max_batch_latency = max_batch_latency
+        self._event_log = event_log
+        self._transport = transport
         
         self._processing_task = None
         self._stopped = asyncio.Event()
+        self._waiting_for_event = False
 
         # ProcessorName -> EventProcessor
         self._processors: Dict[str, EventProcessor] = {}
+        # id(processor) -> its mailbox
+        self._mailboxes: Dict[int, ProcessorMailbox] = {}
+        self._limiter = asyncio.Semaphore(max_concurrency) if max_concurrency else None
 
         self._subscriptions: List[TopicSubscription] = []
-        self._topic_processor_map: Dict[Topic, List[EventProcessor]] = {}
+        # Topic pattern -> processors, e.g. 'agent.*.observation'; see topic_index
+        self._topic_index = TopicIndex()
 
+    @property
+    def running(self) -> bool:
+        return self._processing_task is not None and not self._stopped.is_set()
     
-    async def publish_event(self, event: Event) -> None:
+    async def publish_event(self, event: Event) -> bool:
         """Publish an event to the event stream.
         
         Args:
             event: The event to publish
+
+        Returns:
+            bool: False if the stream's queue was full and dropped the event
+        """
+        accepted = await self._event_queue.put(event)
+        # No await between the put and the append, so the log has queue order
+        if accepted and self._event_log is not None:
+            self._event_log.append(event)
+        # Per-event logging is debug-only; formatting every event is a large part of publishing cost
+        if logger.isEnabledFor(logging.DEBUG):
+            if accepted:
+                logger.debug(f"Published event: {event}")
+            else:
+                logger.debug(f"Event stream queue full, dropped event: {event}")
+        return accepted
+
+    async def publish_many(self, events: Iterable[Event]) -> int:
+        """Publish a burst of events, logging once for all of them.
+
+        Args:
+            events: The events to publish, in order
+
+        Returns:
+            int: How many events were accepted
         """
-        await self._event_queue.put(event)
-        logger.info(f"Published event: {event}")
+        accepted = 0
+        total = 0
+        put = self._event_queue.put
+        event_log = self._event_log
+        for event in events:
+            total += 1
+            if await put(event):
+                accepted += 1
+                if event_log is not None:
+                    event_log.append(event)
+        logger.info(f"Published {accepted} of {total} events")
+        return accepted
     
-    def register_processor(self, processor: EventProcessor, topics: list[Topic] = None) -> None:
+    def register_processor(
+        self,
+        processor: EventProcessor,
+        topics: list[Topic] = None,
+        mailbox_config: Optional[QueueConfig] = None,
+    ) -> None:
         processor_name = type(processor).__name__
         if processor_name not in self._processors:
             self._processors[processor_name] = processor
-
-        for topic in topics:
+        if id(processor) not in self._mailboxes:
+            # Unique name, for the metrics of several processors of one class
+            mailbox_name = processor_name
+            names = {mailbox.name for mailbox in self._mailboxes.values()}
+            suffix = 1
+            while mailbox_name in names:
+                suffix += 1
+                mailbox_name = f"{processor_name}#{suffix}"
+            mailbox = ProcessorMailbox(
+                mailbox_name,
+                processor,
+                self._limiter,
+                mailbox_config or self._mailbox_config,
+                max_batch_size=self._max_batch_size,
+                max_batch_latency=self._max_batch_latency,
+            )
+            self._mailboxes[id(processor)] = mailbox
+            if self.running:
+                mailbox.start()
+
+        for topic in topics or []:
             new_subscription = TopicSubscription(topic=topic, processor=processor)
             self._subscriptions.append(new_subscription)
+            self._topic_index.add(topic.name, processor)
 
-            if topic not in self._topic_processor_map:
-                self._topic_processor_map[topic] = []
-
-            self._topic_processor_map[topic].append(processor)
+        self._announce_subscriptions()
 
         logger.info(f"Registered {processor_name} for topics: {topics}")
+
+    def unregister_processor(self, processor: EventProcessor, topics: Optional[list[Topic]] = None) -> None:
+        """
+        Remove topic subscriptions of a processor; all of them if ``topics`` is None.
+
+        The processor keeps receiving DirectEvents addressed to it.
+        """
+        kept = []
+        for subscription in self._subscriptions:
+            if subscription.processor is processor and (topics is None or subscription.topic in topics):
+                self._topic_index.remove(subscription.topic.name, processor)
+            else:
+                kept.append(subscription)
+        self._subscriptions = kept
+        self._announce_subscriptions()
+        logger.info(f"Unregistered {type(processor).__name__} from topics: {topics if topics is not None else 'all'}")
+
+    def _announce_subscriptions(self) -> None:
+        if self._transport is not None:
+            topics = [Topic(pattern) for pattern in self._topic_index.patterns()]
+            self._transport.set_subscriptions(topics, self._processors)
     
     async def start(self) -> None:
         """Start processing events from the queue."""
+        self._stopped.clear()
+        for mailbox in self._mailboxes.values():
+            mailbox.start()
+        if self._transport is not None:
+            # Events from other streams go to local processors only
+            self._transport.attach(functools.partial(self._route, forward=False))
+            self._announce_subscriptions()
+            await self._transport.start()
         self._processing_task = asyncio.create_task(self._process_event())
         logger.info("Event stream started")
     
     async def stop(self) -> None:
         """Stop processing events immediately."""
         self._stopped.set()
+        # An idle dispatcher is parked in queue.get(); wake it now. A busy one
+        # finishes the event in hand and sees the flag before taking the next.
+        if self._waiting_for_event:
+            self._processing_task.cancel()
         logger.info("Event stream stopped")
         await self._processing_task
+        await asyncio.gather(*(mailbox.stop() for mailbox in self._mailboxes.values()))
+        if self._transport is not None:
+            await self._transport.close()
     
     async def stop_when_idle(self) -> None:
         """Process all events in the queue and then stop."""
-        await self._event_queue.join()
-        self._stopped.set()
-        await self._processing_task
+        await self.wait_until_idle()
+        await self.stop()
+
+    def metrics(self) -> Dict[str, QueueMetrics]:
+        """Depth, high-water mark and drop counts of the stream's queue ("stream") and of each mailbox."""
+        metrics = {"stream": self._event_queue.metrics}
+        for mailbox in self._mailboxes.values():
+            metrics[mailbox.name] = mailbox.metrics
+        return metrics
+
+    def _idle(self) -> bool:
+        return (
+            self._event_queue.empty()
+            and self._waiting_for_event
+            and all(mailbox.idle for mailbox in self._mailboxes.values())
+        )
+
+    async def wait_until_idle(self) -> None:
+        """
+        Wait until every published event, including ones published by processors meanwhile, is processed.
+
+        Returns at once if the stream is not running, as nothing would process the queued events.
+        """
+        while True:
+            if not self.running or self._processing_task.done():
+                return
+            await self._event_queue.join()
+            for mailbox in list(self._mailboxes.values()):
+                await mailbox.join()
+            if self._idle():
+                return
+            # Let the dispatcher pick up what processors published meanwhile
+            await asyncio.sleep(0)
+
+    async def _deliver(self, processor: EventProcessor, event: Event) -> None:
+        mailbox = self._mailboxes[id(processor)]
+        if not await mailbox.put(event):
+            # counted in the mailbox metrics
+            logger.debug(f"Mailbox of {mailbox.name} full, dropped event: {event}")
     
+    async def replay(self, from_offset: int = 0, to_offset: Optional[int] = None) -> int:
+        """
+        Deliver logged events to the registered processors again, as fast as they take them.
+
+        Replayed events go straight to the processors' mailboxes; they are not appended
+        to the log again.
+
+        Args:
+            from_offset: First offset to replay
+            to_offset: Offset to stop before; replays to the end of the log by default
+
+        Returns:
+            int: How many events were replayed
+        """
+        if self._event_log is None:
+            raise ValueError("This event stream has no event log")
+        if to_offset is None:
+            to_offset = self._event_log.next_offset
+        count = 0
+        for _, event in self._event_log.read(from_offset, to_offset):
+            await self._route(event, forward=False)
+            count += 1
+        logger.info(f"Replayed {count} events from offset {from_offset}")
+        return count
+
+    async def _route(self, event: Event, forward: bool = True) -> None:
+        transport = self._transport if forward else None
+        if isinstance(event, DirectEvent):
+            # only sent to receiver
+            receiver_name = event.receiver
+            receiver_processor = self._processors.get(receiver_name)
+            if receiver_processor:
+                await self._deliver(receiver_processor, event)
+            elif transport is not None and transport.wants(event):
+                await transport.send(event)
+            else:
+                logger.warning(f"No processor found for receiver: {receiver_name}")
+        elif isinstance(event, PublishEvent):
+            # sent to all processors, here and in other streams
+            topic = event.topic
+            for processor in self._topic_index.match(topic.name):
+                await self._deliver(processor, event)
+            if transport is not None and transport.wants(event):
+                await transport.send(event)
+        else:
+            logger.warning(f"Unknown event type: {type(event)}")
+
+    async def _dispatch(self, event: Event) -> None:
+        try:
+            await self._route(event)
+        except Exception as e:
+            logger.error(f"Error processing event: {e}")
+        finally:
+            # Mark the task as done regardless of whether processing succeeded
+            self._event_queue.task_done()
+
     async def _process_event(self) -> None:
         """Process events from the queue until stopped."""
         try:
-            while True:
-                if self._stopped.is_set():
-                    return
+            while not self._stopped.is_set():
+                # Sleep until an event arrives; stop() cancels the wait instead of us polling a flag
+                self._waiting_for_event = True
                 try:
-                    # Use a timeout to allow checking the running flag periodically
-                    event = await asyncio.wait_for(self._event_queue.get(), timeout=0.1)
-                    
-                    try:
-                        if isinstance(event, DirectEvent):
-                            # only sent to receiver
-                            receiver_name = event.receiver
-                            receiver_processor = self._processors.get(receiver_name)
-                            if receiver_processor:
-                                await receiver_processor.process_event(event)
-                            else:
-                                logger.warning(f"No processor found for receiver: {receiver_name}")
-                        elif isinstance(event, PublishEvent):
-                            # sent to all processors
-                            topic = event.topic
-                            for processor in self._topic_processor_map.get(topic):
-                                await processor.process_event(event)
-                        else:
-                            logger.warning(f"Unknown event type: {type(event)}")
-                            
-
-                    except Exception as e:
-                        logger.error(f"Error processing event: {e}")
-                    finally:
-                        # Mark the task as done regardless of whether processing succeeded
-                        self._event_queue.task_done()
-                
-                except asyncio.TimeoutError:
-                    # No event available within timeout, just continue the loop
-                    pass
+                    event = await self._event_queue.get()
+                finally:
+                    self._waiting_for_event = False
+                await self._dispatch(event)
         
         except CancelledError:
+            if self._stopped.is_set():
+                return
             logger.info("Event processing was cancelled")
             # Re-raise to properly handle task cancellation
             raise
@@ -0,0 +1,136 @@
+"""
+Subscription index for hierarchical, dot-separated topics.
+
+Subscriptions are topic patterns whose segments may be wildcards:
+
+    agent.coder.observation   exactly this topic
+    agent.*.observation       ``*`` matches exactly one segment
+    agent.#                   ``#`` matches zero or more segments
+
+Patterns are stored in a trie keyed by segment. Matching a concrete topic walks
+the trie once, and the result is cached per topic until the next change to the
+index, so routing a topic seen before is a dict lookup.
+"""
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+SEPARATOR = '.'
+SINGLE_WILDCARD = '*'
+MULTI_WILDCARD = '#'
+
+# Cached results kept before the cache is cleared; bounds memory with many distinct topics.
+MAX_CACHED_TOPICS = 65536
+
+
+class _Node:
+    __slots__ = ('children', 'subscribers')
+
+    def __init__(self) -> None:
+        self.children: Dict[str, "_Node"] = {}
+        # (sequence number, subscriber), in registration order
+        self.subscribers: List[Tuple[int, Any]] = []
+
+
+class TopicIndex:
+    """Maps topic patterns to subscribers, and concrete topics to matching subscribers."""
+
+    def __init__(self) -> None:
+        self._root = _Node()
+        self._cache: Dict[str, Tuple[Any, ...]] = {}
+        self._sequence = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _node(self, pattern: str, create: bool) -> Optional[_Node]:
+        node = self._root
+        for segment in pattern.split(SEPARATOR):
+            child = node.children.get(segment)
+            if child is None:
+                if not create:
+                    return None
+                child = node.children[segment] = _Node()
+            node = child
+        return node
+
+    def add(self, pattern: str, subscriber: Any) -> None:
+        node = self._node(pattern, create=True)
+        self._sequence += 1
+        node.subscribers.append((self._sequence, subscriber))
+        self._size += 1
+        self._cache.clear()
+
+    def remove(self, pattern: str, subscriber: Any) -> bool:
+        """Remove one subscription; returns False if there was none."""
+        node = self._node(pattern, create=False)
+        if node is None:
+            return False
+        for index, (_, existing) in enumerate(node.subscribers):
+            if existing is subscriber:
+                del node.subscribers[index]
+                self._size -= 1
+                self._prune(pattern)
+                self._cache.clear()
+                return True
+        return False
+
+    def _prune(self, pattern: str) -> None:
+        path = [self._root]
+        segments = pattern.split(SEPARATOR)
+        for segment in segments:
+            path.append(path[-1].children[segment])
+        for depth in range(len(segments), 0, -1):
+            node = path[depth]
+            if node.subscribers or node.children:
+                break
+            del path[depth - 1].children[segments[depth - 1]]
+
+    def patterns(self) -> Iterator[str]:
+        """Yield every pattern with at least one subscriber."""
+        stack = [(self._root, [])]
+        while stack:
+            node, segments = stack.pop()
+            if node.subscribers and segments:
+                yield SEPARATOR.join(segments)
+            for segment, child in node.children.items():
+                stack.append((child, segments + [segment]))
+
+    def match(self, topic: str) -> Tuple[Any, ...]:
+        """Return the subscribers whose patterns match ``topic``, each once, in registration order."""
+        cached = self._cache.get(topic)
+        if cached is not None:
+            return cached
+        found: List[Tuple[int, Any]] = []
+        self._collect(self._root, topic.split(SEPARATOR), 0, found)
+        seen = set()
+        result = []
+        for _, subscriber in sorted(found, key=lambda item: item[0]):
+            if id(subscriber) not in seen:
+                seen.add(id(subscriber))
+                result.append(subscriber)
+        matched = tuple(result)
+        if len(self._cache) >= MAX_CACHED_TOPICS:
+            self._cache.clear()
+        self._cache[topic] = matched
+        return matched
+
+    def _collect(self, node: _Node, segments: List[str], position: int, found: List[Tuple[int, Any]]) -> None:
+        children = node.children
+        if position == len(segments):
+            found.extend(node.subscribers)
+            multi = children.get(MULTI_WILDCARD)
+            if multi is not None:
+                self._collect(multi, segments, position, found)
+            return
+        exact = children.get(segments[position])
+        if exact is not None:
+            self._collect(exact, segments, position + 1, found)
+        single = children.get(SINGLE_WILDCARD)
+        if single is not None:
+            self._collect(single, segments, position + 1, found)
+        multi = children.get(MULTI_WILDCARD)
+        if multi is not None:
+            # '#' consumes zero or more segments
+            for end in range(position, len(segments) + 1):
+                self._collect(multi, segments, end, found)
@@ -0,0 +1,398 @@
+"""
+Transports that connect EventStreams in different loops, processes or machines.
+
+Streams connect to a hub. Each stream tells the hub which topics its
+processors subscribe to and which processor names it hosts; the hub tells every
+stream the union of what the *other* streams want. A stream then forwards only
+the events some other stream wants: PublishEvents on a wanted topic, and
+DirectEvents whose receiver lives elsewhere. The hub routes each forwarded event
+to the streams that want it.
+
+- InProcessHub / InProcessTransport: streams sharing one event loop, no serialization.
+- TransportServer with UnixSocketTransport or TCPTransport: streams in other
+  processes or on other machines. Frames are a 4-byte big-endian length
+  followed by a JSON message.
+"""
+import asyncio
+import functools
+import itertools
+import json
+import logging
+import struct
+from abc import ABC, abstractmethod
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, Iterable, Optional, Set, Tuple
+
+from alita.core.events.event_log import event_from_dict, event_to_dict
+from alita.core.events.event_stream import DirectEvent, Event, PublishEvent, Topic
+from alita.core.events.topic_index import TopicIndex
+
+
+logger = logging.getLogger(__name__)
+
+FRAME_HEADER = struct.Struct(">I")
+MAX_FRAME_BYTES = 64 * 1024 * 1024
+# Seconds a socket transport waits for the hub's first answer when starting.
+CONNECT_TIMEOUT = 10.0
+
+# What a stream wants from the others: topic patterns and processor names.
+Interest = Tuple[FrozenSet[str], FrozenSet[str]]
+EMPTY_INTEREST: Interest = (frozenset(), frozenset())
+
+
+@functools.lru_cache(maxsize=256)
+def _pattern_index(patterns: FrozenSet[str]) -> TopicIndex:
+    index = TopicIndex()
+    for pattern in patterns:
+        index.add(pattern, pattern)
+    return index
+
+
+def event_matches(event: Event, interest: Interest) -> bool:
+    topics, receivers = interest
+    if isinstance(event, DirectEvent):
+        return event.receiver in receivers
+    if isinstance(event, PublishEvent):
+        return bool(topics) and bool(_pattern_index(topics).match(event.topic.name))
+    return False
+
+
+class Transport(ABC):
+    """
+    One stream's connection to the others.
+
+    The owning EventStream calls attach() and start(), reports its subscriptions with
+    set_subscriptions(), and sends the events wants() accepts.
+    """
+
+    def __init__(self) -> None:
+        self._deliver: Optional[Callable[[Event], Awaitable[None]]] = None
+        self._local: Interest = EMPTY_INTEREST
+        self._remote: Interest = EMPTY_INTEREST
+
+    def attach(self, deliver: Callable[[Event], Awaitable[None]]) -> None:
+        """Set the callback that hands events from other streams to the local one."""
+        self._deliver = deliver
+
+    def wants(self, event: Event) -> bool:
+        """Whether some other stream has a processor for ``event``."""
+        return event_matches(event, self._remote)
+
+    def set_remote_interest(self, interest: Interest) -> None:
+        self._remote = interest
+
+    def set_subscriptions(self, topics: Iterable[Topic], receivers: Iterable[str]) -> None:
+        """Report the local topics and processor names; sent to the hub when connected."""
+        self._local = (frozenset(topic.name for topic in topics), frozenset(receivers))
+        self._announce()
+
+    async def receive(self, event: Event) -> None:
+        if self._deliver is not None:
+            await self._deliver(event)
+
+    @abstractmethod
+    def _announce(self) -> None:
+        ...
+
+    @abstractmethod
+    async def start(self) -> None:
+        ...
+
+    @abstractmethod
+    async def send(self, event: Event) -> None:
+        ...
+
+    @abstractmethod
+    async def close(self) -> None:
+        ...
+
+
+class _Peer(ABC):
+    """A connected stream as seen by the hub."""
+
+    interest: Interest = EMPTY_INTEREST
+
+    @abstractmethod
+    def notify_interest(self, interest: Interest) -> None:
+        ...
+
+    @abstractmethod
+    async def deliver(self, event: Event) -> None:
+        ...
+
+
+class SubscriptionRouter:
+    """The hub's view of which peer wants what."""
+
+    def __init__(self) -> None:
+        self._peers: Dict[int, _Peer] = {}
+        self._ids = itertools.count()
+
+    def add(self, peer: _Peer) -> int:
+        peer_id = next(self._ids)
+        self._peers[peer_id] = peer
+        peer.notify_interest(self._others_interest(peer_id))
+        return peer_id
+
+    def remove(self, peer_id: int) -> None:
+        if self._peers.pop(peer_id, None) is not None:
+            self._propagate()
+
+    def update(self, peer_id: int, interest: Interest) -> None:
+        self._peers[peer_id].interest = interest
+        self._propagate()
+
+    def _others_interest(self, peer_id: int) -> Interest:
+        topics: Set[str] = set()
+        receivers: Set[str] = set()
+        for other_id, peer in self._peers.items():
+            if other_id != peer_id:
+                topics.update(peer.interest[0])
+                receivers.update(peer.interest[1])
+        return frozenset(topics), frozenset(receivers)
+
+    def _propagate(self) -> None:
+        for peer_id, peer in list(self._peers.items()):
+            peer.notify_interest(self._others_interest(peer_id))
+
+    async def route(self, sender_id: int, event: Event) -> None:
+        for peer_id, peer in list(self._peers.items()):
+            if peer_id != sender_id and event_matches(event, peer.interest):
+                await peer.deliver(event)
+
+
+class InProcessHub(SubscriptionRouter):
+    """Connects InProcessTransports of streams in this process."""
+
+
+class _InProcessPeer(_Peer):
+    def __init__(self, transport: "InProcessTransport") -> None:
+        self.transport = transport
+
+    def notify_interest(self, interest: Interest) -> None:
+        self.transport.set_remote_interest(interest)
+
+    async def deliver(self, event: Event) -> None:
+        await self.transport.receive(event)
+
+
+class InProcessTransport(Transport):
+    def __init__(self, hub: InProcessHub) -> None:
+        super().__init__()
+        self._hub = hub
+        self._peer_id: Optional[int] = None
+
+    def _announce(self) -> None:
+        if self._peer_id is not None:
+            self._hub.update(self._peer_id, self._local)
+
+    async def start(self) -> None:
+        if self._peer_id is None:
+            peer = _InProcessPeer(self)
+            peer.interest = self._local
+            self._peer_id = self._hub.add(peer)
+            self._hub.update(self._peer_id, self._local)
+
+    async def send(self, event: Event) -> None:
+        if self._peer_id is not None:
+            await self._hub.route(self._peer_id, event)
+
+    async def close(self) -> None:
+        if self._peer_id is not None:
+            self._hub.remove(self._peer_id)
+            self._peer_id = None
+
+
+def write_frame(writer: asyncio.StreamWriter, message: Dict[str, Any]) -> None:
+    body = json.dumps(message, separators=(",", ":")).encode()
+    writer.write(FRAME_HEADER.pack(len(body)) + body)
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Optional[Dict[str, Any]]:
+    """Return the next message, or None when the connection is closed."""
+    try:
+        header = await reader.readexactly(FRAME_HEADER.size)
+        (length,) = FRAME_HEADER.unpack(header)
+        if length > MAX_FRAME_BYTES:
+            raise ValueError(f"Frame of {length} bytes exceeds the limit")
+        return json.loads(await reader.readexactly(length))
+    except (asyncio.IncompleteReadError, ConnectionError):
+        return None
+
+
+def _interest_message(op: str, interest: Interest) -> Dict[str, Any]:
+    return {"op": op, "topics": sorted(interest[0]), "receivers": sorted(interest[1])}
+
+
+def _interest_from_message(message: Dict[str, Any]) -> Interest:
+    return frozenset(message["topics"]), frozenset(message["receivers"])
+
+
+class _SocketPeer(_Peer):
+    def __init__(self, writer: asyncio.StreamWriter) -> None:
+        self.writer = writer
+
+    def notify_interest(self, interest: Interest) -> None:
+        write_frame(self.writer, _interest_message("interest", interest))
+
+    async def deliver(self, event: Event) -> None:
+        write_frame(self.writer, {"op": "event", "event": event_to_dict(event)})
+        await self.writer.drain()
+
+
+class TransportServer:
+    """
+    Hub for socket transports; run it in one process and point the streams at it.
+
+    Use serve_unix() or serve_tcp(), then close() when done.
+    """
+
+    def __init__(self) -> None:
+        self._router = SubscriptionRouter()
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._connections: Set[asyncio.Task] = set()
+
+    async def serve_unix(self, path: str) -> None:
+        self._server = await asyncio.start_unix_server(self._handle, path=path)
+
+    async def serve_tcp(self, host: str = "127.0.0.1", port: int = 0) -> Tuple[str, int]:
+        """Listen on ``host:port``; port 0 picks a free port. Returns the bound address."""
+        self._server = await asyncio.start_server(self._handle, host=host, port=port)
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._connections.add(asyncio.current_task())
+        peer = _SocketPeer(writer)
+        peer_id = self._router.add(peer)
+        try:
+            while True:
+                message = await read_frame(reader)
+                if message is None:
+                    break
+                if message["op"] == "subscribe":
+                    self._router.update(peer_id, _interest_from_message(message))
+                elif message["op"] == "event":
+                    await self._router.route(peer_id, event_from_dict(message["event"]))
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._router.remove(peer_id)
+            self._connections.discard(asyncio.current_task())
+            writer.close()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            for task in list(self._connections):
+                task.cancel()
+            await asyncio.gather(*self._connections, return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+
+
+class SocketTransport(Transport):
+    """
+    Connects a stream to a TransportServer over a stream socket.
+
+    Args:
+        connect_timeout: Seconds start() waits for the hub to answer before raising TimeoutError
+    """
+
+    def __init__(self, connect_timeout: float = CONNECT_TIMEOUT) -> None:
+        super().__init__()
+        self.connect_timeout = connect_timeout
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._read_task: Optional[asyncio.Task] = None
+        self._connected = asyncio.Event()
+        # Why the connection ended before the hub answered, raised by start()
+        self._connect_error: Optional[Exception] = None
+
+    @abstractmethod
+    async def _open_connection(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        ...
+
+    def _announce(self) -> None:
+        if self._writer is not None:
+            write_frame(self._writer, _interest_message("subscribe", self._local))
+
+    async def start(self) -> None:
+        if self._writer is not None:
+            return
+        self._reader, self._writer = await self._open_connection()
+        self._announce()
+        self._read_task = asyncio.create_task(self._read_loop())
+        # The hub answers a new connection with the current interest of the others
+        try:
+            await asyncio.wait_for(self._connected.wait(), self.connect_timeout)
+        except asyncio.TimeoutError:
+            await self.close()
+            raise TimeoutError(f"Transport hub did not answer within {self.connect_timeout}s") from None
+        if self._connect_error is not None:
+            error = self._connect_error
+            await self.close()
+            raise error
+
+    async def _read_loop(self) -> None:
+        try:
+            while True:
+                message = await read_frame(self._reader)
+                if message is None:
+                    logger.warning("Transport connection closed by the hub")
+                    break
+                if message["op"] == "interest":
+                    self.set_remote_interest(_interest_from_message(message))
+                    self._connected.set()
+                elif message["op"] == "event":
+                    try:
+                        await self.receive(event_from_dict(message["event"]))
+                    except Exception as e:
+                        logger.error(f"Error delivering remote event: {e}")
+        except Exception as e:
+            logger.error(f"Transport connection failed: {e}")
+        self.set_remote_interest(EMPTY_INTEREST)
+        if not self._connected.is_set():
+            self._connect_error = ConnectionError("Transport connection closed before the hub answered")
+            self._connected.set()
+
+    async def send(self, event: Event) -> None:
+        if self._writer is None:
+            return
+        write_frame(self._writer, {"op": "event", "event": event_to_dict(event)})
+        await self._writer.drain()
+
+    async def close(self) -> None:
+        if self._read_task is not None:
+            self._read_task.cancel()
+            try:
+                await self._read_task
+            except asyncio.CancelledError:
+                pass
+            self._read_task = None
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except ConnectionError:
+                pass
+            self._writer = None
+        self._connected.clear()
+        self._connect_error = None
+
+
+class UnixSocketTransport(SocketTransport):
+    def __init__(self, path: str, connect_timeout: float = CONNECT_TIMEOUT) -> None:
+        super().__init__(connect_timeout)
+        self.path = path
+
+    async def _open_connection(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        return await asyncio.open_unix_connection(self.path)
+
+
+class TCPTransport(SocketTransport):
+    def __init__(self, host: str, port: int, connect_timeout: float = CONNECT_TIMEOUT) -> None:
+        super().__init__(connect_timeout)
+        self.host = host
+        self.port = port
+
+    async def _open_connection(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        return await asyncio.open_connection(self.host, self.port)
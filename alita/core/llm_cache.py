@@ -0,0 +1,243 @@
+"""
+Record/replay cache for model calls.
+
+Wrap the chat model before handing it to CodingAgent:
+
+    model_client = CachingChatModel(ChatOpenAI(...), LLMCacheStore(".alita/llm_cache.sqlite"))
+    agent = CodingAgent(model_client=model_client, tools=tools)
+
+Responses are keyed by a hash of the normalized message list, the bound tool
+schemas and the model name. In RECORD mode misses go to the model and are
+stored; in REPLAY mode a miss raises LLMCacheMiss and the model is never
+called, so recorded runs can be replayed offline and deterministically.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from enum import Enum
+from typing import Any, Dict, List, Optional, Sequence
+
+from langchain_core.messages import AIMessage, BaseMessage, messages_from_dict, messages_to_dict
+from langchain_core.messages.utils import convert_to_messages
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+
+logger = logging.getLogger(__name__)
+
+
+class CacheMode(str, Enum):
+    # Serve hits from the cache, call the model on a miss and store the response.
+    RECORD = 'record'
+    # Serve hits from the cache, raise LLMCacheMiss on a miss.
+    REPLAY = 'replay'
+    # Always call the model and overwrite the stored response.
+    REFRESH = 'refresh'
+
+
+class LLMCacheMiss(KeyError):
+    """Raised in replay mode when a request was never recorded."""
+
+
+class LLMCacheStore:
+    """
+    SQLite-backed response store with least-recently-used eviction.
+
+    Hits don't write to the database: their access times are kept in memory and
+    written in one transaction before the next eviction, once ``flush_every`` have
+    piled up, or on close. Hits lost in a crash only make eviction less accurate.
+
+    Args:
+        path: Database file; created with its parent directory if missing
+        max_entries: Entries kept before the least recently used are evicted
+        flush_every: Pending access times that trigger a write
+    """
+
+    def __init__(self, path: str, max_entries: int = 10000, flush_every: int = 256) -> None:
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.flush_every = flush_every
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # key -> last access time of hits not yet written
+        self._accessed: Dict[str, float] = {}
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, created_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        self._db.commit()
+        self._count = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def __len__(self) -> int:
+        return self._count
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._accessed[key] = time.time()
+            if len(self._accessed) >= self.flush_every:
+                self._write_accessed()
+                self._db.commit()
+            return row[0]
+
+    def _write_accessed(self) -> None:
+        if self._accessed:
+            self._db.executemany(
+                "UPDATE responses SET last_access = ? WHERE key = ?",
+                [(accessed, key) for key, accessed in self._accessed.items()],
+            )
+            self._accessed.clear()
+
+    def flush(self) -> None:
+        """Write the access times of hits since the last write."""
+        with self._lock:
+            if self._accessed:
+                self._write_accessed()
+                self._db.commit()
+
+    def put(self, key: str, response: str) -> None:
+        now = time.time()
+        with self._lock:
+            existed = self._db.execute("SELECT 1 FROM responses WHERE key = ?", (key,)).fetchone() is not None
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, response, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, response, now, now),
+            )
+            if not existed:
+                self._count += 1
+            if self._count > self.max_entries:
+                # Eviction goes by last access, so pending hits must count
+                self._write_accessed()
+                excess = self._count - self.max_entries
+                self._db.execute(
+                    "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_access ASC LIMIT ?)",
+                    (excess,),
+                )
+                self._count -= excess
+            self._db.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._write_accessed()
+            self._db.commit()
+            self._db.close()
+
+
+def normalize_messages(messages: Sequence[BaseMessage]) -> List[Dict[str, Any]]:
+    """
+    Reduce messages to the fields that determine the model's answer.
+
+    Tool call ids are left out: providers generate them randomly, and the order of
+    calls and results already ties them together.
+    """
+    normalized = []
+    for message in messages:
+        entry: Dict[str, Any] = {"type": message.type, "content": message.content}
+        if isinstance(message, AIMessage) and message.tool_calls:
+            entry["tool_calls"] = [{"name": c["name"], "args": c["args"]} for c in message.tool_calls]
+        if getattr(message, "name", None):
+            entry["name"] = message.name
+        normalized.append(entry)
+    return normalized
+
+
+class CachingModelClient:
+    """A chat model with tools bound, answering from the cache where possible."""
+
+    def __init__(self, bound_client: Any, store: LLMCacheStore, mode: CacheMode, key_prefix: Dict[str, Any]) -> None:
+        self._bound_client = bound_client
+        self._store = store
+        self._mode = CacheMode(mode)
+        self._key_prefix = key_prefix
+
+    def cache_key(self, messages: Sequence[BaseMessage]) -> str:
+        payload = dict(self._key_prefix, messages=normalize_messages(messages))
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+    def _lookup(self, key: str) -> Optional[AIMessage]:
+        if self._mode == CacheMode.REFRESH:
+            return None
+        cached = self._store.get(key)
+        if cached is not None:
+            logger.debug(f"LLM cache hit {key}")
+            return messages_from_dict([json.loads(cached)])[0]
+        if self._mode == CacheMode.REPLAY:
+            raise LLMCacheMiss(f"No recorded response for request {key}")
+        return None
+
+    def _record(self, key: str, response: AIMessage) -> AIMessage:
+        self._store.put(key, json.dumps(messages_to_dict([response])[0]))
+        return response
+
+    def invoke(self, input: Any, **kwargs: Any) -> AIMessage:
+        key = self.cache_key(convert_to_messages([input] if isinstance(input, str) else input))
+        cached = self._lookup(key)
+        if cached is not None:
+            return cached
+        return self._record(key, self._bound_client.invoke(input, **kwargs))
+
+    async def ainvoke(self, input: Any, **kwargs: Any) -> AIMessage:
+        key = self.cache_key(convert_to_messages([input] if isinstance(input, str) else input))
+        # The store blocks on SQLite, so it is kept off the event loop
+        cached = await asyncio.to_thread(self._lookup, key)
+        if cached is not None:
+            return cached
+        response = await self._bound_client.ainvoke(input, **kwargs)
+        return await asyncio.to_thread(self._record, key, response)
+
+
+class CachingChatModel:
+    """
+    Drop-in replacement for the chat model passed to CodingAgent.
+
+    Args:
+        model_client: The real chat model; may be None in replay mode
+        store: Where responses are kept
+        mode: RECORD, REPLAY or REFRESH
+        namespace: Extra key component, e.g. to keep recordings of prompt variants apart
+        model_name: Model name used in the key; defaults to the model client's, and must
+            match the recording when replaying without a client
+    """
+
+    def __init__(
+        self,
+        model_client: Any,
+        store: LLMCacheStore,
+        mode: CacheMode = CacheMode.RECORD,
+        namespace: str = "",
+        model_name: Optional[str] = None,
+    ) -> None:
+        if model_client is None and CacheMode(mode) != CacheMode.REPLAY:
+            raise ValueError("A model client is required unless the cache is in replay mode")
+        self._model_client = model_client
+        self._store = store
+        self._mode = CacheMode(mode)
+        self._namespace = namespace
+        self._model_name = model_name or getattr(model_client, "model_name", None)
+
+    @property
+    def store(self) -> LLMCacheStore:
+        return self._store
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> CachingModelClient:
+        bound = self._model_client.bind_tools(tools, **kwargs) if self._model_client is not None else None
+        schemas = getattr(bound, "kwargs", {}).get("tools") or [convert_to_openai_tool(tool) for tool in tools or []]
+        key_prefix = {
+            "model": self._model_name,
+            "namespace": self._namespace,
+            "tools": schemas,
+        }
+        return CachingModelClient(bound, self._store, self._mode, key_prefix)
@@ -52,7 +52,7 @@ Your primary role is to assist users by executing commands, modifying code, and
 - Always put your tool call in the end of your response, no suffix needed.
 - Always explain your reasoning before using any tools
 - Use tools to gather concrete information about the codebase
-- One tool call at a time
+- Independent tool calls can be issued together in one response; they run concurrently, and calls on the same file run in the order given; bash commands run in order with file tools but concurrently with each other, so issue dependent commands in separate responses
 </TOOL_USAGE>
 """
 
@@ -144,8 +144,9 @@ SYSTEM_PROMPT_TEMPLATE = """
 {example}
 
 ----------------Task Starts----------------
-Task: {task}
+"""
 
+TASK_PROMPT_TEMPLATE = """Task: {task}
 """
 
 
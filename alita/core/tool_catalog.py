@@ -0,0 +1,81 @@
+"""
+Per-tool-set data that does not change between agents or tasks.
+
+Building the tools prompt, the system prompt and the tool schemas is repeated
+work when a service creates an agent per request. A ToolCatalog does it once
+per tool set, and remembers the model clients its schemas were bound to.
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Sequence, Tuple
+
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from alita.core.prompts.coding_agent_prompt import SYSTEM_PROMPT_TEMPLATE, SYSTEM_PREFIX, RUNNING_EXAMPLE
+
+
+# Model clients a catalog keeps bindings for; services normally share one client.
+MAX_BOUND_CLIENTS = 8
+
+Tool = Callable[..., Any] | Callable[..., Awaitable[Any]]
+
+
+def construct_tools_prompt(tools: Sequence[Tool]) -> str:
+    tool_prompt = "You have access to following functions/tools:\n\n"
+    index = 0
+    for tool in tools:
+        index += 1
+        tool_prompt += f"---- BEGIN FUNCTION #{index} {tool.__name__} ----\n"
+        tool_prompt += tool.__doc__
+        tool_prompt += f"\n---- END FUNCTION #{index} ----\n\n"
+
+    return tool_prompt
+
+
+class ToolCatalog:
+    """
+    The tools prompt, system prompt and tool schemas of one tool set.
+
+    Use get_tool_catalog() to share catalogs between agents.
+    """
+
+    def __init__(self, tools: Sequence[Tool]) -> None:
+        self.tools: Tuple[Tool, ...] = tuple(tools)
+        self.tools_prompt = construct_tools_prompt(self.tools)
+        self.system_prompt = SYSTEM_PROMPT_TEMPLATE.format(
+            prefix=SYSTEM_PREFIX, tools=self.tools_prompt, example=RUNNING_EXAMPLE
+        )
+        self.schemas: List[Dict[str, Any]] = [convert_to_openai_tool(tool) for tool in self.tools]
+        # id(model_client) -> (model_client, client with the schemas bound), most recent last.
+        # The bound client references the model client anyway, so the entry holds it strongly.
+        self._bound: OrderedDict[int, Tuple[Any, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def bind(self, model_client: Any) -> Any:
+        """Return ``model_client`` with this catalog's tools bound, reusing earlier bindings."""
+        key = id(model_client)
+        with self._lock:
+            entry = self._bound.get(key)
+            if entry is not None and entry[0] is model_client:
+                self._bound.move_to_end(key)
+                return entry[1]
+        bound = model_client.bind_tools(self.schemas)
+        with self._lock:
+            self._bound[key] = (model_client, bound)
+            while len(self._bound) > MAX_BOUND_CLIENTS:
+                self._bound.popitem(last=False)
+        return bound
+
+
+_catalogs: Dict[Tuple[Tool, ...], ToolCatalog] = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_tool_catalog(tools: Sequence[Tool] | None) -> ToolCatalog:
+    """Return the shared catalog of a tool set, building it on first use."""
+    key = tuple(tools or ())
+    with _catalogs_lock:
+        catalog = _catalogs.get(key)
+        if catalog is None:
+            catalog = _catalogs[key] = ToolCatalog(key)
+        return catalog
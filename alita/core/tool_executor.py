@@ -0,0 +1,168 @@
+"""
+Execution of registered tools from inside the agent's event loop.
+
+Coroutine tools are awaited directly. Sync tools (bash, file I/O) are offloaded
+to a bounded thread pool so that a running tool never blocks the loop, and
+many agents can share one loop.
+"""
+import asyncio
+import contextvars
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from alita.core.tools.files.observation import Observation
+from alita.core.utils import ACCESS_REGISTRY, FUNCTION_REGISTRY, ToolAccess, ToolSpec, get_tool_access, get_tool_spec
+
+
+logger = logging.getLogger(__name__)
+
+# Size of the thread pool shared by all agents that don't bring their own.
+DEFAULT_MAX_WORKERS = 8
+
+_default_thread_pool: Optional[ThreadPoolExecutor] = None
+_default_thread_pool_lock = threading.Lock()
+
+
+def get_default_thread_pool() -> ThreadPoolExecutor:
+    """Return the process-wide thread pool for sync tools."""
+    global _default_thread_pool
+    with _default_thread_pool_lock:
+        if _default_thread_pool is None:
+            _default_thread_pool = ThreadPoolExecutor(max_workers=DEFAULT_MAX_WORKERS, thread_name_prefix="alita-tool")
+        return _default_thread_pool
+
+
+class ToolExecutor:
+    """
+    Runs tool calls against the function registry.
+
+    Args:
+        thread_pool: Pool for sync tools; defaults to the process-wide pool
+        registry: Name -> function mapping to dispatch on
+        access_registry: Name -> ToolAccess resolver used to order concurrent calls
+    """
+
+    def __init__(
+        self,
+        thread_pool: Optional[ThreadPoolExecutor] = None,
+        registry: Optional[Dict[str, Callable]] = None,
+        access_registry: Optional[Dict[str, Callable[[Dict[str, Any]], ToolAccess]]] = None,
+    ) -> None:
+        self._thread_pool = thread_pool
+        self._registry = registry if registry is not None else FUNCTION_REGISTRY
+        self._access_registry = access_registry if access_registry is not None else ACCESS_REGISTRY
+        self._specs: Dict[str, ToolSpec] = {}
+
+    def _get_spec(self, name: str) -> Optional[ToolSpec]:
+        spec = self._specs.get(name)
+        func = self._registry.get(name)
+        if spec is None or spec.func is not func:
+            if func is None:
+                return None
+            spec = self._specs[name] = get_tool_spec(func)
+        return spec
+
+    async def call(self, spec: ToolSpec, kwargs: Dict[str, Any]) -> Any:
+        """Await a coroutine tool, or run a sync one on the thread pool."""
+        func = spec.func
+        if spec.is_async:
+            return await func(**kwargs)
+        loop = asyncio.get_running_loop()
+        # Copy the context so context variables, like the sticky shell key, reach the thread.
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(
+            self._thread_pool or get_default_thread_pool(),
+            functools.partial(context.run, func, **kwargs),
+        )
+
+    async def execute(self, name: str, args: Dict[str, Any]) -> Observation:
+        """
+        Execute a function call from the LLM response.
+
+        Args:
+            name: Name of the registered function
+            args: Arguments from the tool call
+
+        Returns:
+            Observation: Result of the function execution, or an error observation
+        """
+        spec = self._get_spec(name)
+        if spec is None:
+            return Observation(content=f"Error: Function '{name}' not found in registry")
+        try:
+            return await self.call(spec, spec.coerce_args(args))
+        except Exception as e:
+            logger.exception(f"Tool {name} failed")
+            return Observation(content=f"Error executing function call: {str(e)}")
+
+    async def _execute_after(self, dependencies: Set[asyncio.Task], name: str, args: Dict[str, Any]) -> Observation:
+        if dependencies:
+            await asyncio.wait(dependencies)
+        return await self.execute(name, args)
+
+    async def execute_many(self, calls: List[Tuple[str, Dict[str, Any]]]) -> List[Observation]:
+        """
+        Execute several tool calls concurrently where their ToolAccess allows it.
+
+        A call waits for the earlier calls it conflicts with: writers of a path wait for
+        earlier readers and writers of it, readers wait for earlier writers, calls that
+        read every path wait for all earlier writers, calls that write every path wait
+        for all earlier readers and writers, and exclusive calls act as barriers. Calls
+        that write every path are not ordered against each other. Results are returned
+        in the order of ``calls``.
+        """
+        tasks: List[asyncio.Task] = []
+        last_writer: Dict[str, asyncio.Task] = {}
+        readers: Dict[str, List[asyncio.Task]] = {}
+        # Calls that may read any path, and calls that may write any path, since the last barrier
+        all_readers: List[asyncio.Task] = []
+        all_writers: List[asyncio.Task] = []
+        barrier: Optional[asyncio.Task] = None
+        for name, args in calls:
+            access = get_tool_access(name, args, self._access_registry)
+            if access.exclusive:
+                dependencies = set(tasks)
+            else:
+                dependencies = {barrier} if barrier else set()
+                if access.writes_all:
+                    dependencies.update(last_writer.values())
+                    dependencies.update(all_readers)
+                    for path_readers in readers.values():
+                        dependencies.update(path_readers)
+                elif access.reads_all:
+                    dependencies.update(last_writer.values())
+                    dependencies.update(all_writers)
+                for path in access.reads:
+                    if path in last_writer:
+                        dependencies.add(last_writer[path])
+                for path in access.writes:
+                    if path in last_writer:
+                        dependencies.add(last_writer[path])
+                    dependencies.update(readers.get(path, []))
+                if access.writes:
+                    dependencies.update(all_readers)
+                if access.reads or access.writes:
+                    dependencies.update(all_writers)
+
+            task = asyncio.ensure_future(self._execute_after(dependencies, name, args))
+            tasks.append(task)
+            if access.exclusive:
+                barrier = task
+                # Everything earlier is behind the barrier now
+                last_writer.clear()
+                readers.clear()
+                all_readers.clear()
+                all_writers.clear()
+            elif access.writes_all:
+                all_writers.append(task)
+            elif access.reads_all:
+                all_readers.append(task)
+            for path in access.reads:
+                readers.setdefault(path, []).append(task)
+            for path in access.writes:
+                last_writer[path] = task
+                readers.pop(path, None)
+        return list(await asyncio.gather(*tasks))
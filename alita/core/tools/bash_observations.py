@@ -5,11 +5,18 @@ from alita.core.tools.files.observation import Observation
 
 
 
-@dataclass
+@dataclass(slots=True)
 class BashObservation(Observation):
     command: str
     exit_code: int
     error: str
+    # Size of the full output and how much of its middle was left out of content.
+    total_bytes: int = 0
+    dropped_bytes: int = 0
+
+    @property
+    def truncated(self) -> bool:
+        return self.dropped_bytes > 0
 
     @property
     def message(self) -> str:
@@ -0,0 +1,69 @@
+"""
+Bounded capture of bash command output.
+
+Commands can print far more than is useful to the model. The buffer keeps the
+first and last bytes of the output up to a fixed budget and only counts what
+falls in between, so memory stays constant however long the output is.
+"""
+from collections import deque
+from typing import Deque, Optional
+
+# Default budget for the start and the end of a command's output.
+OUTPUT_HEAD_BYTES = 16 * 1024
+OUTPUT_TAIL_BYTES = 16 * 1024
+
+
+class BoundedOutputBuffer:
+    """Keeps a head and a tail window of a byte stream and counts the dropped middle."""
+
+    def __init__(self, head_bytes: Optional[int] = None, tail_bytes: Optional[int] = None) -> None:
+        self.head_bytes = OUTPUT_HEAD_BYTES if head_bytes is None else head_bytes
+        self.tail_bytes = OUTPUT_TAIL_BYTES if tail_bytes is None else tail_bytes
+        self._head = bytearray()
+        self._tail: Deque[bytes] = deque()
+        self._tail_size = 0
+        self.total_bytes = 0
+        self.dropped_bytes = 0
+
+    @property
+    def truncated(self) -> bool:
+        return self.dropped_bytes > 0
+
+    def feed(self, data: bytes) -> None:
+        self.total_bytes += len(data)
+        room = self.head_bytes - len(self._head)
+        if room > 0:
+            self._head += data[:room]
+            data = data[room:]
+        if not data:
+            return
+        if len(data) >= self.tail_bytes:
+            # The chunk alone fills the tail window; everything buffered before it is dropped.
+            self.dropped_bytes += self._tail_size + len(data) - self.tail_bytes
+            self._tail.clear()
+            data = data[len(data) - self.tail_bytes:] if self.tail_bytes else b""
+            self._tail_size = 0
+        if data:
+            self._tail.append(data)
+            self._tail_size += len(data)
+        while self._tail_size > self.tail_bytes:
+            excess = self._tail_size - self.tail_bytes
+            oldest = self._tail[0]
+            if len(oldest) <= excess:
+                self._tail.popleft()
+                self._tail_size -= len(oldest)
+                self.dropped_bytes += len(oldest)
+            else:
+                self._tail[0] = oldest[excess:]
+                self._tail_size -= excess
+                self.dropped_bytes += excess
+
+    def render(self) -> str:
+        """Decode the kept windows, marking where output was dropped."""
+        tail = b"".join(self._tail)
+        if not self.truncated:
+            # One decode, so a character split across the head limit stays whole
+            return (bytes(self._head) + tail).decode("utf-8", errors="replace").replace("\r\n", "\n")
+        head = bytes(self._head).decode("utf-8", errors="replace")
+        text = f"{head}\n[... {self.dropped_bytes} bytes of output truncated ...]\n{tail.decode('utf-8', errors='replace')}"
+        return text.replace("\r\n", "\n")
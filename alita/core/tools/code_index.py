@@ -0,0 +1,461 @@
+"""
+Trigram index of the files under a directory, for fast code search.
+
+Every text file is broken into the set of three-byte sequences it contains
+(lowercased, so the index serves case-insensitive queries too). A query is
+turned into the trigrams any match must contain: all of them for a literal,
+those of the literal runs the regex requires for a regex. Intersecting their
+posting lists leaves a few candidate files, and only those are read and
+searched.
+
+The index is kept current by rescanning file metadata: a rescan walks the
+tree and reindexes files whose (mtime_ns, size) changed. Only the first
+search waits for one. Once a search is done, it starts a rescan on a background
+thread if the last one is older than the refresh interval; no search waits
+for a rescan after the first.
+Files written by the file tools are reported to the index and rechecked on
+the next search; a directory reported as changed, like the working directory
+of a bash command, starts a background rescan right away. Postings are append
+only; a changed or deleted file's old id is marked dead and the postings are
+compacted once dead ids make up half of them.
+"""
+import logging
+import os
+import re
+import threading
+import time
+from array import array
+from stat import S_ISREG
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+from alita.core.tools.files.file_cache import add_change_listener
+from alita.core.tools.files.file_stream import SNIFF_BYTES, sniff_bytes
+
+logger = logging.getLogger(__name__)
+
+# Directories never indexed.
+IGNORED_DIRS = frozenset({
+    '.git', '.hg', '.svn', '__pycache__', 'node_modules', '.venv', 'venv', '.tox', '.mypy_cache', '.pytest_cache',
+})
+# Larger files are skipped, like minified bundles and data dumps.
+MAX_INDEXED_FILE_BYTES = 1024 * 1024
+# Seconds a search trusts the last rescan before starting another in the background.
+REFRESH_INTERVAL = 2.0
+
+_TRIGRAMS = re.compile(r'(?=(...))', re.DOTALL)
+
+
+def trigrams(text: str) -> Set[str]:
+    return set(_TRIGRAMS.findall(text))
+
+
+def _index_text(data: bytes) -> str:
+    # latin-1 maps every byte to one character, so trigrams are byte trigrams
+    return data.lower().decode('latin-1')
+
+
+@dataclass(slots=True)
+class IndexedFile:
+    path: str
+    mtime_ns: int
+    size: int
+    # Number of postings of the file
+    trigrams: int = 0
+
+
+def _literal_runs(parsed) -> Iterator[str]:
+    """Literal strings every match of a parsed regex must contain, as far as can be told cheaply."""
+    run: List[str] = []
+    for op, value in parsed:
+        if op is sre_parse.LITERAL:
+            run.append(chr(value))
+            continue
+        if run:
+            yield ''.join(run)
+            run = []
+        if op is sre_parse.SUBPATTERN:
+            # A group, possibly capturing: its contents are required too
+            yield from _literal_runs(value[-1])
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) and value[0] >= 1:
+            yield from _literal_runs(value[2])
+    if run:
+        yield ''.join(run)
+
+
+def required_trigrams(query: str, regex: bool, ignore_case: bool = False) -> Set[str]:
+    """Index trigrams every match of ``query`` contains."""
+    if regex:
+        try:
+            literals = list(_literal_runs(sre_parse.parse(query)))
+        except (re.error, OverflowError, RecursionError):
+            return set()
+    else:
+        literals = [query]
+    required: Set[str] = set()
+    for literal in literals:
+        required |= trigrams(_index_text(literal.encode('utf-8')))
+    if ignore_case:
+        # The index only folds ASCII case
+        required = {trigram for trigram in required if trigram.isascii()}
+    return required
+
+
+@dataclass
+class SearchHit:
+    path: str
+    line_number: int
+    line: str
+    # (line number, line) pairs around the hit
+    before: List[Tuple[int, str]] = field(default_factory=list)
+    after: List[Tuple[int, str]] = field(default_factory=list)
+
+
+@dataclass
+class SearchResult:
+    hits: List[SearchHit]
+    candidates: int
+    files_indexed: int
+    truncated: bool
+
+
+class CodeIndex:
+    """
+    Trigram index of the text files under ``root``.
+
+    Args:
+        root: Directory to index.
+        refresh_interval: Seconds a search trusts the last rescan before starting another.
+        max_file_bytes: Files larger than this are not indexed or searched.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        refresh_interval: float = REFRESH_INTERVAL,
+        max_file_bytes: int = MAX_INDEXED_FILE_BYTES,
+    ) -> None:
+        self.root = os.path.abspath(root)
+        self.refresh_interval = refresh_interval
+        self.max_file_bytes = max_file_bytes
+        self._files: Dict[int, IndexedFile] = {}
+        self._ids: Dict[str, int] = {}
+        # Binary and oversized files, with their (mtime_ns, size), so they are not read again until they change
+        self._skipped: Dict[str, Tuple[int, int]] = {}
+        # Paths reported as changed, rechecked by the next refresh even between rescans
+        self._stale: Set[str] = set()
+        self._postings: Dict[str, array] = {}
+        self._dead = 0
+        self._posting_entries = 0
+        self._next_id = 0
+        self._refreshed_at: Optional[float] = None
+        self._rescan_thread: Optional[threading.Thread] = None
+        # Guards the index; held per file during a rescan, so searches run between files
+        self._lock = threading.RLock()
+        # Held for a whole rescan, so only one walks the tree at a time
+        self._rescan_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+    def _walk(self) -> Iterator[os.DirEntry]:
+        stack = [self.root]
+        while stack:
+            directory = stack.pop()
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name not in IGNORED_DIRS:
+                                stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            yield entry
+            except OSError:
+                continue
+
+    def mark_stale(self, path: str) -> None:
+        """
+        Have the index recheck ``path``, an absolute path, if it is under the root.
+
+        A file is rechecked by the next refresh. A directory containing or under
+        the root starts a background rescan.
+        """
+        relative = os.path.relpath(path, self.root)
+        if os.path.isdir(path):
+            overlaps = not relative.startswith(os.pardir) or not os.path.relpath(self.root, path).startswith(os.pardir)
+            # Before the first search there is nothing to bring up to date
+            if overlaps and self._refreshed_at is not None:
+                self._start_rescan()
+            return
+        if relative.startswith(os.pardir) or any(part in IGNORED_DIRS for part in relative.split(os.sep)):
+            return
+        with self._lock:
+            self._stale.add(path)
+
+    def _update(self, path: str, stat: os.stat_result) -> bool:
+        """Reindex ``path`` if its version changed; returns whether it did."""
+        version = (stat.st_mtime_ns, stat.st_size)
+        file_id = self._ids.get(path)
+        if file_id is not None:
+            indexed = self._files[file_id]
+            if (indexed.mtime_ns, indexed.size) == version:
+                return False
+            self._remove(path)
+        elif self._skipped.get(path) == version:
+            return False
+        if stat.st_size <= self.max_file_bytes and self._add(path, stat):
+            self._skipped.pop(path, None)
+        else:
+            self._skipped[path] = version
+        return True
+
+    def _recheck(self, path: str) -> bool:
+        """Reindex or drop ``path`` from a fresh stat; returns whether it changed."""
+        try:
+            stat = os.stat(path, follow_symlinks=False)
+        except OSError:
+            stat = None
+        if stat is not None and S_ISREG(stat.st_mode):
+            return self._update(path, stat)
+        if path in self._ids or path in self._skipped:
+            self._remove(path)
+            self._skipped.pop(path, None)
+            return True
+        return False
+
+    def _refresh_stale(self) -> int:
+        changed = sum(self._recheck(path) for path in self._stale)
+        self._stale.clear()
+        return changed
+
+    def refresh(self, force: bool = False) -> int:
+        """
+        Bring the index up to date; returns how many files were reindexed.
+
+        The first refresh, or a forced one, rescans the tree. Others recheck the
+        files reported as changed, and start a background rescan if the last one
+        is older than the refresh interval.
+        """
+        if force or self._refreshed_at is None:
+            return self._rescan()
+        with self._lock:
+            changed = self._refresh_stale()
+        self._rescan_if_due()
+        return changed
+
+    def _rescan_if_due(self) -> None:
+        if time.monotonic() - self._refreshed_at >= self.refresh_interval:
+            self._start_rescan()
+
+    def _start_rescan(self) -> None:
+        with self._lock:
+            if self._rescan_thread is not None and self._rescan_thread.is_alive():
+                return
+            self._rescan_thread = threading.Thread(
+                target=self._background_rescan, name=f"code-index-{os.path.basename(self.root)}", daemon=True,
+            )
+            self._rescan_thread.start()
+
+    def _background_rescan(self) -> None:
+        try:
+            self._rescan()
+        except Exception:
+            logger.exception(f"Rescan of {self.root} failed")
+
+    def wait_for_rescan(self, timeout: Optional[float] = None) -> None:
+        """Wait for a background rescan, if one is running."""
+        thread = self._rescan_thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _rescan(self) -> int:
+        """Walk the tree and reindex files added, changed or removed since the last rescan."""
+        with self._rescan_lock:
+            with self._lock:
+                # The walk stats every file after this, so it sees whatever these were reported for
+                self._stale.clear()
+            changed = 0
+            seen: Set[str] = set()
+            for entry in self._walk():
+                try:
+                    stat = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                seen.add(entry.path)
+                with self._lock:
+                    changed += self._update(entry.path, stat)
+            with self._lock:
+                # Files the walk missed may have been created after their directory was listed
+                for path in [path for path in self._ids if path not in seen]:
+                    changed += self._recheck(path)
+                for path in [path for path in self._skipped if path not in seen]:
+                    if not os.path.lexists(path):
+                        del self._skipped[path]
+                if self._dead and self._dead * 2 >= self._posting_entries:
+                    self._compact()
+                self._refreshed_at = time.monotonic()
+            if changed:
+                logger.debug(f"Reindexed {changed} files under {self.root}")
+            return changed
+
+    def _add(self, path: str, stat: os.stat_result) -> bool:
+        try:
+            with open(path, 'rb') as f:
+                data = f.read(self.max_file_bytes + 1)
+        except OSError:
+            return False
+        if sniff_bytes(data[:SNIFF_BYTES]).binary:
+            return False
+        file_id = self._next_id
+        self._next_id += 1
+        found = trigrams(_index_text(data))
+        self._files[file_id] = IndexedFile(path, stat.st_mtime_ns, stat.st_size, len(found))
+        self._ids[path] = file_id
+        for trigram in found:
+            postings = self._postings.get(trigram)
+            if postings is None:
+                postings = self._postings[trigram] = array('I')
+            postings.append(file_id)
+        self._posting_entries += len(found)
+        return True
+
+    def _remove(self, path: str) -> None:
+        file_id = self._ids.pop(path, None)
+        if file_id is not None:
+            # Its postings stay until the next compaction; candidates are checked against _files
+            self._dead += self._files.pop(file_id).trigrams
+
+    def _compact(self) -> None:
+        live = self._files
+        total = 0
+        for trigram in list(self._postings):
+            postings = array('I', (file_id for file_id in self._postings[trigram] if file_id in live))
+            if postings:
+                self._postings[trigram] = postings
+                total += len(postings)
+            else:
+                del self._postings[trigram]
+        self._posting_entries = total
+        self._dead = 0
+
+    def candidates(self, required: Set[str]) -> List[IndexedFile]:
+        """Files containing every trigram in ``required``; every file if it is empty."""
+        with self._lock:
+            if not required:
+                return sorted(self._files.values(), key=lambda indexed: indexed.path)
+            lists = []
+            for trigram in required:
+                postings = self._postings.get(trigram)
+                if postings is None:
+                    return []
+                lists.append(postings)
+            lists.sort(key=len)
+            matched = set(lists[0])
+            for postings in lists[1:]:
+                matched.intersection_update(postings)
+                if not matched:
+                    return []
+            return sorted((self._files[file_id] for file_id in matched if file_id in self._files),
+                          key=lambda indexed: indexed.path)
+
+    def search(
+        self,
+        query: str,
+        regex: bool = False,
+        ignore_case: bool = False,
+        max_results: int = 50,
+        context_lines: int = 0,
+        path_prefix: Optional[str] = None,
+    ) -> SearchResult:
+        """
+        Find lines matching ``query``.
+
+        Args:
+            query: Literal text, or a Python regular expression if ``regex``.
+            regex: Treat the query as a regular expression.
+            ignore_case: Match case-insensitively.
+            max_results: Stop after this many matching lines.
+            context_lines: Lines of context before and after each match.
+            path_prefix: Only search files under this path.
+
+        Returns:
+            SearchResult; ``truncated`` is set if the limit cut the results short.
+        """
+        if self._refreshed_at is None:
+            self.refresh()
+        else:
+            with self._lock:
+                self._refresh_stale()
+        try:
+            return self._search(query, regex, ignore_case, max_results, context_lines, path_prefix)
+        finally:
+            # Only once the search is done, so the two do not compete
+            self._rescan_if_due()
+
+    def _search(
+        self,
+        query: str,
+        regex: bool,
+        ignore_case: bool,
+        max_results: int,
+        context_lines: int,
+        path_prefix: Optional[str],
+    ) -> SearchResult:
+        pattern = re.compile(query if regex else re.escape(query), re.IGNORECASE if ignore_case else 0)
+        files = self.candidates(required_trigrams(query, regex, bool(pattern.flags & re.IGNORECASE)))
+        if path_prefix:
+            prefix = os.path.abspath(path_prefix)
+            files = [indexed for indexed in files if indexed.path == prefix or indexed.path.startswith(prefix + os.sep)]
+        hits: List[SearchHit] = []
+        for indexed in files:
+            try:
+                with open(indexed.path, 'rb') as f:
+                    text = f.read(self.max_file_bytes + 1).decode('utf-8', errors='replace')
+            except OSError:
+                continue
+            if not pattern.search(text):
+                continue
+            lines = text.splitlines()
+            for number, line in enumerate(lines):
+                if not pattern.search(line):
+                    continue
+                if len(hits) == max_results:
+                    return SearchResult(hits, len(files), len(self._files), truncated=True)
+                hits.append(SearchHit(
+                    path=indexed.path,
+                    line_number=number + 1,
+                    line=line,
+                    before=[(n + 1, lines[n]) for n in range(max(0, number - context_lines), number)],
+                    after=[(n + 1, lines[n]) for n in range(number + 1, min(len(lines), number + 1 + context_lines))],
+                ))
+        return SearchResult(hits, len(files), len(self._files), truncated=False)
+
+
+_indexes: Dict[str, CodeIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_code_index(root: str) -> CodeIndex:
+    """Return the process-wide index of ``root``, building it on first use."""
+    root = os.path.abspath(root)
+    with _indexes_lock:
+        index = _indexes.get(root)
+        if index is None:
+            index = _indexes[root] = CodeIndex(root)
+    return index
+
+
+def invalidate_code_index(path: str) -> None:
+    """Have every index that contains ``path`` recheck it, or rescan if it is a directory."""
+    with _indexes_lock:
+        indexes = list(_indexes.values())
+    for index in indexes:
+        index.mark_stale(path)
+
+
+add_change_listener(invalidate_code_index)
@@ -1,25 +1,248 @@
 """
 Standalone utility to execute bash commands in a tmux session, capture the output, and return the result.
 """
+import asyncio
+import codecs
 import os
+import select
+import shlex
 import time
 import uuid
-from typing import Optional, Dict, Any
-import libtmux
-import json
+from typing import Any, AsyncIterator, Callable, Dict, Optional
 
-from alita.core.utils import register_function
+from alita.core.utils import ToolAccess, register_function
 from alita.core.tools.bash_observations import BashObservation
+from alita.core.tools.bash_output import BoundedOutputBuffer
+from alita.core.tools.files.file_cache import notify_file_changed
+from alita.core.tools.tmux_session_pool import get_default_pool, current_sticky_key
 
-@register_function
+# Markers are printed with printf so the typed line never contains a literal marker.
+BEGIN_MARKER_FORMAT = "__ALITA_BEGIN_%s__\n"
+DONE_MARKER_FORMAT = "\n__ALITA_DONE_%s__\n"
+
+# How long to wait for output that was written before the exit code was reported.
+DRAIN_TIMEOUT = 1.0
+
+
+class _CommandOutputScanner:
+    """
+    Cuts one command's output out of the pane stream.
+
+    Bytes before the begin marker belong to earlier commands and are skipped. Bytes are
+    passed on to ``sink`` as they arrive, except for a tail that may be the start of a
+    done marker split across reads.
+    """
+
+    def __init__(self, token: str, sink: Callable[[bytes], None]) -> None:
+        # The tty turns printf's \n into \r\n.
+        self._begin = f"__ALITA_BEGIN_{token}__\r\n".encode()
+        self._done = f"\r\n__ALITA_DONE_{token}__".encode()
+        self._sink = sink
+        self._pending = b""
+        self.started = False
+        self.finished = False
+
+    def feed(self, data: bytes) -> None:
+        if self.finished or not data:
+            return
+        self._pending += data
+        if not self.started:
+            index = self._pending.find(self._begin)
+            if index < 0:
+                self._pending = self._pending[-len(self._begin):]
+                return
+            self._pending = self._pending[index + len(self._begin):]
+            self.started = True
+        index = self._pending.find(self._done)
+        if index >= 0:
+            self._sink(self._pending[:index])
+            self._pending = b""
+            self.finished = True
+            return
+        # Only a tail that could still grow into the done marker is held back.
+        keep = min(len(self._pending), len(self._done) - 1)
+        while keep and not self._done.startswith(self._pending[-keep:]):
+            keep -= 1
+        if len(self._pending) > keep:
+            self._sink(self._pending[:len(self._pending) - keep])
+            self._pending = self._pending[len(self._pending) - keep:]
+
+
+def run_bash_command(
+    command: str,
+    work_dir: Optional[str] = None,
+    timeout: int = 30,
+    on_output: Optional[Callable[[bytes], None]] = None,
+    head_bytes: Optional[int] = None,
+    tail_bytes: Optional[int] = None,
+) -> BashObservation:
+    """
+    Run a command on a pooled tmux session and collect its output.
+
+    Args:
+        command: The bash command to execute
+        work_dir: Working directory for the command
+        timeout: Maximum runtime in seconds
+        on_output: Called from the running thread with each raw output chunk
+        head_bytes: Bytes kept from the start of the output (default: OUTPUT_HEAD_BYTES)
+        tail_bytes: Bytes kept from the end of the output (default: OUTPUT_TAIL_BYTES)
+
+    Returns:
+        BashObservation: Output within the byte budget, exit code and truncation metadata
+    """
+    pool = get_default_pool()
+    sticky_key = current_sticky_key()
+    token = uuid.uuid4().hex[:12]
+    buffer = BoundedOutputBuffer(head_bytes, tail_bytes)
+
+    def sink(data: bytes) -> None:
+        buffer.feed(data)
+        if on_output and data:
+            on_output(data)
+
+    scanner = _CommandOutputScanner(token, sink)
+    shell = None
+    exit_code = None
+    error = None
+
+    try:
+        shell = pool.acquire(sticky_key=sticky_key, timeout=timeout)
+        # Sticky sessions keep their cwd unless a directory is requested explicitly.
+        shell.write_script(
+            command, work_dir=work_dir if sticky_key else (work_dir or os.getcwd()), save_state=bool(shell.sticky_key)
+        )
+        # Always a subshell, so `exit` cannot end the pooled shell; a sticky session then
+        # takes over the cwd and exported variables the command left behind.
+        restore = f"; . {shlex.quote(shell.state_path)}; : > {shlex.quote(shell.state_path)}" if shell.sticky_key else ""
+        # Drop anything printed since the previous command, e.g. by background jobs.
+        shell.output_fifo.read_available()
+        # The exit code goes out-of-band through the done FIFO; the done marker in the
+        # output stream tells us all output written before it has been received.
+        shell.pane.send_keys(
+            f"printf {shlex.quote(BEGIN_MARKER_FORMAT)} {token}; ( . {shlex.quote(shell.script_path)} ); __alita_rc=$?{restore}; "
+            f"printf {shlex.quote(DONE_MARKER_FORMAT)} {token}; "
+            f"printf '%s %s\\n' {token} \"$__alita_rc\" > {shlex.quote(shell.done_fifo.path)}; unset __alita_rc",
+            enter=True,
+            literal=True,
+        )
+
+        # Block until output arrives or the shell reports completion
+        deadline = time.monotonic() + timeout
+        while exit_code is None or not scanner.finished:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            readable, _, _ = select.select([shell.output_fifo, shell.done_fifo], [], [], remaining)
+            if shell.output_fifo in readable:
+                scanner.feed(shell.output_fifo.read_available())
+            if shell.done_fifo in readable and exit_code is None:
+                exit_code = shell.pop_exit_code(token)
+                if exit_code is not None:
+                    deadline = min(deadline, time.monotonic() + DRAIN_TIMEOUT)
+
+        if exit_code is None:
+            error = "Command timed out"
+            exit_code = -1
+        elif not scanner.finished:
+            error = "Command output may be incomplete"
+
+    except Exception as e:
+        error = str(e)
+        exit_code = -1
+
+    finally:
+        # Return the session to the pool, or drop it if it may still be running something
+        if shell:
+            if scanner.finished:
+                pool.release(shell)
+            else:
+                try:
+                    shell.pane.send_keys('C-c', enter=False)
+                except Exception:
+                    pass
+                pool.discard(shell)
+
+    return BashObservation(
+        content=buffer.render().rstrip("\n"),
+        command=command,
+        exit_code=exit_code,
+        error=error,
+        total_bytes=buffer.total_bytes,
+        dropped_bytes=buffer.dropped_bytes,
+    )
+
+
+class BashCommandStream:
+    """
+    Runs a bash command in a worker thread and yields its output as it arrives.
+
+    Usage:
+        stream = BashCommandStream("make test", work_dir="/project")
+        async for chunk in stream:
+            ...
+        observation = stream.observation
+    """
+
+    def __init__(self, command: str, work_dir: Optional[str] = None, timeout: int = 30, **kwargs: Any) -> None:
+        self.command = command
+        self.work_dir = work_dir
+        self.timeout = timeout
+        self._kwargs = kwargs
+        self.observation: Optional[BashObservation] = None
+
+    def __aiter__(self) -> AsyncIterator[str]:
+        return self._iterate()
+
+    async def _iterate(self) -> AsyncIterator[str]:
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+        def on_output(data: bytes) -> None:
+            loop.call_soon_threadsafe(queue.put_nowait, data)
+
+        # to_thread copies the context, so a sticky shell scope applies to the stream too.
+        task = asyncio.ensure_future(asyncio.to_thread(
+            run_bash_command, self.command, self.work_dir, self.timeout, on_output, **self._kwargs
+        ))
+        task.add_done_callback(lambda _: queue.put_nowait(None))
+        carry = ""
+        while True:
+            data = await queue.get()
+            if data is None:
+                break
+            text = carry + decoder.decode(data)
+            # Hold back a trailing \r in case its \n arrives with the next chunk.
+            carry = "\r" if text.endswith("\r") else ""
+            text = text[:len(text) - len(carry)].replace("\r\n", "\n")
+            if text:
+                yield text
+        text = carry + decoder.decode(b"", final=True)
+        if text:
+            yield text
+        self.observation = await task
+
+
+def stream_bash_command_tmux(command: str, work_dir: Optional[str] = None, timeout: int = 30, **kwargs: Any) -> BashCommandStream:
+    """Like execute_bash_command_tmux, but exposes the output as an async iterator of text chunks."""
+    return BashCommandStream(command, work_dir=work_dir, timeout=timeout, **kwargs)
+
+
+def _bash_access(args: Dict[str, Any]) -> ToolAccess:
+    # A command may read or write any file, so it is ordered against the file tools. Commands
+    # in separate shells are independent of each other; a sticky session runs one at a time.
+    return ToolAccess(reads_all=True, writes_all=True, exclusive=current_sticky_key() is not None)
+
+
+@register_function(access=_bash_access)
 def execute_bash_command_tmux(command: str, work_dir: Optional[str] = None, timeout: int = 30) -> Dict[str, Any]:
     """
     Execute a bash command in an isolated tmux session with full output capture.
     
     Key Features:
-    * Each command runs in a fresh tmux session to prevent environment contamination
+    * Each command runs in a clean shell from a pool of warm tmux sessions to prevent environment contamination
     * Full output capture including stdout, stderr and exit code
-    * Session cleanup after command completion
+    * Session reset after command completion
     * Timeout handling for long-running commands
     
     CRITICAL REQUIREMENTS:
@@ -39,6 +262,8 @@ def execute_bash_command_tmux(command: str, work_dir: Optional[str] = None, time
         - command (str): The bash command executed
         - exit_code (int): Command's exit code
         - error (str): Error message if any
+        - total_bytes (int): Size of the full output
+        - dropped_bytes (int): Bytes cut from the middle of the output to fit the budget
     
     Usage Examples:
     1. Basic command:
@@ -55,66 +280,8 @@ def execute_bash_command_tmux(command: str, work_dir: Optional[str] = None, time
     - Never pass untrusted user input directly to this function
     - Consider using command allowlists in production
     """
-    session_name = f"juno-tmp-{uuid.uuid4().hex[:8]}"
-    server = libtmux.Server()
-    session = None
-    output = ""
-    exit_code = 1  # Default to error state
-    error = None
-
     try:
-        # Create session with a known shell command
-        session = server.new_session(
-            session_name=session_name,
-            attach=False,
-            kill_session=True,
-            start_directory=work_dir or os.getcwd(),
-            window_command=f"bash -c '{command}; echo EXIT_CODE:$?; read -p \"Press enter to continue\"'"
-        )
-        pane = session.attached_pane
-        
-        # Wait for command to complete
-        start_time = time.time()
-        while time.time() - start_time < timeout:
-            # Get the current pane content
-            pane_output = '\n'.join(pane.cmd('capture-pane', '-p').stdout)
-            
-            # Check if command has completed
-            if 'EXIT_CODE:' in pane_output:
-                # Split output and get exit code
-                output, exit_info = pane_output.rsplit('EXIT_CODE:', 1)
-                output = output.strip()
-                
-                # Extract exit code (should be the last non-empty line after EXIT_CODE:)
-                exit_line = exit_info.strip().split('\n')[0].strip()
-                try:
-                    exit_code = int(exit_line)
-                except (ValueError, IndexError):
-                    exit_code = 1
-                    error = f"Failed to parse exit code from: {exit_line}"
-                break
-                
-            time.sleep(0.1)  # Small delay to prevent busy waiting
-            
-        else:
-            error = "Command timed out"
-            exit_code = -1
-
-    except Exception as e:
-        error = str(e)
-        exit_code = -1
-        
+        return run_bash_command(command, work_dir=work_dir, timeout=timeout)
     finally:
-        # Clean up the session
-        if session:
-            try:
-                session.kill_session()
-            except:
-                pass
-
-    return BashObservation(
-        content=output,
-        command=command,
-        exit_code=exit_code,
-        error=error,
-    )
\ No newline at end of file
+        # The command may have changed any file under its directory
+        notify_file_changed(work_dir or os.getcwd())
@@ -1,4 +1,4 @@
-from .file_observations import FileReadObservation, FileWriteObservation, FileEditObservation
+from .file_observations import FileReadObservation, FileWriteObservation, FileEditObservation, FileBatchObservation
 from .observation_types import ObservationType, FileEditSource, FileReadSource
 from .observation import Observation
 from .file_tools import read_file, write_file, edit_file, add_lines, remove_lines
@@ -7,6 +7,7 @@ __all__ = [
     "FileReadObservation",
     "FileWriteObservation",
     "FileEditObservation",
+    "FileBatchObservation",
     "ObservationType",
     "FileEditSource",
     "FileReadSource",
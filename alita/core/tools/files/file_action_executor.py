@@ -1,14 +1,23 @@
+import os
 from dataclasses import dataclass
-from typing import List
+from typing import List, Optional
 from .file_tools import read_file, write_file, edit_file, add_lines, remove_lines
+from .file_batch import apply_file_batch
+from .file_observations import FileBatchObservation
 from .observation import Observation
-from alita.core.utils import register_function
+from alita.core.utils import ToolAccess, register_function
 
 @dataclass
 class FileAction:
     path: str
 
+@dataclass
 class FileReadAction(FileAction):
+    # Optional line range [start_line, end_line) or byte range [start_byte, end_byte)
+    start_line: Optional[int] = None
+    end_line: Optional[int] = None
+    start_byte: Optional[int] = None
+    end_byte: Optional[int] = None
     type = "read"
 
 @dataclass
@@ -41,7 +50,13 @@ def _file_action_factory(action):
         raise TypeError("Action must be a FileAction or dict")
     action_type = action.get('type')
     if action_type == 'read':
-        return FileReadAction(path=action['path'])
+        return FileReadAction(
+            path=action['path'],
+            start_line=action.get('start_line'),
+            end_line=action.get('end_line'),
+            start_byte=action.get('start_byte'),
+            end_byte=action.get('end_byte'),
+        )
     elif action_type == 'write':
         return FileWriteAction(path=action['path'], content=action['content'])
     elif action_type == 'edit':
@@ -54,24 +69,42 @@ def _file_action_factory(action):
         raise ValueError(f"Unknown file action type: {action_type}")
 
 _ACTION_DISPATCH = {
-    'read':   lambda a: read_file(a.path),
+    'read':   lambda a: read_file(a.path, a.start_line, a.end_line, a.start_byte, a.end_byte),
     'write':  lambda a: write_file(a.path, a.content),
     'edit':   lambda a: edit_file(a.path, a.new_content),
     'add_lines': lambda a: add_lines(a.path, a.lines, a.position),
     'remove_lines': lambda a: remove_lines(a.path, a.start, a.end),
 }
 
-@register_function
+def _file_action_access(args) -> ToolAccess:
+    actions = args['action'] if isinstance(args['action'], list) else [args['action']]
+    reads, writes = set(), set()
+    for action in map(_file_action_factory, actions):
+        path = os.path.realpath(action.path)
+        (reads if action.type == 'read' else writes).add(path)
+    return ToolAccess(reads=frozenset(reads - writes), writes=frozenset(writes))
+
+
+def execute_file_actions(actions) -> FileBatchObservation:
+    """Apply a list of file actions, as FileAction objects or dicts, as one transaction. See execute_file_action."""
+    return apply_file_batch([_file_action_factory(action) for action in actions])
+
+@register_function(access=_file_action_access)
 def execute_file_action(action):
     """
     Unified interface to execute file actions.
 
     Parameters:
-        action (dict or FileAction subclass): The file action to perform. If a dict, it must have a 'type' key and the required fields for that action type.
+        action (dict or FileAction subclass, or a list of them): The file action to perform. If a dict, it must have a 'type' key and the required fields for that action type.
+            A list of actions is applied as one transaction: actions on the same file apply in order, each file is
+            written once, and if any action fails no file is changed.
 
     Supported action types and required parameters:
         - "read" or "FileReadAction":
             { "type": "read", "path": "<file_path>" }
+            Optionally a line range (0-based, end exclusive) or a byte range, to read part of a large file:
+            { "type": "read", "path": "<file_path>", "start_line": <int>, "end_line": <int> }
+            { "type": "read", "path": "<file_path>", "start_byte": <int>, "end_byte": <int> }
         - "write" or "FileWriteAction":
             { "type": "write", "path": "<file_path>", "content": "<text>" }
         - "edit" or "FileEditAction":
@@ -82,12 +115,14 @@ def execute_file_action(action):
             { "type": "remove_lines", "path": "<file_path>", "start": <int>, "end": <int> }
 
     Returns:
-        Observation: The result of the file action.
+        Observation: The result of the file action, or a FileBatchObservation combining those of a list of actions.
 
     Notes:
         - For compatibility with agent tool calls, dicts are converted to the appropriate FileAction subclass.
         - The function dispatches to the appropriate file operation (read, write, edit, add lines, remove lines) based on the action type.
     """
+    if isinstance(action, list):
+        return execute_file_actions(action)
     action_obj = _file_action_factory(action)
     handler = _ACTION_DISPATCH.get(action_obj.type)
     if handler:
@@ -0,0 +1,376 @@
+"""
+Transactional batches of file actions.
+
+A batch is applied in three steps. Actions are grouped by path and planned in
+order, without touching any file. Each changed file is then written once, to a
+temp file next to it. Only when every file has been staged are the temp files
+renamed over the originals; if anything fails, the originals are put back, so
+a batch either changes every file or none.
+
+While planning, line inserts and deletions are kept as a list of segments of
+the original file and new lines, and become one splice of the original (see
+``line_edits``), so large files are never loaded for line edits. A write or
+full edit, or a read after edits, switches the file to its contents in memory,
+edited with the same byte-level splice, so line endings and undecodable bytes
+survive.
+"""
+import bisect
+import io
+import os
+import re
+import shutil
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from .file_cache import get_default_file_cache
+from .file_observations import FileBatchObservation, FileEditObservation, FileReadObservation
+from .file_stream import SNIFF_BYTES, sniff_bytes
+from .file_tools import _decode_text, read_file
+from .line_diff import unified_diff
+from .line_edits import (
+    LineEdit, SpliceHunk, _SpliceWriter, _detect_newline, _normalize, discard_temp_file, forget_file,
+    make_temp_file, stage_line_edits,
+)
+from .line_index import get_line_index
+from .observation import Observation
+
+
+_ORIGINAL = 'original'
+_NEW = 'new'
+
+
+class _LinePlan:
+    """
+    Line inserts and deletions in the order given, each in the numbering left by the previous ones.
+
+    The file is a list of segments: ``('original', start, end)`` for a range of
+    original lines and ``('new', lines)`` for inserted lines. Edits only split
+    and drop segments, so the plan stays as small as the number of edits.
+    """
+
+    def __init__(self, line_count: int) -> None:
+        self.line_count = line_count
+        self.segments: List[tuple] = [(_ORIGINAL, 0, line_count)] if line_count else []
+        self.changed = False
+
+    def _split(self, position: int) -> int:
+        """Index of the segment that starts at line ``position``, splitting one if needed."""
+        offset = 0
+        for index, segment in enumerate(self.segments):
+            length = segment[2] - segment[1] if segment[0] == _ORIGINAL else len(segment[1])
+            if position <= offset:
+                return index
+            if position < offset + length:
+                cut = position - offset
+                if segment[0] == _ORIGINAL:
+                    parts = [(_ORIGINAL, segment[1], segment[1] + cut), (_ORIGINAL, segment[1] + cut, segment[2])]
+                else:
+                    parts = [(_NEW, segment[1][:cut]), (_NEW, segment[1][cut:])]
+                self.segments[index:index + 1] = parts
+                return index + 1
+            offset += length
+        return len(self.segments)
+
+    def insert(self, position: int, lines: List[str]) -> None:
+        index = self._split(max(0, position))
+        self.segments.insert(index, (_NEW, list(lines)))
+        self.changed = True
+
+    def delete(self, start: int, end: int) -> None:
+        start = max(0, start)
+        if end <= start:
+            return
+        first = self._split(start)
+        last = self._split(end)
+        del self.segments[first:last]
+        self.changed = True
+
+    def edits(self) -> List[LineEdit]:
+        """The plan as edits of the original file."""
+        edits = []
+        cursor = 0
+        pending: List[str] = []
+        for segment in self.segments:
+            if segment[0] == _NEW:
+                pending.extend(segment[1])
+                continue
+            _, start, end = segment
+            if start > cursor or pending:
+                edits.append(LineEdit(cursor, start, pending))
+                pending = []
+            cursor = end
+        if cursor < self.line_count or pending:
+            edits.append(LineEdit(cursor, self.line_count, pending))
+        return edits
+
+
+def _line_starts(data: bytes) -> List[int]:
+    """Byte offset of each line of ``data``, split on ``\\n`` only as the line index does."""
+    starts = [0] + [match.end() for match in re.finditer(b'\n', data)]
+    if starts[-1] == len(data):
+        starts.pop()
+    return starts
+
+
+def _splice_bytes(data: bytes, edits: List[LineEdit], encoding: str = 'utf-8') -> bytes:
+    """
+    ``data`` with ``edits`` applied, as ``stage_line_edits`` would write it.
+
+    Unchanged lines keep their bytes and endings, new lines take the file's line
+    ending, and edits are clamped to the file.
+    """
+    starts = _line_starts(data)
+    trailing_newline = data.endswith(b'\n') or not data
+    out = io.BytesIO()
+    writer = _SpliceWriter(out, _detect_newline(data or None))
+
+    def offset_of(line: int) -> int:
+        return starts[line] if line < len(starts) else len(data)
+
+    position = 0
+    for edit in _normalize(edits, len(starts)):
+        writer.copy(data, position, offset_of(edit.start))
+        writer.lines([line.encode(encoding) for line in edit.lines])
+        position = offset_of(edit.end)
+    writer.copy(data, position, len(data))
+    writer.finish(trailing_newline)
+    return out.getvalue()
+
+
+def _decode(data: bytes) -> str:
+    """Text of planned contents, decoded as ``read_file`` would decode the file."""
+    return _decode_text(data, sniff_bytes(data[:SNIFF_BYTES]).encoding)
+
+
+class _FilePlan:
+    """Everything a batch does to one file, under the path it was first named by."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        # A symlink is followed; its target is what gets replaced
+        self.target = os.path.realpath(path)
+        self.prev_exist = os.path.exists(self.target)
+        line_count = get_line_index(self.target).line_count if self.prev_exist else 0
+        self.lines: Optional[_LinePlan] = _LinePlan(line_count)
+        # In-memory contents, once the file has been written or read after an edit
+        self.original: Optional[bytes] = None
+        self.data: Optional[bytes] = None
+
+    @property
+    def changed(self) -> bool:
+        return self.data is not None or self.lines.changed
+
+    def _original(self) -> bytes:
+        if self.original is None:
+            self.original = get_default_file_cache().read(self.target) if self.prev_exist else b''
+        return self.original
+
+    def _materialize(self) -> None:
+        if self.data is None:
+            self.data = _splice_bytes(self._original(), self.lines.edits())
+            self.lines = None
+
+    def apply(self, action) -> Optional[Observation]:
+        """Plan one action; returns the observation of a read."""
+        if action.type == 'read':
+            if not self.changed:
+                return read_file(self.path, action.start_line, action.end_line, action.start_byte, action.end_byte)
+            self._materialize()
+            return self._read_planned(action)
+        if action.type in ('write', 'edit'):
+            if self.prev_exist:
+                self._original()
+            content = action.content if action.type == 'write' else action.new_content
+            self.data = content.encode('utf-8')
+            self.lines = None
+            return None
+        if action.type == 'remove_lines' and not self.prev_exist and not self.changed:
+            raise FileNotFoundError(f"File {self.path} does not exist.")
+        if self.data is not None:
+            if action.type == 'add_lines':
+                edit = LineEdit.insert(action.position, action.lines)
+            else:
+                edit = LineEdit.delete(action.start, action.end)
+            self.data = _splice_bytes(self.data, [edit])
+        elif action.type == 'add_lines':
+            self.lines.insert(action.position, action.lines)
+        else:
+            self.lines.delete(action.start, action.end)
+        return None
+
+    def _read_planned(self, action) -> FileReadObservation:
+        """A read of the planned contents, with a line or byte range as read_range takes them."""
+        bounds = (action.start_line, action.end_line, action.start_byte, action.end_byte)
+        if all(bound is None for bound in bounds):
+            return FileReadObservation(path=self.path, content=_decode(self.data))
+        data = self.data
+        encoding = sniff_bytes(data[:SNIFF_BYTES]).encoding or 'utf-8'
+        starts = _line_starts(data)
+        total = len(starts)
+        if action.start_line is not None or action.end_line is not None:
+            first = max(0, min(action.start_line or 0, total))
+            last = max(first, min(total, action.end_line if action.end_line is not None else total))
+            begin = starts[first] if first < total else len(data)
+            end = starts[last] if last < total else len(data)
+        else:
+            begin = max(0, min(action.start_byte or 0, len(data)))
+            end = max(begin, min(action.end_byte if action.end_byte is not None else len(data), len(data)))
+            first = max(0, bisect.bisect_right(starts, begin) - 1)
+            last = bisect.bisect_right(starts, end - 1) if end > begin else first
+        return FileReadObservation(
+            path=self.path,
+            content=data[begin:end].decode(encoding, errors='replace'),
+            start_line=first,
+            end_line=last,
+            total_lines=total,
+        )
+
+    def stage(self) -> Tuple[str, FileEditObservation]:
+        """Write the new contents to a temp file; returns its path and the edit's observation."""
+        if self.lines is not None:
+            temp_path, result = stage_line_edits(self.path, self.lines.edits())
+            diff = _render_hunks(self.path, result.hunks)
+            return temp_path, FileEditObservation(
+                path=self.path, prev_exist=self.prev_exist, content=diff, diff=diff,
+            )
+        fd, temp_path = make_temp_file(self.target)
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                if self.prev_exist:
+                    os.chmod(temp_path, os.stat(self.target).st_mode & 0o7777)
+                out.write(self.data)
+                out.flush()
+                os.fsync(out.fileno())
+        except BaseException:
+            discard_temp_file(temp_path)
+            raise
+        new_content = _decode(self.data)
+        return temp_path, FileEditObservation(
+            path=self.path,
+            prev_exist=self.prev_exist,
+            old_content=_decode(self.original) if self.original is not None else None,
+            new_content=new_content,
+            content=new_content,
+        )
+
+
+def _render_hunks(path: str, hunks: List[SpliceHunk]) -> str:
+    """Unified diff of a splice, from its hunks; there is no context around them."""
+    out = []
+    shift = 0
+    for hunk in hunks:
+        old_lines = hunk.old_text.splitlines()
+        new_lines = hunk.new_text.splitlines()
+        diff = unified_diff(old_lines, new_lines, context=0, first_line=hunk.start_line,
+                            new_first_line=hunk.start_line + shift)
+        if diff:
+            out.append(diff)
+        shift += len(new_lines) - len(old_lines)
+    return '\n'.join([f'--- {path}', f'+++ {path}'] + out) if out else ''
+
+
+@dataclass
+class _Staged:
+    path: str
+    # The file the temp file replaces: the path itself or the target of a symlink
+    target: str
+    temp_path: str
+    prev_exist: bool
+    backup_path: Optional[str] = None
+    replaced: bool = False
+
+
+def _backup(path: str) -> str:
+    """Keep the original under another name, as a hard link when the file system allows."""
+    fd, backup_path = make_temp_file(path)
+    os.close(fd)
+    os.unlink(backup_path)
+    try:
+        os.link(path, backup_path)
+    except OSError:
+        shutil.copy2(path, backup_path)
+    return backup_path
+
+
+def _commit(staged: List[_Staged]) -> None:
+    """Rename every temp file over its original, restoring all of them if one fails."""
+    try:
+        for entry in staged:
+            if entry.prev_exist:
+                entry.backup_path = _backup(entry.target)
+            os.replace(entry.temp_path, entry.target)
+            entry.replaced = True
+    except BaseException:
+        for entry in reversed(staged):
+            if entry.replaced:
+                if entry.backup_path is not None:
+                    os.replace(entry.backup_path, entry.target)
+                else:
+                    os.unlink(entry.target)
+            else:
+                discard_temp_file(entry.temp_path)
+                if entry.backup_path is not None:
+                    discard_temp_file(entry.backup_path)
+        raise
+    finally:
+        for entry in staged:
+            forget_file(entry.path)
+    for entry in staged:
+        if entry.backup_path is not None:
+            discard_temp_file(entry.backup_path)
+
+
+def apply_file_batch(actions: List) -> FileBatchObservation:
+    """
+    Apply a list of FileActions as one transaction and return a combined observation.
+
+    Actions on the same path apply in order, each seeing the result of the previous
+    ones; line numbers of add_lines and remove_lines refer to the file as the earlier
+    actions left it. Symlinks are followed, so paths naming the same file share its
+    actions. Each changed file is written once. If any action fails, no file is
+    changed and the error is raised.
+
+    Args:
+        actions: FileAction objects.
+
+    Returns:
+        FileBatchObservation with, per path, the observations of its reads and one edit
+        observation if it changed.
+    """
+    plans: Dict[str, _FilePlan] = {}
+    reads: Dict[str, List[Observation]] = {}
+    for action in actions:
+        path = os.path.realpath(action.path)
+        plan = plans.get(path)
+        if plan is None:
+            plan = plans[path] = _FilePlan(action.path)
+            reads[path] = []
+        observation = plan.apply(action)
+        if observation is not None:
+            reads[path].append(observation)
+
+    staged: List[_Staged] = []
+    edits: Dict[str, FileEditObservation] = {}
+    try:
+        for path, plan in plans.items():
+            if plan.changed:
+                temp_path, edits[path] = plan.stage()
+                staged.append(_Staged(
+                    path=plan.path, target=plan.target, temp_path=temp_path, prev_exist=plan.prev_exist,
+                ))
+    except BaseException:
+        for entry in staged:
+            discard_temp_file(entry.temp_path)
+        raise
+    _commit(staged)
+
+    observations: List[Observation] = []
+    for path in plans:
+        observations.extend(reads[path])
+        if path in edits:
+            observations.append(edits[path])
+    return FileBatchObservation(
+        content='\n'.join(str(observation) for observation in observations),
+        observations=observations,
+        paths=[plan.path for plan in plans.values()],
+    )
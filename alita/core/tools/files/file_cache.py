@@ -0,0 +1,158 @@
+"""
+Process-wide cache of file contents shared by the file tools.
+
+Entries are keyed by the file's path and version (mtime_ns, size, inode). A
+read stats the file and returns the cached bytes if the version still
+matches, so a file changed by anything else, such as a bash command, is read
+again. Writes through the file tools store what they wrote, so a read or an
+edit after a write costs no read either. The least recently used entries are
+evicted to keep the cache within a byte budget and an entry count.
+
+Other caches of file contents, like the code search index, register a change
+listener to hear about the files the file tools write.
+"""
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
+
+from .line_index import FileVersion
+
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_MAX_ENTRIES = 1024
+
+
+@dataclass
+class FileCacheMetrics:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    entries: int = 0
+    bytes: int = 0
+
+
+class FileContentCache:
+    """
+    LRU cache of file bytes, validated against the file's version on every read.
+
+    Args:
+        max_bytes: Total size of cached contents.
+        max_entries: Number of cached files.
+        max_entry_bytes: Files larger than this are read but not cached. Defaults to an eighth of max_bytes.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_entry_bytes: Optional[int] = None,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.max_entry_bytes = max_bytes // 8 if max_entry_bytes is None else max_entry_bytes
+        self._entries: "OrderedDict[str, Tuple[FileVersion, bytes]]" = OrderedDict()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._lock = threading.Lock()
+
+    def read(self, path: str) -> bytes:
+        """Return the contents of ``path``, from the cache if the file is unchanged."""
+        key = os.path.abspath(path)
+        version = FileVersion.of(os.stat(key))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry[1]
+            self._misses += 1
+        with open(key, 'rb') as f:
+            data = f.read()
+            version = FileVersion.of(os.fstat(f.fileno()))
+        self._store(key, version, data)
+        return data
+
+    def store(self, path: str, data: bytes) -> None:
+        """Record ``data`` as the current contents of ``path``, just written by the caller."""
+        key = os.path.abspath(path)
+        self._store(key, FileVersion.of(os.stat(key)), data)
+
+    def invalidate(self, path: str) -> None:
+        key = os.path.abspath(path)
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= len(entry[1])
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def metrics(self) -> FileCacheMetrics:
+        with self._lock:
+            return FileCacheMetrics(
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                entries=len(self._entries),
+                bytes=self._bytes,
+            )
+
+    def _store(self, key: str, version: FileVersion, data: bytes) -> None:
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous[1])
+            if len(data) > self.max_entry_bytes:
+                return
+            self._entries[key] = (version, data)
+            self._bytes += len(data)
+            while self._bytes > self.max_bytes or len(self._entries) > self.max_entries:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self._evictions += 1
+
+
+_default_cache: Optional[FileContentCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_file_cache() -> FileContentCache:
+    """Return the process-wide cache used by the file tools."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = FileContentCache()
+        return _default_cache
+
+
+def configure_default_file_cache(**kwargs) -> FileContentCache:
+    """Replace the process-wide cache with one built from ``kwargs``."""
+    global _default_cache
+    with _default_cache_lock:
+        _default_cache = FileContentCache(**kwargs)
+        return _default_cache
+
+
+_change_listeners: List[Callable[[str], None]] = []
+
+
+def add_change_listener(listener: Callable[[str], None]) -> None:
+    """
+    Call ``listener(path)`` with the absolute path of every file the file tools change.
+
+    A directory is reported when anything under it may have changed, e.g. after a bash command.
+    """
+    _change_listeners.append(listener)
+
+
+def notify_file_changed(path: str) -> None:
+    """Tell the change listeners that ``path`` was written, under its own name and through a link."""
+    for name in {os.path.abspath(path), os.path.realpath(path)}:
+        for listener in _change_listeners:
+            listener(name)
@@ -1,22 +1,45 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from .observation_types import ObservationType, FileEditSource, FileReadSource
 from .observation import Observation
-from typing import Optional
+from typing import List, Optional
+from .line_diff import diff_opcodes, group_opcodes, unified_diff
 
-@dataclass
+# Unchanged lines shown around each change in an edit's diff
+DIFF_CONTEXT_LINES = 3
+
+@dataclass(slots=True)
 class FileReadObservation(Observation):
     path: str
     observation: str = ObservationType.READ
     impl_source: FileReadSource = FileReadSource.DEFAULT
+    # Set for ranged reads: the lines [start_line, end_line) out of total_lines
+    start_line: Optional[int] = None
+    end_line: Optional[int] = None
+    total_lines: Optional[int] = None
+    # Set when the file was too large or binary and content is a head and tail preview
+    binary: bool = False
+    total_bytes: Optional[int] = None
+    dropped_bytes: int = 0
 
     @property
     def message(self) -> str:
         return f'I read the file {self.path}.'
 
     def __str__(self) -> str:
+        if self.dropped_bytes or self.binary:
+            kind = 'binary file' if self.binary else 'file'
+            return (
+                f'[Read preview of {kind} {self.path} ({self.total_bytes} bytes, '
+                f'{self.dropped_bytes} omitted).]\n{self.content}'
+            )
+        if self.total_lines is not None:
+            return (
+                f'[Read lines {self.start_line}-{self.end_line} of {self.total_lines} '
+                f'from {self.path} is successful.]\n{self.content}'
+            )
         return f'[Read from {self.path} is successful.]\n{self.content}'
 
-@dataclass
+@dataclass(slots=True)
 class FileWriteObservation(Observation):
     path: str
     observation: str = ObservationType.WRITE
@@ -28,7 +51,7 @@ class FileWriteObservation(Observation):
     def __str__(self) -> str:
         return f'[Write to {self.path} is successful.]\n{self.content}'
 
-@dataclass
+@dataclass(slots=True)
 class FileEditObservation(Observation):
     path: str = ''
     prev_exist: bool = False
@@ -38,11 +61,71 @@ class FileEditObservation(Observation):
     impl_source: FileEditSource = FileEditSource.LLM_BASED_EDIT
     diff: Optional[str] = None
     _diff_cache: Optional[str] = None
+    # Set for line edits: old_content and new_content are then the edited region starting at this line
+    start_line: Optional[int] = None
 
     @property
     def message(self) -> str:
         return f'I edited the file {self.path}.'
 
+    def __str__(self) -> str:
+        # The default dataclass repr would copy old_content, new_content and content into one string
+        if not self.prev_exist or self.old_content is None or self.new_content is None:
+            return f'[Edit of {self.path} is successful.]\n{self.content}'
+        # Changed lines with some context, rather than the whole file
+        return f'[Edit of {self.path} is successful.]\n{self.get_diff() or "(no changes)"}'
+
+    def get_diff(self, n_context_lines: int = DIFF_CONTEXT_LINES) -> str:
+        """Unified diff of the edit, computed on first use and memoized for the default context."""
+        if self.diff is not None:
+            return self.diff
+        if n_context_lines == DIFF_CONTEXT_LINES and self._diff_cache is not None:
+            return self._diff_cache
+        diff = unified_diff(
+            (self.old_content or '').splitlines(),
+            (self.new_content or '').splitlines(),
+            path=self.path,
+            context=n_context_lines,
+            first_line=self.start_line or 0,
+        )
+        if n_context_lines == DIFF_CONTEXT_LINES:
+            self._diff_cache = diff
+        return diff
+
     def get_edit_groups(self, n_context_lines: int = 2) -> list:
-        # Placeholder for diff logic, implement as needed
-        return []
+        """
+        Changed lines grouped into hunks, each as numbered lines before and after the edit.
+
+        Returns:
+            A list of {'before_edits': [...], 'after_edits': [...]} dicts. Lines read
+            "-12|text" when removed, "+12|text" when added and " 12|text" when unchanged.
+        """
+        old_lines = (self.old_content or '').splitlines()
+        new_lines = (self.new_content or '').splitlines()
+        first_line = (self.start_line or 0) + 1
+        groups = []
+        for group in group_opcodes(diff_opcodes(old_lines, new_lines), n_context_lines):
+            before, after = [], []
+            for opcode in group:
+                marker = ' ' if opcode.tag == 'equal' else None
+                for number in range(opcode.old_start, opcode.old_end):
+                    before.append(f'{marker or "-"}{first_line + number}|{old_lines[number]}')
+                for number in range(opcode.new_start, opcode.new_end):
+                    after.append(f'{marker or "+"}{first_line + number}|{new_lines[number]}')
+            groups.append({'before_edits': before, 'after_edits': after})
+        return groups
+
+
+@dataclass(slots=True)
+class FileBatchObservation(Observation):
+    """Result of a batch of file actions: one observation per edited file and per read."""
+    observations: List[Observation] = field(default_factory=list)
+    paths: List[str] = field(default_factory=list)
+    observation: str = ObservationType.BATCH
+
+    @property
+    def message(self) -> str:
+        return f'I applied file actions to {len(self.paths)} files.'
+
+    def __str__(self) -> str:
+        return f'[Batch of file actions on {len(self.paths)} files is successful.]\n{self.content}'
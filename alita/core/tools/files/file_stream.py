@@ -0,0 +1,140 @@
+"""
+Bounded reads for large and binary files.
+
+Whether a file is text, and in which encoding, is decided from a short prefix:
+a BOM, NUL bytes, whether the prefix decodes as UTF-8, and the share of control
+bytes. ``preview_file`` renders what a tool call should show of a file too
+large or not readable as text: a head and a tail window with a summary of what
+was left out, or a hex dump for binary files. It never holds the whole file.
+"""
+import codecs
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+from .line_index import get_line_index
+
+
+SNIFF_BYTES = 8 * 1024
+
+# Files larger than this are previewed instead of returned whole.
+MAX_INLINE_BYTES = 256 * 1024
+PREVIEW_HEAD_BYTES = 16 * 1024
+PREVIEW_TAIL_BYTES = 16 * 1024
+BINARY_PREVIEW_BYTES = 256
+
+# Share of control bytes above which an undecodable prefix is taken as binary.
+BINARY_CONTROL_RATIO = 0.3
+
+_BOMS = (
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+_TEXT_CONTROLS = frozenset(b'\t\n\r\f\b\x1b')
+
+
+@dataclass(frozen=True, slots=True)
+class FileSniff:
+    """What a file's prefix says about it. ``encoding`` is None for binary files."""
+    binary: bool
+    encoding: Optional[str]
+
+
+def sniff_bytes(prefix: bytes) -> FileSniff:
+    """Classify a file from its first bytes."""
+    for bom, encoding in _BOMS:
+        if prefix.startswith(bom):
+            return FileSniff(binary=False, encoding=encoding)
+    if b'\x00' in prefix:
+        return FileSniff(binary=True, encoding=None)
+    try:
+        # Not final: the prefix may end in the middle of a character
+        codecs.getincrementaldecoder('utf-8')().decode(prefix, final=False)
+        return FileSniff(binary=False, encoding='utf-8')
+    except UnicodeDecodeError:
+        pass
+    controls = sum(1 for byte in prefix if byte < 0x20 and byte not in _TEXT_CONTROLS)
+    if prefix and controls / len(prefix) > BINARY_CONTROL_RATIO:
+        return FileSniff(binary=True, encoding=None)
+    return FileSniff(binary=False, encoding='latin-1')
+
+
+def sniff_file(path: str) -> FileSniff:
+    with open(path, 'rb') as f:
+        return sniff_bytes(f.read(SNIFF_BYTES))
+
+
+@dataclass(slots=True)
+class FilePreview:
+    """Bounded view of a file: ``dropped_bytes`` were left out of ``content``."""
+    content: str
+    binary: bool
+    encoding: Optional[str]
+    total_bytes: int
+    dropped_bytes: int
+
+
+def _hexdump(data: bytes, offset: int) -> str:
+    rows = []
+    for start in range(0, len(data), 16):
+        row = data[start:start + 16]
+        hex_part = ' '.join(f'{byte:02x}' for byte in row)
+        text_part = ''.join(chr(byte) if 0x20 <= byte < 0x7f else '.' for byte in row)
+        rows.append(f'{offset + start:08x}  {hex_part:<47}  |{text_part}|')
+    return '\n'.join(rows)
+
+
+def preview_file(
+    path: str,
+    head_bytes: int = PREVIEW_HEAD_BYTES,
+    tail_bytes: int = PREVIEW_TAIL_BYTES,
+    sniff: Optional[FileSniff] = None,
+) -> FilePreview:
+    """
+    Render the head and tail of a file with a summary of the omitted middle.
+
+    Text windows are cut at line boundaries; binary files get a hex dump of
+    their first and last bytes.
+    """
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        sniff = sniff or sniff_bytes(f.read(SNIFF_BYTES))
+        if sniff.binary:
+            head_bytes = tail_bytes = BINARY_PREVIEW_BYTES
+        f.seek(0)
+        head = f.read(min(head_bytes, size))
+        tail_start = max(len(head), size - tail_bytes)
+        f.seek(tail_start)
+        tail = f.read()
+
+    if sniff.binary:
+        dropped = size - len(head) - len(tail)
+        parts = [f'Binary file, {size} bytes.', _hexdump(head, 0)]
+        if tail:
+            parts.append(f'... {dropped} bytes omitted ...')
+            parts.append(_hexdump(tail, tail_start))
+        return FilePreview('\n'.join(parts), True, None, size, dropped)
+
+    # Cut both windows at line boundaries when they have any
+    if tail_start > len(head) and b'\n' in head:
+        head = head[:head.rindex(b'\n') + 1]
+    if tail_start > len(head) and b'\n' in tail:
+        skipped = tail.index(b'\n') + 1
+        tail = tail[skipped:]
+        tail_start += skipped
+    dropped = tail_start - len(head)
+    head_text = head.decode(sniff.encoding, errors='replace')
+    tail_text = tail.decode(sniff.encoding, errors='replace')
+    if not dropped:
+        return FilePreview(head_text + tail_text, False, sniff.encoding, size, 0)
+    total_lines = get_line_index(path).line_count
+    head_lines = head.count(b'\n')
+    tail_lines = tail.count(b'\n') + (0 if tail.endswith(b'\n') or not tail else 1)
+    summary = (
+        f'... {dropped} bytes omitted: lines {head_lines}-{total_lines - tail_lines} of {total_lines}; '
+        f'read a line range to see them ...\n'
+    )
+    return FilePreview(head_text + summary + tail_text, False, sniff.encoding, size, dropped)
@@ -1,35 +1,94 @@
 from .file_observations import FileReadObservation, FileWriteObservation, FileEditObservation
-from typing import List
+from typing import List, Optional
 import os
+from .line_edits import LineEdit, SpliceResult, apply_line_edits
+from .file_cache import get_default_file_cache, notify_file_changed
+from .file_stream import MAX_INLINE_BYTES, SNIFF_BYTES, FileSniff, preview_file, sniff_bytes, sniff_file
+from .line_index import read_range
 from alita.core.utils import register_function
 
-def read_file(path: str) -> FileReadObservation:
+def read_file(
+    path: str,
+    start_line: Optional[int] = None,
+    end_line: Optional[int] = None,
+    start_byte: Optional[int] = None,
+    end_byte: Optional[int] = None,
+) -> FileReadObservation:
     """
     Read the contents of a file and return a FileReadObservation.
     
     Key Features:
-    - Reads both text and binary files
+    - Reads both text and binary files; the encoding is detected from the first bytes
     - Returns structured observation with file metadata
     - Handles file not found errors gracefully
+    - Ranged reads of a line or byte range, without reading the rest of the file
+    - Binary files and files over 256KB come back as a head and tail preview
     
     Parameters:
         path (str): Absolute path to the file to read
+        start_line (int, optional): First line to read (inclusive, 0-based)
+        end_line (int, optional): Line to stop before (exclusive)
+        start_byte (int, optional): First byte to read, if no line range is given
+        end_byte (int, optional): Byte to stop before
     
     Returns:
         FileReadObservation: Contains:
             - path: Original file path
             - content: File contents as string
             - exists: Whether file existed
+            - start_line, end_line, total_lines: For ranged reads
             
     Example:
         read_file("/path/to/file.txt")
+        read_file("/path/to/app.log", start_line=50000, end_line=50100)
     
     Note:
-        For large files (>10MB), consider streaming approaches instead
+        For large files, read the preview first, then the line or byte range needed
     """
-    with open(path, 'r', encoding='utf-8') as f:
-        content = f.read()
-    return FileReadObservation(path=path, content=content)
+    if any(bound is not None for bound in (start_line, end_line, start_byte, end_byte)):
+        file_range = read_range(path, start_line, end_line, start_byte, end_byte)
+        # The range may not include the head, so the encoding comes from the file's own prefix
+        encoding = sniff_file(path).encoding or 'utf-8'
+        return FileReadObservation(
+            path=path,
+            content=file_range.content.decode(encoding, errors='replace'),
+            start_line=file_range.start_line,
+            end_line=file_range.end_line,
+            total_lines=file_range.total_lines,
+        )
+    if os.path.getsize(path) > MAX_INLINE_BYTES:
+        return _preview_observation(path)
+    data = get_default_file_cache().read(path)
+    sniff = sniff_bytes(data[:SNIFF_BYTES])
+    if sniff.binary:
+        return _preview_observation(path, sniff)
+    return FileReadObservation(path=path, content=_decode_text(data, sniff.encoding))
+
+
+def _preview_observation(path: str, sniff: Optional[FileSniff] = None) -> FileReadObservation:
+    preview = preview_file(path, sniff=sniff)
+    return FileReadObservation(
+        path=path,
+        content=preview.content,
+        binary=preview.binary,
+        total_bytes=preview.total_bytes,
+        dropped_bytes=preview.dropped_bytes,
+    )
+
+
+def _decode_text(data: bytes, encoding: Optional[str]) -> str:
+    # Same result as reading in text mode, with universal newlines
+    text = data.decode(encoding or 'utf-8', errors='replace')
+    return text.replace('\r\n', '\n').replace('\r', '\n')
+
+
+def _write_through(path: str, content: str) -> None:
+    """Write ``content`` as UTF-8 and keep the file cache coherent."""
+    data = content.encode('utf-8')
+    with open(path, 'wb') as f:
+        f.write(data)
+    get_default_file_cache().store(path, data)
+    notify_file_changed(path)
 
 
 def write_file(path: str, content: str) -> FileWriteObservation:
@@ -57,8 +116,7 @@ def write_file(path: str, content: str) -> FileWriteObservation:
     Warning:
         Will overwrite existing files without confirmation
     """
-    with open(path, 'w', encoding='utf-8') as f:
-        f.write(content)
+    _write_through(path, content)
     return FileWriteObservation(path=path, content=content)
 
 
@@ -91,10 +149,9 @@ def edit_file(path: str, new_content: str) -> FileEditObservation:
     prev_exist = os.path.exists(path)
     old_content = None
     if prev_exist:
-        with open(path, 'r', encoding='utf-8') as f:
-            old_content = f.read()
-    with open(path, 'w', encoding='utf-8') as f:
-        f.write(new_content)
+        # Usually a cache hit: the model has read the file before editing it
+        old_content = _decode_text(get_default_file_cache().read(path), 'utf-8')
+    _write_through(path, new_content)
     return FileEditObservation(path=path, prev_exist=prev_exist, old_content=old_content, new_content=new_content, content=new_content)
 
 
@@ -105,7 +162,8 @@ def add_lines(path: str, lines: list[str], position: int) -> FileEditObservation
     Key Features:
     - Non-destructive insertion
     - Precise line number control (0-based)
-    - Preserves existing line endings
+    - Preserves existing line endings and the trailing newline
+    - Splices the file in place instead of rewriting it line by line
     
     Parameters:
         path (str): Absolute path to the file to modify
@@ -113,7 +171,7 @@ def add_lines(path: str, lines: list[str], position: int) -> FileEditObservation
         position (int): Line number to insert at (0=first line)
     
     Returns:
-        FileEditObservation: Contains before/after snapshots
+        FileEditObservation: Contains the inserted region, starting at start_line
     
     Example:
         add_lines("/path/to/file.txt", ["line1", "line2"], position=5)
@@ -121,21 +179,8 @@ def add_lines(path: str, lines: list[str], position: int) -> FileEditObservation
     Note:
         For appending, use position=len(file_lines)
     """
-    lines = list(lines)
-    prev_exist = os.path.exists(path)
-    old_content = None
-    if prev_exist:
-        with open(path, 'r', encoding='utf-8') as f:
-            old_content = f.read()
-        file_lines = old_content.splitlines()
-    else:
-        file_lines = []
-    for i, line in enumerate(lines):
-        file_lines.insert(position + i, line)
-    new_content = '\n'.join(file_lines)
-    with open(path, 'w', encoding='utf-8') as f:
-        f.write(new_content)
-    return FileEditObservation(path=path, prev_exist=prev_exist, old_content=old_content, new_content=new_content, content=new_content)
+    result = apply_line_edits(path, [LineEdit.insert(position, lines)])
+    return _splice_observation(result)
 
 
 def remove_lines(path: str, start: int, end: int) -> FileEditObservation:
@@ -145,7 +190,8 @@ def remove_lines(path: str, start: int, end: int) -> FileEditObservation:
     Key Features:
     - Precise line range removal
     - Boundary checking (won't fail on invalid ranges)
-    - Preserves original line endings
+    - Preserves original line endings and the trailing newline
+    - Splices the file in place instead of rewriting it line by line
     
     Parameters:
         path (str): Absolute path to the file
@@ -153,7 +199,7 @@ def remove_lines(path: str, start: int, end: int) -> FileEditObservation:
         end (int): Last line to remove (exclusive)
     
     Returns:
-        FileEditObservation: Contains before/after snapshots
+        FileEditObservation: Contains the removed region, starting at start_line
     
     Example:
         remove_lines("/path/to/file.txt", start=5, end=10)
@@ -161,14 +207,20 @@ def remove_lines(path: str, start: int, end: int) -> FileEditObservation:
     Warning:
         Will raise FileNotFoundError if file doesn't exist
     """
-    prev_exist = os.path.exists(path)
-    if not prev_exist:
+    if not os.path.exists(path):
         raise FileNotFoundError(f"File {path} does not exist.")
-    with open(path, 'r', encoding='utf-8') as f:
-        old_content = f.read()
-    file_lines = old_content.splitlines()
-    del file_lines[start:end]
-    new_content = '\n'.join(file_lines)
-    with open(path, 'w', encoding='utf-8') as f:
-        f.write(new_content)
-    return FileEditObservation(path=path, prev_exist=prev_exist, old_content=old_content, new_content=new_content, content=new_content)
+    result = apply_line_edits(path, [LineEdit.delete(start, end)])
+    return _splice_observation(result)
+
+
+def _splice_observation(result: SpliceResult) -> FileEditObservation:
+    # add_lines and remove_lines apply a single edit
+    hunk = result.hunks[0]
+    return FileEditObservation(
+        path=result.path,
+        prev_exist=result.prev_exist,
+        old_content=hunk.old_text,
+        new_content=hunk.new_text,
+        content=hunk.new_text,
+        start_line=hunk.start_line,
+    )
@@ -0,0 +1,234 @@
+"""
+Line diffs for edit observations.
+
+Lines are interned to integers first, so every later comparison is an integer
+comparison however long the lines are. The diff itself is a patience diff:
+common leading and trailing lines are matched, then lines that occur exactly
+once on both sides are used as anchors (their longest increasing run), and the
+gaps between anchors are diffed the same way. Gaps without unique lines fall
+back to difflib when they are small and count as replaced when they are not,
+so large files never hit a quadratic case.
+"""
+import bisect
+import difflib
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+# Gaps whose size product is above this are not searched for matches.
+MAX_FALLBACK_CELLS = 4_000_000
+
+
+@dataclass(frozen=True, slots=True)
+class Opcode:
+    """Turn ``old[old_start:old_end]`` into ``new[new_start:new_end]``; ``tag`` as in difflib."""
+    tag: str
+    old_start: int
+    old_end: int
+    new_start: int
+    new_end: int
+
+
+def _intern(old: Sequence[str], new: Sequence[str]) -> Tuple[List[int], List[int]]:
+    ids: Dict[str, int] = {}
+    return [ids.setdefault(line, len(ids)) for line in old], [ids.setdefault(line, len(ids)) for line in new]
+
+
+def _unique_anchors(a: List[int], b: List[int], a_lo: int, a_hi: int, b_lo: int, b_hi: int) -> List[Tuple[int, int]]:
+    """Longest increasing run of lines unique in both ranges, as (i, j) pairs."""
+    a_counts = Counter(a[a_lo:a_hi])
+    b_counts = Counter(b[b_lo:b_hi])
+    b_position = {line: j for j, line in enumerate(b[b_lo:b_hi], b_lo)}
+    pairs = [
+        (i, b_position[line]) for i, line in enumerate(a[a_lo:a_hi], a_lo)
+        if a_counts[line] == 1 and b_counts.get(line) == 1
+    ]
+    if not pairs:
+        return []
+    if all(first[1] < second[1] for first, second in zip(pairs, pairs[1:])):
+        # No lines moved: every pair is an anchor
+        return pairs
+    # Patience sorting over the b indexes
+    tails: List[int] = []
+    tail_pair: List[int] = []
+    previous: List[int] = [-1] * len(pairs)
+    for position, (_, j) in enumerate(pairs):
+        pile = bisect.bisect_left(tails, j)
+        if pile == len(tails):
+            tails.append(j)
+            tail_pair.append(position)
+        else:
+            tails[pile] = j
+            tail_pair[pile] = position
+        previous[position] = tail_pair[pile - 1] if pile else -1
+    run = []
+    position = tail_pair[-1]
+    while position >= 0:
+        run.append(pairs[position])
+        position = previous[position]
+    run.reverse()
+    return run
+
+
+def _matching_blocks(a: List[int], b: List[int]) -> List[Tuple[int, int, int]]:
+    """Matched runs ``a[i:i + size] == b[j:j + size]`` as (i, j, size), in order."""
+    blocks: List[Tuple[int, int, int]] = []
+    # Work left: ('range', (a_lo, a_hi, b_lo, b_hi)) or ('match', (i, j, size)); the top comes first in the file
+    stack: list = [('range', (0, len(a), 0, len(b)))]
+    while stack:
+        kind, value = stack.pop()
+        if kind == 'match':
+            blocks.append(value)
+            continue
+        a_lo, a_hi, b_lo, b_hi = value
+        prefix = 0
+        while a_lo + prefix < a_hi and b_lo + prefix < b_hi and a[a_lo + prefix] == b[b_lo + prefix]:
+            prefix += 1
+        if prefix:
+            blocks.append((a_lo, b_lo, prefix))
+            a_lo += prefix
+            b_lo += prefix
+        suffix = 0
+        while a_lo < a_hi - suffix and b_lo < b_hi - suffix and a[a_hi - suffix - 1] == b[b_hi - suffix - 1]:
+            suffix += 1
+        a_hi -= suffix
+        b_hi -= suffix
+        tail = [('match', (a_hi, b_hi, suffix))] if suffix else []
+        anchors = _unique_anchors(a, b, a_lo, a_hi, b_lo, b_hi) if a_lo < a_hi and b_lo < b_hi else []
+        if anchors:
+            parts = []
+            i, j = a_lo, b_lo
+            for anchor_i, anchor_j in anchors:
+                if anchor_i == i and anchor_j == j and parts and parts[-1][0] == 'match':
+                    # Extends the previous anchor's run
+                    run_i, run_j, size = parts[-1][1]
+                    parts[-1] = ('match', (run_i, run_j, size + 1))
+                else:
+                    parts.append(('range', (i, anchor_i, j, anchor_j)))
+                    parts.append(('match', (anchor_i, anchor_j, 1)))
+                i, j = anchor_i + 1, anchor_j + 1
+            parts.append(('range', (i, a_hi, j, b_hi)))
+            stack.extend(reversed(parts + tail))
+            continue
+        if a_lo < a_hi and b_lo < b_hi and (a_hi - a_lo) * (b_hi - b_lo) <= MAX_FALLBACK_CELLS:
+            matcher = difflib.SequenceMatcher(None, a[a_lo:a_hi], b[b_lo:b_hi], autojunk=False)
+            blocks.extend((a_lo + block.a, b_lo + block.b, block.size) for block in matcher.get_matching_blocks() if block.size)
+        blocks.extend(value for _, value in tail)
+    return blocks
+
+
+def diff_opcodes(old: Sequence[str], new: Sequence[str]) -> List[Opcode]:
+    """Opcodes turning the lines ``old`` into ``new``, like difflib's get_opcodes()."""
+    a, b = _intern(old, new)
+    # Merge adjacent runs, then close with an empty run at the end
+    merged: List[List[int]] = []
+    for i, j, size in _matching_blocks(a, b):
+        if merged and merged[-1][0] + merged[-1][2] == i and merged[-1][1] + merged[-1][2] == j:
+            merged[-1][2] += size
+        else:
+            merged.append([i, j, size])
+    merged.append([len(a), len(b), 0])
+
+    opcodes: List[Opcode] = []
+    i = j = 0
+    for match_i, match_j, size in merged:
+        if i < match_i and j < match_j:
+            opcodes.append(Opcode('replace', i, match_i, j, match_j))
+        elif i < match_i:
+            opcodes.append(Opcode('delete', i, match_i, j, j))
+        elif j < match_j:
+            opcodes.append(Opcode('insert', i, i, j, match_j))
+        if size:
+            opcodes.append(Opcode('equal', match_i, match_i + size, match_j, match_j + size))
+        i, j = match_i + size, match_j + size
+    return opcodes
+
+
+def group_opcodes(opcodes: List[Opcode], context: int) -> List[List[Opcode]]:
+    """Split opcodes into hunks with at most ``context`` unchanged lines around each change."""
+    groups: List[List[Opcode]] = []
+    current: List[Opcode] = []
+    for opcode in opcodes:
+        if opcode.tag != 'equal':
+            current.append(opcode)
+            continue
+        length = opcode.old_end - opcode.old_start
+        if not current:
+            # Leading context of the next group
+            start = max(opcode.old_start, opcode.old_end - context)
+            shift = start - opcode.old_start
+            current = [Opcode('equal', start, opcode.old_end, opcode.new_start + shift, opcode.new_end)] if context else []
+            continue
+        if length > 2 * context:
+            if context:
+                current.append(Opcode('equal', opcode.old_start, opcode.old_start + context,
+                                      opcode.new_start, opcode.new_start + context))
+            groups.append(current)
+            current = [Opcode('equal', opcode.old_end - context, opcode.old_end,
+                              opcode.new_end - context, opcode.new_end)] if context else []
+        else:
+            current.append(opcode)
+    if any(opcode.tag != 'equal' for opcode in current):
+        # Trim trailing context
+        if current[-1].tag == 'equal':
+            last = current[-1]
+            end = min(last.old_end, last.old_start + context)
+            current[-1] = Opcode('equal', last.old_start, end, last.new_start, last.new_start + end - last.old_start)
+        groups.append(current)
+    return [[opcode for opcode in group if opcode.old_start < opcode.old_end or opcode.new_start < opcode.new_end]
+            for group in groups]
+
+
+def unified_diff(
+    old: Sequence[str],
+    new: Sequence[str],
+    path: str = '',
+    context: int = 3,
+    first_line: int = 0,
+    new_first_line: Optional[int] = None,
+) -> str:
+    """
+    Render a unified diff of two lists of lines (without line endings).
+
+    Args:
+        old: Lines before.
+        new: Lines after.
+        path: File name for the header; no header if empty.
+        context: Unchanged lines shown around each change.
+        first_line: 0-based number in the file of the first line of ``old`` and ``new``,
+            when they are a region of a larger file.
+        new_first_line: Number of the first line of ``new``, if it differs from ``first_line``.
+
+    Returns:
+        The diff, or an empty string if the lines are equal.
+    """
+    if new_first_line is None:
+        new_first_line = first_line
+    groups = group_opcodes(diff_opcodes(old, new), context)
+    if not groups:
+        return ''
+    out = [f'--- {path}', f'+++ {path}'] if path else []
+    for group in groups:
+        old_start, old_end = group[0].old_start, group[-1].old_end
+        new_start, new_end = group[0].new_start, group[-1].new_end
+        out.append(
+            f'@@ -{_range(first_line + old_start, old_end - old_start)} '
+            f'+{_range(new_first_line + new_start, new_end - new_start)} @@'
+        )
+        for opcode in group:
+            if opcode.tag == 'equal':
+                out.extend(' ' + line for line in old[opcode.old_start:opcode.old_end])
+                continue
+            out.extend('-' + line for line in old[opcode.old_start:opcode.old_end])
+            out.extend('+' + line for line in new[opcode.new_start:opcode.new_end])
+    return '\n'.join(out)
+
+
+def _range(start: int, length: int) -> str:
+    # Unified diff ranges are 1-based; an empty range names the line before it
+    if length == 1:
+        return str(start + 1)
+    if length == 0:
+        return f'{start},0'
+    return f'{start + 1},{length}'
@@ -0,0 +1,247 @@
+"""
+Line edits that splice a file instead of rewriting it through Python strings.
+
+An edit replaces the lines ``[start, end)`` of the original file with new
+lines; inserts and deletions are the special cases of an empty range and of no
+new lines. Any number of edits to one file are applied in a single pass: the
+unchanged byte ranges between them, located with the cached line index, are
+copied in large chunks from an mmap into a temp file next to the original,
+which then atomically replaces it. Memory use is bounded by the chunk size and
+the edited lines, and no line outside the edits is decoded.
+
+The file's line ending (``\\n`` or ``\\r\\n``) and whether it ends with a newline
+are preserved.
+"""
+import mmap
+import os
+import tempfile
+from dataclasses import dataclass, field
+from typing import BinaryIO, Iterable, List, Optional, Tuple
+
+from .file_cache import get_default_file_cache, notify_file_changed
+from .line_index import get_line_index, invalidate_line_index
+
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass(slots=True)
+class LineEdit:
+    """Replace lines ``[start, end)`` (0-based) of the original file with ``lines``."""
+    start: int
+    end: int
+    lines: List[str] = field(default_factory=list)
+
+    @classmethod
+    def insert(cls, position: int, lines: Iterable[str]) -> "LineEdit":
+        return cls(start=position, end=position, lines=list(lines))
+
+    @classmethod
+    def delete(cls, start: int, end: int) -> "LineEdit":
+        return cls(start=start, end=end)
+
+
+@dataclass(slots=True)
+class SpliceHunk:
+    """One applied edit: the text of its lines before and after, from ``start_line`` of the original."""
+    start_line: int
+    old_text: str
+    new_text: str
+
+
+@dataclass(slots=True)
+class SpliceResult:
+    """Outcome of applying edits to one file."""
+    path: str
+    prev_exist: bool
+    hunks: List[SpliceHunk]
+    old_size: int
+    new_size: int
+
+
+class _SpliceWriter:
+    """
+    Writes the new file, owing each line's terminator until the next write.
+
+    Holding back the last newline lets the result keep the original's
+    trailing-newline state however the edits end.
+    """
+
+    def __init__(self, out: BinaryIO, newline: bytes) -> None:
+        self.out = out
+        self.newline = newline
+        self.pending = False
+        self.size = 0
+
+    def _write(self, data) -> None:
+        self.out.write(data)
+        self.size += len(data)
+
+    def _settle(self) -> None:
+        if self.pending:
+            self._write(self.newline)
+            self.pending = False
+
+    def copy(self, mm: mmap.mmap, start: int, end: int) -> None:
+        """Copy original bytes ``[start, end)``, a whole number of lines."""
+        if start >= end:
+            return
+        self._settle()
+        if mm[end - 2:end] == b'\r\n':
+            end -= 2
+        elif mm[end - 1:end] == b'\n':
+            end -= 1
+        for offset in range(start, end, COPY_CHUNK_SIZE):
+            self._write(mm[offset:min(offset + COPY_CHUNK_SIZE, end)])
+        self.pending = True
+
+    def lines(self, lines: List[bytes]) -> None:
+        if not lines:
+            return
+        self._settle()
+        self._write(self.newline.join(lines))
+        self.pending = True
+
+    def finish(self, trailing_newline: bool) -> None:
+        if trailing_newline:
+            self._settle()
+
+
+def _normalize(edits: Iterable[LineEdit], line_count: int) -> List[LineEdit]:
+    """Clamp edits to the file and order them; overlapping ranges are an error."""
+    normalized = []
+    for edit in edits:
+        start = max(0, min(edit.start, line_count))
+        end = max(start, min(edit.end, line_count))
+        normalized.append(LineEdit(start, end, list(edit.lines)))
+    # Stable, so inserts at the same position keep their given order
+    normalized.sort(key=lambda edit: edit.start)
+    for previous, current in zip(normalized, normalized[1:]):
+        if current.start < previous.end:
+            raise ValueError(
+                f"Overlapping line edits: [{previous.start}, {previous.end}) and [{current.start}, {current.end})"
+            )
+    return normalized
+
+
+def _detect_newline(mm: Optional[mmap.mmap]) -> bytes:
+    if mm is None:
+        return b'\n'
+    first = mm.find(b'\n')
+    return b'\r\n' if first > 0 and mm[first - 1:first] == b'\r' else b'\n'
+
+
+def apply_line_edits(path: str, edits: Iterable[LineEdit], encoding: str = 'utf-8') -> SpliceResult:
+    """
+    Apply ``edits`` to ``path`` in one pass and atomically replace the file.
+
+    Line numbers in every edit refer to the original file. A missing file is
+    treated as empty and created. A symlink is followed: the file it points to
+    is replaced and the link is kept.
+
+    Args:
+        path: File to edit.
+        edits: Non-overlapping line edits, in any order.
+        encoding: Encoding of the new lines.
+
+    Returns:
+        SpliceResult with one hunk per edit, in file order.
+    """
+    temp_path, result = stage_line_edits(path, edits, encoding)
+    try:
+        os.replace(temp_path, os.path.realpath(path))
+    except BaseException:
+        discard_temp_file(temp_path)
+        raise
+    forget_file(path)
+    return result
+
+
+def make_temp_file(path: str) -> Tuple[int, str]:
+    """Open a temp file next to ``path``, on the same file system so it can be renamed over it."""
+    directory = os.path.dirname(os.path.abspath(path))
+    return tempfile.mkstemp(dir=directory, prefix=f'.{os.path.basename(path)}.', suffix='.tmp')
+
+
+def discard_temp_file(temp_path: str) -> None:
+    try:
+        os.unlink(temp_path)
+    except OSError:
+        pass
+
+
+def forget_file(path: str) -> None:
+    """Drop the cached index and contents of a file that was replaced, under its own name and through a link."""
+    for name in {path, os.path.realpath(path)}:
+        invalidate_line_index(name)
+        get_default_file_cache().invalidate(name)
+    notify_file_changed(path)
+
+
+def stage_line_edits(path: str, edits: Iterable[LineEdit], encoding: str = 'utf-8') -> Tuple[str, SpliceResult]:
+    """
+    Write the result of applying ``edits`` to ``path`` into a temp file next to it.
+
+    The caller renames the temp file over ``os.path.realpath(path)`` or discards it;
+    ``path`` is not touched. If ``path`` is a symlink, the temp file is next to its target.
+
+    Returns:
+        The temp file's path and the SpliceResult.
+    """
+    target = os.path.realpath(path)
+    prev_exist = os.path.exists(target)
+    fd, temp_path = make_temp_file(target)
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            if prev_exist:
+                with open(target, 'rb') as f:
+                    stat = os.fstat(f.fileno())
+                    os.chmod(temp_path, stat.st_mode & 0o7777)
+                    index = get_line_index(target, stat)
+                    mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if stat.st_size else None
+                    try:
+                        result = _splice(path, mm, index, edits, out, encoding, prev_exist)
+                    finally:
+                        if mm is not None:
+                            mm.close()
+            else:
+                result = _splice(path, None, None, edits, out, encoding, prev_exist)
+            out.flush()
+            os.fsync(out.fileno())
+    except BaseException:
+        discard_temp_file(temp_path)
+        raise
+    return temp_path, result
+
+
+def _splice(path, mm, index, edits, out, encoding, prev_exist) -> SpliceResult:
+    line_count = index.line_count if mm is not None else 0
+    trailing_newline = index.ends_with_newline if mm is not None else True
+    old_size = index.version.size if index is not None else 0
+    newline = _detect_newline(mm)
+    text_newline = newline.decode('ascii')
+    edits = _normalize(edits, line_count)
+    writer = _SpliceWriter(out, newline)
+
+    def offset_of(line: int) -> int:
+        return index.byte_range(mm, line, line)[0] if mm is not None else 0
+
+    def original_text(start: int, end: int) -> str:
+        return mm[start:end].decode(encoding, errors='replace') if mm is not None else ''
+
+    hunks: List[SpliceHunk] = []
+    position = 0
+    for edit in edits:
+        start = offset_of(edit.start)
+        end = offset_of(edit.end)
+        writer.copy(mm, position, start)
+        writer.lines([line.encode(encoding) for line in edit.lines])
+        new_text = ''.join(line + text_newline for line in edit.lines)
+        if end >= old_size and not trailing_newline and new_text:
+            new_text = new_text[:-len(text_newline)]
+        hunks.append(SpliceHunk(edit.start, original_text(start, end), new_text))
+        position = end
+    if mm is not None:
+        writer.copy(mm, position, old_size)
+    writer.finish(trailing_newline)
+    return SpliceResult(path, prev_exist, hunks, old_size, writer.size)
@@ -4,6 +4,7 @@ class ObservationType(str, Enum):
     READ = 'read'
     WRITE = 'write'
     EDIT = 'edit'
+    BATCH = 'batch'
     # Add more as needed for your application
 
 class FileEditSource(str, Enum):
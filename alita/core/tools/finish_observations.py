@@ -4,7 +4,7 @@ from alita.core.tools.files.observation import Observation
 
 
 
-@dataclass
+@dataclass(slots=True)
 class FinishObservation(Observation):
     task_completed: str
 
@@ -0,0 +1,85 @@
+"""
+Code search tool backed by a trigram index of the working directory.
+"""
+import os
+from typing import Dict, List, Optional, Tuple
+
+from alita.core.utils import ToolAccess, register_function
+from alita.core.tools.code_index import SearchResult, get_code_index
+from alita.core.tools.search_observations import SearchObservation
+
+
+def _render(result: SearchResult, root: str, grouped: bool) -> str:
+    """grep -n style: "path:line:text" for matches, "path-line-text" for context, "--" between context groups."""
+    # (path, line number) -> (text, is a match); a match wins over context that overlaps it
+    lines: Dict[Tuple[str, int], Tuple[str, bool]] = {}
+    for hit in result.hits:
+        for number, line in hit.before + hit.after:
+            lines.setdefault((hit.path, number), (line, False))
+        lines[(hit.path, hit.line_number)] = (hit.line, True)
+    out: List[str] = []
+    previous = None
+    for (path, number), (line, is_match) in sorted(lines.items()):
+        if grouped and previous is not None and previous != (path, number - 1):
+            out.append('--')
+        separator = ':' if is_match else '-'
+        out.append(f'{os.path.relpath(path, root)}{separator}{number}{separator}{line}')
+        previous = (path, number)
+    return '\n'.join(out)
+
+
+# A search may read any file, so it runs after earlier file writes.
+@register_function(access=lambda args: ToolAccess(reads_all=True))
+def search_code(
+    query: str,
+    path: Optional[str] = None,
+    regex: bool = False,
+    ignore_case: bool = False,
+    max_results: int = 50,
+    context_lines: int = 0,
+) -> SearchObservation:
+    """
+    Search the code in the working directory for a literal string or a regular expression.
+
+    Key Features:
+    * Uses an index of the working directory that is kept up to date as files change,
+      so searching is much faster than running grep or find through bash
+    * Literal or regular expression queries, optionally case-insensitive
+    * Context lines around each match, like grep -C
+    * Skips binary files, files over 1MB and directories such as .git and node_modules
+
+    Parameters:
+      query (str): Text to search for, or a Python regular expression if regex is true
+      path (str, optional): Only search under this file or directory (default: the working directory)
+      regex (bool, optional): Treat the query as a regular expression (default: false)
+      ignore_case (bool, optional): Match case-insensitively (default: false)
+      max_results (int, optional): Maximum number of matching lines to return (default: 50)
+      context_lines (int, optional): Lines to show before and after each match (default: 0)
+
+    Returns:
+      SearchObservation with the matching lines as "path:line:text", context lines as
+      "path-line-text", and "--" between separate groups of context.
+
+    Usage Examples:
+    1. Find a definition:
+       search_code("def handle_message")
+    2. Find calls with context:
+       search_code(r"publish_event\\(", regex=True, context_lines=2)
+    """
+    root = os.getcwd()
+    index = get_code_index(root)
+    result = index.search(
+        query,
+        regex=regex,
+        ignore_case=ignore_case,
+        max_results=max_results,
+        context_lines=context_lines,
+        path_prefix=os.path.join(root, path) if path else None,
+    )
+    return SearchObservation(
+        content=_render(result, root, grouped=context_lines > 0),
+        query=query,
+        matches=len(result.hits),
+        files_searched=result.candidates,
+        truncated=result.truncated,
+    )
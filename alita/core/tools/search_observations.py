@@ -0,0 +1,19 @@
+from dataclasses import dataclass
+from alita.core.tools.files.observation import Observation
+
+
+@dataclass(slots=True)
+class SearchObservation(Observation):
+    query: str
+    matches: int = 0
+    # Files that passed the index and were read
+    files_searched: int = 0
+    truncated: bool = False
+
+    @property
+    def message(self) -> str:
+        return f'I searched the code for {self.query}.'
+
+    def __str__(self) -> str:
+        more = ', more were left out' if self.truncated else ''
+        return f'[Search for {self.query!r} found {self.matches} matching lines{more}.]\n{self.content}'
@@ -0,0 +1,444 @@
+"""
+A pool of warm, reusable tmux shell sessions for bash command execution.
+
+Creating a tmux session per command costs a fork/exec of the shell plus several
+tmux round trips. The pool keeps a bounded number of interactive shells alive
+and hands them out for single commands, so running a command costs one
+send-keys round trip.
+
+Commands normally run in a subshell of the pooled shell, which leaves the
+shell's cwd and environment untouched between uses. Inside a
+``sticky_shell(key)`` scope, commands run in a session reserved for that key,
+which takes over the subshell's cwd and exported variables when it ends, so
+``cd`` and ``export`` persist until the scope ends and ``exit`` does not end
+the session.
+"""
+import atexit
+import contextvars
+import logging
+import os
+import shlex
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Set
+
+import libtmux
+
+
+logger = logging.getLogger(__name__)
+
+SHELL_COMMAND = "bash --noprofile --norc --noediting"
+
+# Silences the prompt and the tty echo of typed lines, so the pane only shows command output.
+SHELL_INIT = "export PS1='' PS2='' HISTFILE=/dev/null; stty -echo"
+
+# Sticky key of the current agent run, if sticky mode is enabled.
+_sticky_key: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("alita_sticky_shell", default=None)
+
+
+class KeepaliveFifo:
+    """
+    A named pipe opened for non-blocking reads.
+
+    A write end is held open as well, so the read end never sees EOF when the
+    writers on the shell side come and go between commands.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._read_fd = -1
+        self._write_fd = -1
+
+    def open(self) -> None:
+        os.mkfifo(self.path)
+        self._read_fd = os.open(self.path, os.O_RDONLY | os.O_NONBLOCK)
+        self._write_fd = os.open(self.path, os.O_WRONLY | os.O_NONBLOCK)
+
+    def close(self) -> None:
+        for fd in (self._read_fd, self._write_fd):
+            if fd >= 0:
+                os.close(fd)
+        self._read_fd = self._write_fd = -1
+
+    def fileno(self) -> int:
+        return self._read_fd
+
+    def read_available(self, size: int = 65536) -> bytes:
+        """Read whatever is buffered in the pipe without blocking."""
+        chunks = []
+        while True:
+            try:
+                chunk = os.read(self._read_fd, size)
+            except BlockingIOError:
+                break
+            if not chunk:
+                break
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+
+@dataclass
+class TmuxShellSession:
+    name: str
+    session: libtmux.Session
+    pane: libtmux.Pane
+    script_path: str
+    # The shell reports '<token> <exit code>' lines here when a command ends.
+    done_fifo: KeepaliveFifo
+    # Everything the pane prints is piped here by tmux pipe-pane.
+    output_fifo: KeepaliveFifo
+    sticky_key: Optional[str] = None
+    created_at: float = field(default_factory=time.monotonic)
+    last_used: float = field(default_factory=time.monotonic)
+    last_checked: float = field(default_factory=time.monotonic)
+    uses: int = 0
+    _exit_reports: bytes = b""
+
+    def pop_exit_code(self, token: str) -> Optional[int]:
+        """
+        Return the exit code reported for ``token``, or None if it has not been reported yet.
+
+        Reports left over from earlier, abandoned commands are skipped.
+        """
+        self._exit_reports += self.done_fifo.read_available()
+        while b"\n" in self._exit_reports:
+            line, self._exit_reports = self._exit_reports.split(b"\n", 1)
+            reported_token, _, exit_code = line.decode().partition(" ")
+            if reported_token == token:
+                return int(exit_code)
+        return None
+
+    def close_fifos(self) -> None:
+        self.done_fifo.close()
+        self.output_fifo.close()
+
+    @property
+    def state_path(self) -> str:
+        """Script that restores the cwd and exported variables a sticky command left behind."""
+        return os.path.join(os.path.dirname(self.script_path), "state.sh")
+
+    def write_script(self, command: str, work_dir: Optional[str] = None, save_state: bool = False) -> None:
+        """
+        Write the command into the session's script file, optionally preceded by a cd.
+
+        With ``save_state``, the subshell running the script writes its cwd and exported
+        variables to ``state_path`` when it exits, however it exits.
+        """
+        with open(self.script_path, "w", encoding="utf-8") as f:
+            if save_state:
+                f.write(f"__alita_state={shlex.quote(self.state_path)}\n")
+                f.write("trap '{ export -p; printf \"cd -- %q\\n\" \"$PWD\"; } > \"$__alita_state\"' EXIT\n")
+            if work_dir:
+                f.write(f"cd -- {shlex.quote(work_dir)} || return $?\n")
+            f.write(f"{command}\n")
+
+
+class TmuxSessionPool:
+    """
+    A bounded pool of warm tmux shell sessions.
+
+    Args:
+        max_size: Maximum number of live sessions, including sticky ones
+        idle_timeout: Seconds after which an idle session is killed
+        health_check_interval: Sessions idle for longer than this are checked before reuse
+        socket_name: tmux socket used for pooled sessions, kept apart from the user's server
+    """
+
+    def __init__(
+        self,
+        max_size: int = 4,
+        idle_timeout: float = 300.0,
+        health_check_interval: float = 5.0,
+        socket_name: str = "alita",
+    ) -> None:
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self._server = libtmux.Server(socket_name=socket_name)
+        self._cond = threading.Condition()
+        self._idle: List[TmuxShellSession] = []
+        self._sticky: Dict[str, TmuxShellSession] = {}
+        # Sticky keys whose session is checked out; other commands for the key wait for it
+        self._sticky_busy: Set[str] = set()
+        self._size = 0
+        self._closed = False
+        self._work_root = tempfile.mkdtemp(prefix="alita-tmux-")
+
+    @property
+    def server(self) -> libtmux.Server:
+        return self._server
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def idle_count(self) -> int:
+        return len(self._idle)
+
+    def _create_session(self) -> TmuxShellSession:
+        name = f"alita-pool-{uuid.uuid4().hex[:8]}"
+        session = self._server.new_session(
+            session_name=name,
+            attach=False,
+            kill_session=True,
+            start_directory=os.getcwd(),
+            window_command=SHELL_COMMAND,
+        )
+        pane = session.active_pane
+        pane.send_keys(SHELL_INIT, enter=True)
+        script_dir = os.path.join(self._work_root, name)
+        os.makedirs(script_dir, exist_ok=True)
+        shell = TmuxShellSession(
+            name=name,
+            session=session,
+            pane=pane,
+            script_path=os.path.join(script_dir, "command.sh"),
+            done_fifo=KeepaliveFifo(os.path.join(script_dir, "done.fifo")),
+            output_fifo=KeepaliveFifo(os.path.join(script_dir, "output.fifo")),
+        )
+        shell.done_fifo.open()
+        shell.output_fifo.open()
+        open(shell.state_path, "w").close()
+        # Stream the raw pane output, which is not limited to the visible screen like capture-pane.
+        pane.cmd("pipe-pane", "-O", f"exec cat > {shlex.quote(shell.output_fifo.path)}")
+        logger.debug(f"Created tmux session {name}")
+        return shell
+
+    def _kill(self, shell: TmuxShellSession) -> None:
+        try:
+            shell.session.kill()
+        except Exception:
+            pass
+        shell.close_fifos()
+        shutil.rmtree(os.path.dirname(shell.script_path), ignore_errors=True)
+        logger.debug(f"Killed tmux session {shell.name}")
+
+    def is_healthy(self, shell: TmuxShellSession) -> bool:
+        try:
+            return self._server.has_session(shell.name)
+        except Exception:
+            return False
+
+    def _reap_idle_locked(self, now: float) -> List[TmuxShellSession]:
+        expired = [s for s in self._idle if now - s.last_used > self.idle_timeout]
+        expired += [s for s in self._sticky.values() if now - s.last_used > self.idle_timeout]
+        for shell in expired:
+            if shell.sticky_key:
+                del self._sticky[shell.sticky_key]
+            else:
+                self._idle.remove(shell)
+        self._size -= len(expired)
+        if expired:
+            self._cond.notify(len(expired))
+        return expired
+
+    def reap_idle(self) -> int:
+        """Kill sessions that have been idle for longer than ``idle_timeout``."""
+        with self._cond:
+            expired = self._reap_idle_locked(time.monotonic())
+        for shell in expired:
+            self._kill(shell)
+        return len(expired)
+
+    def prewarm(self, count: Optional[int] = None) -> None:
+        """Start idle sessions ahead of time, up to ``count`` or ``max_size``."""
+        target = min(count or self.max_size, self.max_size)
+        while True:
+            with self._cond:
+                if self._closed or self._size >= target:
+                    return
+                self._size += 1
+            try:
+                shell = self._create_session()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._idle.append(shell)
+                self._cond.notify()
+
+    def acquire(self, sticky_key: Optional[str] = None, timeout: Optional[float] = None) -> TmuxShellSession:
+        """
+        Take a session out of the pool, creating one if the pool is not full.
+
+        Blocks until a session is released when the pool is exhausted, and for a sticky
+        key while its session is in use by another command.
+
+        Raises:
+            TimeoutError: If no session became available within ``timeout`` seconds
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            shell = None
+            create = False
+            timed_out = False
+            with self._cond:
+                if self._closed:
+                    raise RuntimeError("TmuxSessionPool is closed")
+                expired = self._reap_idle_locked(time.monotonic())
+                if sticky_key and sticky_key in self._sticky:
+                    shell = self._sticky.pop(sticky_key)
+                elif sticky_key and sticky_key in self._sticky_busy:
+                    pass
+                elif self._idle:
+                    shell = self._idle.pop()
+                elif self._size < self.max_size:
+                    self._size += 1
+                    create = True
+                if shell is not None or create:
+                    if sticky_key:
+                        self._sticky_busy.add(sticky_key)
+                else:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        timed_out = True
+                    else:
+                        self._cond.wait(remaining)
+            for expired_shell in expired:
+                self._kill(expired_shell)
+            if timed_out:
+                raise TimeoutError("No tmux session available in the pool")
+
+            if create:
+                try:
+                    shell = self._create_session()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._sticky_busy.discard(sticky_key)
+                        self._cond.notify_all()
+                    raise
+            elif shell is None:
+                continue
+            elif time.monotonic() - shell.last_checked > self.health_check_interval:
+                if not self.is_healthy(shell):
+                    logger.warning(f"Discarding unhealthy tmux session {shell.name}")
+                    self.discard(shell)
+                    with self._cond:
+                        self._sticky_busy.discard(sticky_key)
+                        self._cond.notify_all()
+                    continue
+                shell.last_checked = time.monotonic()
+
+            if sticky_key and not shell.sticky_key:
+                shell.sticky_key = sticky_key
+            shell.uses += 1
+            return shell
+
+    def release(self, shell: TmuxShellSession) -> None:
+        """Return a session to the pool after a command completed normally."""
+        try:
+            # Keep the pane's scrollback from growing over the session's lifetime.
+            shell.pane.cmd("clear-history")
+        except Exception:
+            self.discard(shell)
+            return
+        shell.last_used = time.monotonic()
+        with self._cond:
+            if self._closed or (shell.sticky_key and shell.sticky_key in self._sticky):
+                self._size -= 1
+                to_kill = shell
+            else:
+                to_kill = None
+                if shell.sticky_key:
+                    self._sticky[shell.sticky_key] = shell
+                else:
+                    self._idle.append(shell)
+            if shell.sticky_key:
+                self._sticky_busy.discard(shell.sticky_key)
+                # Waiters for this key and for a free session wait on the same condition
+                self._cond.notify_all()
+            else:
+                self._cond.notify()
+        if to_kill:
+            self._kill(to_kill)
+
+    def discard(self, shell: TmuxShellSession) -> None:
+        """Kill a session that is broken or in an unknown state, e.g. after a timeout."""
+        with self._cond:
+            self._size -= 1
+            if shell.sticky_key:
+                self._sticky_busy.discard(shell.sticky_key)
+                self._cond.notify_all()
+            else:
+                self._cond.notify()
+        self._kill(shell)
+
+    def release_sticky(self, sticky_key: str) -> None:
+        """End a sticky scope; its session carries mutated state and is killed."""
+        with self._cond:
+            shell = self._sticky.pop(sticky_key, None)
+            if shell is not None:
+                self._size -= 1
+                self._cond.notify()
+        if shell is not None:
+            self._kill(shell)
+
+    def close(self) -> None:
+        """Kill every idle session and refuse further acquisitions."""
+        with self._cond:
+            self._closed = True
+            shells = self._idle + list(self._sticky.values())
+            self._idle = []
+            self._sticky = {}
+            self._size -= len(shells)
+            self._cond.notify_all()
+        for shell in shells:
+            self._kill(shell)
+        shutil.rmtree(self._work_root, ignore_errors=True)
+
+
+_default_pool: Optional[TmuxSessionPool] = None
+_default_pool_lock = threading.Lock()
+
+
+def get_default_pool() -> TmuxSessionPool:
+    """Return the process-wide pool used by ``execute_bash_command_tmux``."""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = TmuxSessionPool()
+            atexit.register(_default_pool.close)
+        return _default_pool
+
+
+def configure_default_pool(**kwargs) -> TmuxSessionPool:
+    """Replace the process-wide pool with one built from ``kwargs``."""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is not None:
+            _default_pool.close()
+        _default_pool = TmuxSessionPool(**kwargs)
+        atexit.register(_default_pool.close)
+        return _default_pool
+
+
+def current_sticky_key() -> Optional[str]:
+    return _sticky_key.get()
+
+
+@contextmanager
+def sticky_shell(key: Optional[str] = None, pool: Optional[TmuxSessionPool] = None) -> Iterator[str]:
+    """
+    Run every bash command issued inside this scope in the same shell session.
+
+    The working directory and exported variables persist between commands until
+    the scope exits, at which point the session is killed.
+    """
+    key = key or uuid.uuid4().hex
+    token = _sticky_key.set(key)
+    try:
+        yield key
+    finally:
+        _sticky_key.reset(token)
+        (pool or get_default_pool()).release_sticky(key)
@@ -1,11 +1,132 @@
-from typing import Dict, Callable, Any
+import inspect
+import typing
+from dataclasses import dataclass
+from typing import Dict, Callable, Any, FrozenSet, Optional, Tuple
+
+from pydantic import ConfigDict, PydanticSchemaGenerationError, PydanticUserError, TypeAdapter
+
+
+@dataclass(frozen=True)
+class ToolAccess:
+    """
+    What a single tool call touches, used to decide which calls may run concurrently.
+
+    Calls that write a path run after earlier calls that read or write it.
+    A call with ``reads_all`` may read any path: it runs after every earlier write,
+    and later writes run after it. A call with ``writes_all`` may write any path: it
+    runs after every earlier read and write, and later reads and writes run after it;
+    calls that write every path, like commands in separate shells, are assumed
+    independent of each other. An exclusive call runs after every earlier call and
+    before every later one.
+    """
+    reads: FrozenSet[str] = frozenset()
+    writes: FrozenSet[str] = frozenset()
+    reads_all: bool = False
+    writes_all: bool = False
+    exclusive: bool = False
+
+
+# Tools without an access declaration are assumed to need exclusive access.
+EXCLUSIVE_ACCESS = ToolAccess(exclusive=True)
+
+# Models often send numbers for string parameters; accept them like str() used to.
+_COERCION_CONFIG = ConfigDict(coerce_numbers_to_str=True, arbitrary_types_allowed=True)
+
+
+def _identity(value: Any) -> Any:
+    return value
+
+
+def _build_coercer(annotation: Any) -> Callable[[Any], Any]:
+    if annotation is inspect.Parameter.empty or annotation is Any:
+        return _identity
+    try:
+        try:
+            adapter = TypeAdapter(annotation, config=_COERCION_CONFIG)
+        except PydanticUserError:
+            # Models and TypedDicts carry their own config.
+            adapter = TypeAdapter(annotation)
+    except (PydanticSchemaGenerationError, PydanticUserError, TypeError):
+        return _identity
+    return adapter.validate_python
+
+
+@dataclass(frozen=True)
+class ToolSpec:
+    """
+    A tool's signature, compiled once so that dispatching a call does no introspection.
+
+    Arguments the function does not accept are dropped; the others are validated and
+    converted to the annotated types, so ``Optional[str]`` or dict parameters work.
+    """
+    name: str
+    func: Callable
+    parameters: Tuple[str, ...]
+    coercers: Dict[str, Callable[[Any], Any]]
+    is_async: bool
+
+    @classmethod
+    def compile(cls, func: Callable) -> "ToolSpec":
+        try:
+            hints = typing.get_type_hints(func)
+        except Exception:
+            hints = {}
+        parameters = inspect.signature(func).parameters
+        coercers = {
+            name: _build_coercer(hints.get(name, param.annotation))
+            for name, param in parameters.items()
+        }
+        return cls(
+            name=func.__name__,
+            func=func,
+            parameters=tuple(parameters),
+            coercers=coercers,
+            is_async=inspect.iscoroutinefunction(func),
+        )
+
+    def coerce_args(self, args: Dict[str, Any]) -> Dict[str, Any]:
+        coercers = self.coercers
+        return {name: coercers[name](value) for name, value in args.items() if name in coercers}
 
 
 FUNCTION_REGISTRY: Dict[str, Callable] = {}
+ACCESS_REGISTRY: Dict[str, Callable[[Dict[str, Any]], ToolAccess]] = {}
+TOOL_SPECS: Dict[str, ToolSpec] = {}
+
+def register_function(func: Optional[Callable] = None, *, access: Optional[Callable[[Dict[str, Any]], ToolAccess]] = None) -> Callable:
+    """
+    Decorator to register a function in the registry.
+
+    Args:
+        access: Maps the call's arguments to the ToolAccess it needs
+    """
+    def decorator(func: Callable) -> Callable:
+        FUNCTION_REGISTRY[func.__name__] = func
+        TOOL_SPECS[func.__name__] = ToolSpec.compile(func)
+        if access is not None:
+            ACCESS_REGISTRY[func.__name__] = access
+        return func
+
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+def get_tool_spec(func: Callable) -> ToolSpec:
+    """Return the compiled spec of a registered function, compiling unregistered ones."""
+    spec = TOOL_SPECS.get(func.__name__)
+    if spec is not None and spec.func is func:
+        return spec
+    return ToolSpec.compile(func)
 
-def register_function(func: Callable) -> Callable:
-    """Decorator to register a function in the registry."""
-    FUNCTION_REGISTRY[func.__name__] = func
-    return func
 
+def get_tool_access(name: str, args: Dict[str, Any], registry: Optional[Dict[str, Callable[[Dict[str, Any]], ToolAccess]]] = None) -> ToolAccess:
+    resolver = (ACCESS_REGISTRY if registry is None else registry).get(name)
+    if resolver is None:
+        return EXCLUSIVE_ACCESS
+    try:
+        return resolver(args)
+    except Exception:
+        # Malformed arguments will fail in the tool itself; don't let them run alongside others.
+        return EXCLUSIVE_ACCESS
 
@@ -18,6 +18,7 @@ from alita.core.coding_agent import CodingAgent
 from alita.core.tools.execute_bash_command_tmux import execute_bash_command_tmux
 from alita.core.tools.finish import finish
 from alita.core.tools.files.file_action_executor import execute_file_action
+from alita.core.tools.search_code import search_code
 from alita.config import llm_config
 from langchain_openai import ChatOpenAI
 
@@ -37,6 +38,7 @@ async def main():
         execute_bash_command_tmux,
         finish,
         execute_file_action,
+        search_code,
     ]
     coding_agent = CodingAgent(model_client=model_client, tools=tools)
     
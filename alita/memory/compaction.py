@@ -0,0 +1,185 @@
+"""
+Keeps the conversation of a long agent run within a token budget.
+
+The system prompt and the task are pinned, and so are the most recent turns.
+When the history grows past ``max_tokens``, older turns are shrunk until it is
+back under ``target_tokens``:
+
+1. Large tool results are replaced by short stubs, oldest first. The stub says
+   how to fetch the content again, e.g. by re-reading the file.
+2. If that is not enough, the oldest turns are dropped whole and folded into a
+   single summary message placed after the pinned prefix.
+
+Whole turns are dropped together with their tool results, so every tool
+message still follows the assistant message that called it.
+"""
+import logging
+from dataclasses import dataclass
+from typing import Any, Callable, List, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+from alita.core.tools.files.file_observations import FileReadObservation
+from alita.memory.conversation import Conversation
+
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_HEADER = "[Summary of earlier steps, whose full messages were removed to save context]"
+
+
+@dataclass
+class CompactionConfig:
+    # Compaction starts once the prompt is larger than this.
+    max_tokens: int = 48000
+    # Size to compact down to; defaults to three quarters of max_tokens so it does not run every turn.
+    target_tokens: Optional[int] = None
+    # Number of most recent assistant turns that are never compacted.
+    keep_recent_turns: int = 4
+    # Tool results smaller than this are not worth replacing with a stub.
+    min_stub_tokens: int = 256
+    # Lines kept in the summary of dropped turns, most recent first.
+    max_summary_lines: int = 40
+
+
+@dataclass
+class CompactionResult:
+    tokens_before: int
+    tokens_after: int
+    stubbed: int = 0
+    evicted_turns: int = 0
+
+
+def _one_line(text: Any, limit: int = 120) -> str:
+    line = str(text).strip().split("\n", 1)[0]
+    return line if len(line) <= limit else line[:limit] + "..."
+
+
+class ContextCompactor:
+    """
+    Compacts a Conversation in place.
+
+    Args:
+        config: Budget and pinning settings
+        summarizer: Optional ``(previous_summary, dropped_messages) -> summary`` used instead of
+            the built-in one-line-per-step summary, e.g. to have the model write the summary
+    """
+
+    def __init__(
+        self,
+        config: Optional[CompactionConfig] = None,
+        summarizer: Optional[Callable[[str, List[BaseMessage]], str]] = None,
+    ) -> None:
+        self.config = config or CompactionConfig()
+        self._summarizer = summarizer
+
+    @property
+    def target_tokens(self) -> int:
+        if self.config.target_tokens is not None:
+            return self.config.target_tokens
+        return self.config.max_tokens * 3 // 4
+
+    def stub_for(self, tool_name: str, observation: Any, tokens: int) -> str:
+        """Short replacement for a tool result that tells the model how to get it back."""
+        if isinstance(observation, FileReadObservation):
+            return (f"[Contents of {observation.path} ({tokens} tokens) were removed to save context. "
+                    f"Read the file again if you need them.]")
+        return (f"{_one_line(observation, 200)}\n[... {tokens} tokens of {tool_name} output were removed "
+                f"to save context. Run the tool again if you need it.]")
+
+    def _summarize_turn(self, messages: List[BaseMessage]) -> List[str]:
+        lines = []
+        for message in messages:
+            if isinstance(message, AIMessage):
+                for tool_call in message.tool_calls:
+                    lines.append(f"- called {tool_call['name']}({_one_line(tool_call['args'])})")
+                if not message.tool_calls and message.content:
+                    lines.append(f"- assistant: {_one_line(message.content)}")
+            else:
+                lines.append(f"  -> {_one_line(message.content)}")
+        return lines
+
+    def _summary_index(self, conversation: Conversation, first_turn: int) -> Optional[int]:
+        for index in range(first_turn):
+            if conversation.info[index].summary:
+                return index
+        return None
+
+    def compact(self, conversation: Conversation) -> CompactionResult:
+        """Shrink the conversation if it is over ``max_tokens``."""
+        result = CompactionResult(tokens_before=conversation.total_tokens, tokens_after=conversation.total_tokens)
+        if conversation.total_tokens <= self.config.max_tokens:
+            return result
+
+        messages = conversation.messages
+        turn_starts = [i for i, message in enumerate(messages) if isinstance(message, AIMessage)]
+        keep = self.config.keep_recent_turns
+        if len(turn_starts) <= keep:
+            return result
+        protected_from = turn_starts[-keep] if keep else len(messages)
+        target = self.target_tokens
+
+        # 1. replace large tool results with stubs, oldest first
+        for index in range(turn_starts[0], protected_from):
+            if conversation.total_tokens <= target:
+                break
+            info = conversation.info[index]
+            if info.tool_name is None or info.compacted or info.tokens < self.config.min_stub_tokens:
+                continue
+            stub = self.stub_for(info.tool_name, info.observation, info.tokens)
+            tool_call_id = getattr(messages[index], "tool_call_id", None)
+            conversation.replace(index, Conversation.tool_result_message(info.tool_name, stub, tool_call_id))
+            result.stubbed += 1
+
+        # 2. drop the oldest turns whole and fold them into the summary
+        if conversation.total_tokens > target:
+            evict_turns = []
+            freed = 0
+            for turn, start in enumerate(turn_starts):
+                if start >= protected_from or conversation.total_tokens - freed <= target:
+                    break
+                end = turn_starts[turn + 1] if turn + 1 < len(turn_starts) else len(messages)
+                evict_turns.append((start, end))
+                freed += sum(info.tokens for info in conversation.info[start:end])
+
+            if evict_turns:
+                first, last = evict_turns[0][0], evict_turns[-1][1]
+                dropped = messages[first:last]
+                summary_index = self._summary_index(conversation, first)
+                previous = messages[summary_index].content if summary_index is not None else ""
+                summary = self._summarize(previous, dropped)
+                conversation.remove(first, last)
+                if summary_index is not None:
+                    conversation.replace(summary_index, HumanMessage(content=summary))
+                else:
+                    conversation.insert(first, HumanMessage(content=summary), summary=True)
+                result.evicted_turns = len(evict_turns)
+
+        result.tokens_after = conversation.total_tokens
+        logger.info(
+            f"Compacted conversation from {result.tokens_before} to {result.tokens_after} tokens "
+            f"({result.stubbed} results stubbed, {result.evicted_turns} turns summarized)"
+        )
+        return result
+
+    def _summarize(self, previous: str, dropped: List[BaseMessage]) -> str:
+        if self._summarizer:
+            return self._summarizer(previous, dropped)
+        lines = previous.split("\n")[1:] if previous else []
+        omitted = 0
+        if lines and lines[0].startswith("[") and lines[0].endswith(" older lines omitted]"):
+            omitted = int(lines.pop(0)[1:].split(" ", 1)[0])
+        # split the dropped messages back into turns so each step gets its own lines
+        turn: List[BaseMessage] = []
+        for message in dropped:
+            if isinstance(message, AIMessage) and turn:
+                lines += self._summarize_turn(turn)
+                turn = []
+            turn.append(message)
+        lines += self._summarize_turn(turn)
+        overflow = max(0, len(lines) - self.config.max_summary_lines)
+        lines = lines[overflow:]
+        omitted += overflow
+        if omitted:
+            lines.insert(0, f"[{omitted} older lines omitted]")
+        return "\n".join([SUMMARY_HEADER] + lines)
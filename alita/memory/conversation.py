@@ -0,0 +1,150 @@
+"""
+Message history of a single agent run.
+
+Messages are kept as typed langchain messages in append order, so the model
+client receives a message list whose prefix never changes between turns and
+providers can cache it. Each message's token count is computed once when it is
+added, so the size of the prompt is known without re-scanning the history.
+"""
+import json
+import logging
+from dataclasses import dataclass
+from typing import Any, Callable, List, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+
+
+logger = logging.getLogger(__name__)
+
+# Sent when the model answered without calling a tool, so the history never ends on an assistant turn.
+CONTINUE_PROMPT = "Continue with the task. Call a tool, or call finish if you are done."
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate of roughly four characters per token."""
+    return (len(text) + 3) // 4
+
+
+def message_text(message: BaseMessage) -> str:
+    """The text a message contributes to the prompt, including tool call arguments."""
+    text = message.content if isinstance(message.content, str) else json.dumps(message.content)
+    if isinstance(message, AIMessage) and message.tool_calls:
+        text += json.dumps([{"name": c["name"], "args": c["args"]} for c in message.tool_calls], default=str)
+    return text
+
+
+@dataclass
+class MessageInfo:
+    """Bookkeeping kept next to each message."""
+    tokens: int
+    # The tool call result object, for tool result messages.
+    observation: Any = None
+    tool_name: Optional[str] = None
+    compacted: bool = False
+    # Stands in for turns that were dropped from the history.
+    summary: bool = False
+
+
+class Conversation:
+    """An ordered list of system, user, assistant and tool messages."""
+
+    def __init__(self, token_counter: Callable[[str], int] = estimate_tokens) -> None:
+        self._messages: List[BaseMessage] = []
+        self._info: List[MessageInfo] = []
+        self._token_counter = token_counter
+        self._total_tokens = 0
+        self._delta_start = 0
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        """The history itself, not a copy; callers must not modify it."""
+        return self._messages
+
+    @property
+    def info(self) -> List[MessageInfo]:
+        return self._info
+
+    @property
+    def total_tokens(self) -> int:
+        return self._total_tokens
+
+    def count_tokens(self, message: BaseMessage) -> int:
+        return self._token_counter(message_text(message))
+
+    def append(self, message: BaseMessage, observation: Any = None, tool_name: Optional[str] = None) -> BaseMessage:
+        info = MessageInfo(tokens=self.count_tokens(message), observation=observation, tool_name=tool_name)
+        self._messages.append(message)
+        self._info.append(info)
+        self._total_tokens += info.tokens
+        return message
+
+    def add_system(self, content: str) -> SystemMessage:
+        return self.append(SystemMessage(content=content))
+
+    def add_user(self, content: str) -> HumanMessage:
+        return self.append(HumanMessage(content=content))
+
+    def add_assistant(self, message: AIMessage) -> AIMessage:
+        return self.append(message)
+
+    def add_tool_result(self, name: str, observation: Any, tool_call_id: Optional[str] = None) -> BaseMessage:
+        """
+        Record the result of a tool call.
+
+        Calls made through the API's tool calling get a ToolMessage tied to their id.
+        Calls the model wrote into its text content have no id and are answered with a
+        user message instead. The observation object is kept as the message artifact.
+        """
+        return self.append(self.tool_result_message(name, str(observation), tool_call_id, observation), observation, name)
+
+    @staticmethod
+    def tool_result_message(name: str, content: str, tool_call_id: Optional[str], observation: Any = None) -> BaseMessage:
+        if tool_call_id:
+            return ToolMessage(content=content, tool_call_id=tool_call_id, name=name, artifact=observation)
+        return HumanMessage(content=f"EXECUTION RESULT of [{name}]:\n{content}")
+
+    def replace(self, index: int, message: BaseMessage, compacted: bool = True) -> None:
+        """Swap the message at ``index``, e.g. for a shorter stub, keeping its bookkeeping."""
+        info = self._info[index]
+        tokens = self.count_tokens(message)
+        self._total_tokens += tokens - info.tokens
+        info.tokens = tokens
+        info.compacted = info.compacted or compacted
+        if compacted:
+            # Let go of the full result so its memory can be reclaimed.
+            info.observation = None
+        self._messages[index] = message
+
+    def insert(self, index: int, message: BaseMessage, summary: bool = False) -> None:
+        info = MessageInfo(tokens=self.count_tokens(message), compacted=True, summary=summary)
+        self._messages.insert(index, message)
+        self._info.insert(index, info)
+        self._total_tokens += info.tokens
+        if index < self._delta_start:
+            self._delta_start += 1
+
+    def remove(self, start: int, end: int) -> None:
+        """Remove the messages in ``[start, end)``."""
+        self._total_tokens -= sum(info.tokens for info in self._info[start:end])
+        del self._messages[start:end]
+        del self._info[start:end]
+        if self._delta_start > start:
+            self._delta_start = max(start, self._delta_start - (end - start))
+
+    def render(self) -> List[BaseMessage]:
+        """Return the message list to send to the model."""
+        return self._messages
+
+    def take_delta(self) -> List[BaseMessage]:
+        """Return the messages added since the previous call."""
+        delta = self._messages[self._delta_start:]
+        self._delta_start = len(self._messages)
+        return delta
+
+    def log_delta(self, level: int = logging.INFO) -> None:
+        for message in self.take_delta():
+            tool_calls = f"\n{message.tool_calls}" if isinstance(message, AIMessage) and message.tool_calls else ""
+            logger.log(level, f"[{message.type}] {message.content}{tool_calls}")
@@ -0,0 +1,97 @@
+"""Tests for the durable event log."""
+import asyncio
+import os
+import threading
+
+from alita.core.events import event_log
+from alita.core.events.event_log import EventLog
+from alita.core.events.event_stream import DirectEvent, EventPayload, EventStream, PublishEvent, Topic
+
+
+TOPIC = Topic('test_topic')
+
+
+class RecordingProcessor:
+    def __init__(self):
+        self.events = []
+
+    async def process_event(self, event):
+        self.events.append(event)
+
+
+def publish_event(content: str) -> PublishEvent:
+    return PublishEvent(topic=TOPIC, payload=EventPayload(content=content), sender='test')
+
+
+class TestEventLog:
+    def test_append_and_read_back(self, tmp_path):
+        with EventLog(str(tmp_path)) as log:
+            assert log.append(publish_event('a')) == 0
+            direct = DirectEvent(topic=TOPIC, payload=EventPayload(content='b'), sender='x', receiver='y')
+            assert log.append(direct) == 1
+            assert list(log.read()) == [(0, publish_event('a')), (1, direct)]
+            assert [offset for offset, _ in log.read(from_offset=1)] == [1]
+
+    def test_segments_rotate_and_reopen(self, tmp_path):
+        with EventLog(str(tmp_path), segment_bytes=300) as log:
+            for i in range(20):
+                log.append(publish_event(str(i)))
+            assert len(log.segments) > 1
+        with EventLog(str(tmp_path), segment_bytes=300) as log:
+            assert log.next_offset == 20
+            assert [event.payload.content for _, event in log.read(from_offset=15)] == ['15', '16', '17', '18', '19']
+
+    def test_torn_tail_is_cut_off(self, tmp_path):
+        with EventLog(str(tmp_path)) as log:
+            log.append(publish_event('a'))
+            segment = log.segments[-1]
+        with open(segment, 'ab') as f:
+            f.write(b'{"offset":1,"type":"Publ')
+        with EventLog(str(tmp_path)) as log:
+            assert log.next_offset == 1
+            assert log.append(publish_event('b')) == 1
+            assert [event.payload.content for _, event in log.read()] == ['a', 'b']
+        assert os.path.getsize(segment) > 0
+
+    async def test_fsync_runs_off_the_event_loop(self, tmp_path, monkeypatch):
+        threads = []
+        real_fsync = os.fsync
+
+        def recording_fsync(fd):
+            threads.append(threading.current_thread())
+            real_fsync(fd)
+
+        monkeypatch.setattr(event_log.os, 'fsync', recording_fsync)
+        log = EventLog(str(tmp_path), fsync_batch=2, fsync_interval=10)
+        for i in range(5):
+            log.append(publish_event(str(i)))
+        # One sync at a time: the second batch is synced when the first is done
+        while log._sync_future is not None:
+            await asyncio.sleep(0.01)
+        log.close()
+        assert len(threads) == 2
+        assert threading.main_thread() not in threads
+        with EventLog(str(tmp_path)) as reopened:
+            assert reopened.next_offset == 5
+
+    async def test_stream_replays_logged_events(self, tmp_path):
+        log = EventLog(str(tmp_path))
+        stream = EventStream(event_log=log)
+        processor = RecordingProcessor()
+        stream.register_processor(processor, [TOPIC])
+        await stream.start()
+        await stream.publish_event(publish_event('a'))
+        await stream.publish_many([publish_event('b'), publish_event('c')])
+        await stream.stop_when_idle()
+        log.close()
+
+        log = EventLog(str(tmp_path))
+        replayed = EventStream(event_log=log)
+        processor = RecordingProcessor()
+        replayed.register_processor(processor, [TOPIC])
+        await replayed.start()
+        assert await replayed.replay(from_offset=1) == 2
+        await replayed.stop_when_idle()
+        assert [event.payload.content for event in processor.events] == ['b', 'c']
+        assert log.next_offset == 3
+        log.close()
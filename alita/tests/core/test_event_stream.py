@@ -0,0 +1,184 @@
+"""Tests for EventStream dispatch."""
+import asyncio
+import time
+
+from alita.core.events.bounded_queue import BoundedEventQueue, OverflowPolicy, QueueConfig
+from alita.core.events.event_stream import DirectEvent, EventPayload, EventStream, PublishEvent, Topic
+
+
+TOPIC = Topic('test_topic')
+
+
+class RecordingProcessor:
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.events = []
+
+    async def process_event(self, event):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.events.append(event)
+
+
+class BatchRecordingProcessor:
+    def __init__(self):
+        self.batches = []
+
+    async def process_event(self, event):
+        raise AssertionError("process_batch should be used")
+
+    async def process_batch(self, events):
+        self.batches.append(list(events))
+
+
+def publish_event(content: str = 'hello') -> PublishEvent:
+    return PublishEvent(topic=TOPIC, payload=EventPayload(content=content), sender='test')
+
+
+class TestEventStream:
+    async def test_publish_and_direct_events_are_dispatched(self):
+        stream = EventStream()
+        processor = RecordingProcessor()
+        stream.register_processor(processor, [TOPIC])
+        await stream.start()
+        await stream.publish_event(publish_event())
+        await stream.publish_event(
+            DirectEvent(topic=TOPIC, payload=EventPayload(content='direct'), sender='test', receiver='RecordingProcessor')
+        )
+        await stream.stop_when_idle()
+        assert [event.payload.content for event in processor.events] == ['hello', 'direct']
+
+    async def test_wait_until_idle_without_start_returns(self):
+        stream = EventStream()
+        stream.register_processor(RecordingProcessor(), [TOPIC])
+        await stream.publish_event(publish_event())
+        await asyncio.wait_for(stream.wait_until_idle(), 1)
+
+    async def test_idle_stream_stops_immediately(self):
+        stream = EventStream()
+        stream.register_processor(RecordingProcessor(), [TOPIC])
+        await stream.start()
+        await asyncio.sleep(0.01)
+        start = time.monotonic()
+        await stream.stop()
+        assert time.monotonic() - start < 0.05
+        assert stream._processing_task.done() and not stream._processing_task.cancelled()
+
+    async def test_stop_lets_the_current_event_finish(self):
+        stream = EventStream()
+        processor = RecordingProcessor(delay=0.05)
+        stream.register_processor(processor, [TOPIC])
+        await stream.start()
+        await stream.publish_event(publish_event('first'))
+        await stream.publish_event(publish_event('second'))
+        await asyncio.sleep(0.01)
+        await stream.stop()
+        assert [event.payload.content for event in processor.events] == ['first']
+
+    async def test_fan_out_runs_subscribers_concurrently(self):
+        stream = EventStream()
+        processors = [RecordingProcessor(delay=0.1) for _ in range(5)]
+        for processor in processors:
+            stream.register_processor(processor, [TOPIC])
+        await stream.start()
+        start = time.monotonic()
+        await stream.publish_event(publish_event())
+        await stream.stop_when_idle()
+        assert time.monotonic() - start < 0.3
+        assert all(len(processor.events) == 1 for processor in processors)
+
+    async def test_order_is_kept_per_processor(self):
+        stream = EventStream()
+        slow, fast = RecordingProcessor(delay=0.01), RecordingProcessor()
+        stream.register_processor(slow, [TOPIC])
+        stream.register_processor(fast, [TOPIC])
+        await stream.start()
+        for i in range(5):
+            await stream.publish_event(publish_event(str(i)))
+        await stream.stop_when_idle()
+        expected = [str(i) for i in range(5)]
+        assert [event.payload.content for event in slow.events] == expected
+        assert [event.payload.content for event in fast.events] == expected
+
+    async def test_concurrency_limit(self):
+        stream = EventStream(max_concurrency=1)
+        processors = [RecordingProcessor(delay=0.05) for _ in range(3)]
+        for processor in processors:
+            stream.register_processor(processor, [TOPIC])
+        await stream.start()
+        start = time.monotonic()
+        await stream.publish_event(publish_event())
+        await stream.stop_when_idle()
+        assert time.monotonic() - start >= 0.15
+
+    async def test_publish_many_delivers_batches(self):
+        stream = EventStream(max_batch_size=4)
+        processor = BatchRecordingProcessor()
+        stream.register_processor(processor, [TOPIC])
+        await stream.start()
+        assert await stream.publish_many(publish_event(str(i)) for i in range(10)) == 10
+        await stream.stop_when_idle()
+        assert [e.payload.content for batch in processor.batches for e in batch] == [str(i) for i in range(10)]
+        assert max(len(batch) for batch in processor.batches) == 4
+
+    async def test_batch_latency_gathers_trickling_events(self):
+        stream = EventStream(max_batch_latency=0.2)
+        processor = BatchRecordingProcessor()
+        stream.register_processor(processor, [TOPIC])
+        await stream.start()
+        for i in range(3):
+            await stream.publish_event(publish_event(str(i)))
+            await asyncio.sleep(0.01)
+        await stream.stop_when_idle()
+        assert [len(batch) for batch in processor.batches] == [3]
+
+
+class TestBackpressure:
+    async def test_drop_policies(self):
+        oldest = BoundedEventQueue(QueueConfig(capacity=2, policy=OverflowPolicy.DROP_OLDEST))
+        newest = BoundedEventQueue(QueueConfig(capacity=2, policy=OverflowPolicy.DROP_NEWEST))
+        for i in range(5):
+            await oldest.put(i)
+            await newest.put(i)
+        assert [oldest.get_nowait() for _ in range(2)] == [3, 4]
+        assert [newest.get_nowait() for _ in range(2)] == [0, 1]
+        assert oldest.metrics.dropped == newest.metrics.dropped == 3
+        assert oldest.metrics.high_water == 2
+
+    async def test_coalesce_replaces_in_place(self):
+        queue = BoundedEventQueue(QueueConfig(capacity=2, policy=OverflowPolicy.COALESCE, coalesce_key=lambda e: e[0]))
+        for event in [('a', 1), ('b', 1), ('a', 2), ('b', 2)]:
+            assert await queue.put(event)
+        assert [queue.get_nowait() for _ in range(2)] == [('a', 2), ('b', 2)]
+        assert queue.metrics.coalesced == 2
+
+    async def test_full_mailbox_blocks_the_publisher(self):
+        stream = EventStream(
+            queue_config=QueueConfig(capacity=1),
+            mailbox_config=QueueConfig(capacity=1),
+        )
+        processor = RecordingProcessor(delay=0.05)
+        stream.register_processor(processor, [TOPIC])
+        await stream.start()
+        start = time.monotonic()
+        for i in range(5):
+            await stream.publish_event(publish_event(str(i)))
+        # one event in the worker, one in the mailbox, one with the dispatcher, one in the stream queue
+        assert time.monotonic() - start >= 0.05
+        await stream.stop_when_idle()
+        assert len(processor.events) == 5
+        metrics = stream.metrics()
+        assert metrics["stream"].high_water == 1 and metrics["RecordingProcessor"].high_water == 1
+
+    async def test_dropping_mailbox_does_not_stall_other_processors(self):
+        stream = EventStream()
+        slow, fast = RecordingProcessor(delay=0.05), RecordingProcessor()
+        stream.register_processor(slow, [TOPIC], mailbox_config=QueueConfig(capacity=1, policy=OverflowPolicy.DROP_NEWEST))
+        stream.register_processor(fast, [TOPIC])
+        await stream.start()
+        for i in range(10):
+            await stream.publish_event(publish_event(str(i)))
+        await stream.stop_when_idle()
+        assert len(fast.events) == 10
+        assert len(slow.events) < 10
+        assert stream.metrics()["RecordingProcessor"].dropped == 10 - len(slow.events)
@@ -0,0 +1,130 @@
+"""Tests for the record/replay LLM cache."""
+import asyncio
+import threading
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+from alita.core.llm_cache import CacheMode, CachingChatModel, LLMCacheMiss, LLMCacheStore
+from alita.core.tools.finish import finish
+
+
+class CountingModelClient:
+    """Answers with a numbered AIMessage and counts the calls that reached it."""
+
+    model_name = "fake-model"
+
+    def __init__(self):
+        self.calls = 0
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    async def ainvoke(self, messages, **kwargs):
+        self.calls += 1
+        return AIMessage(
+            content=f"answer {self.calls}",
+            tool_calls=[{"name": "finish", "args": {"message": "done"}, "id": f"call_{self.calls}"}],
+        )
+
+
+def conversation(tool_call_id="call_a"):
+    return [
+        SystemMessage(content="system"),
+        HumanMessage(content="Task: fix it"),
+        AIMessage(content="", tool_calls=[{"name": "finish", "args": {"message": "x"}, "id": tool_call_id}]),
+        ToolMessage(content="ok", tool_call_id=tool_call_id, name="finish"),
+    ]
+
+
+def replayer(store):
+    return CachingChatModel(None, store, mode=CacheMode.REPLAY, model_name="fake-model").bind_tools([finish])
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = LLMCacheStore(str(tmp_path / "cache" / "llm.sqlite"), max_entries=2)
+    yield store
+    store.close()
+
+
+class TestLLMCache:
+    def test_record_then_replay(self, store):
+        model = CountingModelClient()
+        recording = CachingChatModel(model, store).bind_tools([finish])
+        first = asyncio.run(recording.ainvoke(conversation()))
+        again = asyncio.run(recording.ainvoke(conversation()))
+        assert model.calls == 1
+        assert again.content == first.content
+        assert again.tool_calls == first.tool_calls
+
+        replaying = replayer(store)
+        # generated tool call ids don't affect the key
+        replayed = asyncio.run(replaying.ainvoke(conversation(tool_call_id="call_b")))
+        assert replayed.content == first.content
+
+    def test_replay_miss_raises(self, store):
+        replaying = replayer(store)
+        with pytest.raises(LLMCacheMiss):
+            asyncio.run(replaying.ainvoke(conversation()))
+
+    def test_key_depends_on_tools_and_content(self, store):
+        model = CountingModelClient()
+        with_tools = CachingChatModel(model, store).bind_tools([finish])
+        without_tools = CachingChatModel(model, store).bind_tools([])
+        assert with_tools.cache_key(conversation()) != without_tools.cache_key(conversation())
+        changed = conversation()
+        changed[1] = HumanMessage(content="Task: something else")
+        assert with_tools.cache_key(conversation()) != with_tools.cache_key(changed)
+
+    def test_refresh_overwrites_and_lru_evicts(self, store):
+        model = CountingModelClient()
+        asyncio.run(CachingChatModel(model, store).bind_tools([finish]).ainvoke(conversation()))
+        refreshed = asyncio.run(
+            CachingChatModel(model, store, mode=CacheMode.REFRESH).bind_tools([finish]).ainvoke(conversation())
+        )
+        assert model.calls == 2 and len(store) == 1
+        replayed = asyncio.run(replayer(store).ainvoke(conversation()))
+        assert replayed.content == refreshed.content
+
+        client = CachingChatModel(model, store).bind_tools([finish])
+        for task in ("a", "b"):
+            asyncio.run(client.ainvoke([HumanMessage(content=task)]))
+        assert len(store) == 2
+        with pytest.raises(LLMCacheMiss):
+            asyncio.run(replayer(store).ainvoke(conversation()))
+
+    def test_hits_defer_access_times(self, store):
+        store.put("a", "1")
+        store.put("b", "2")
+        changes = store._db.total_changes
+        assert store.get("a") == "1"
+        assert store._db.total_changes == changes
+        # The pending access to "a" counts when "c" evicts the least recently used
+        store.put("c", "3")
+        assert store.get("b") is None
+        assert store.get("a") == "1" and store.get("c") == "3"
+
+    def test_access_times_written_in_batches(self, tmp_path):
+        store = LLMCacheStore(str(tmp_path / "llm.sqlite"), flush_every=2)
+        store.put("a", "1")
+        store.put("b", "2")
+        store.get("a")
+        store.get("a")
+        assert store._accessed
+        store.get("b")
+        assert not store._accessed
+        store.get("a")
+        store.close()
+        assert not store._accessed
+
+    def test_store_is_used_off_the_event_loop(self, store):
+        threads = []
+        get, put = store.get, store.put
+        store.get = lambda key: threads.append(threading.current_thread()) or get(key)
+        store.put = lambda key, response: threads.append(threading.current_thread()) or put(key, response)
+        client = CachingChatModel(CountingModelClient(), store).bind_tools([finish])
+        asyncio.run(client.ainvoke(conversation()))
+        asyncio.run(client.ainvoke(conversation()))
+        assert len(threads) == 3
+        assert threading.main_thread() not in threads
@@ -0,0 +1,34 @@
+"""Tests for the shared tool catalog."""
+from alita.core.coding_agent import CodingAgent
+from alita.core.tool_catalog import get_tool_catalog
+from alita.core.tools.files.file_action_executor import execute_file_action
+from alita.core.tools.finish import finish
+
+
+class BindCountingModelClient:
+    def __init__(self):
+        self.bound_schemas = []
+
+    def bind_tools(self, tools):
+        self.bound_schemas.append(tools)
+        return self
+
+
+class TestToolCatalog:
+    def test_catalog_is_shared_per_tool_set(self):
+        assert get_tool_catalog([finish, execute_file_action]) is get_tool_catalog([finish, execute_file_action])
+        assert get_tool_catalog([finish]) is not get_tool_catalog([finish, execute_file_action])
+
+    def test_prompts_and_schemas(self):
+        catalog = get_tool_catalog([finish])
+        assert "---- BEGIN FUNCTION #1 finish ----" in catalog.tools_prompt
+        assert catalog.tools_prompt in catalog.system_prompt
+        assert [schema["function"]["name"] for schema in catalog.schemas] == ["finish"]
+
+    def test_agents_share_the_binding(self):
+        model_client = BindCountingModelClient()
+        first = CodingAgent(model_client=model_client, tools=[finish])
+        second = CodingAgent(model_client=model_client, tools=[finish])
+        assert len(model_client.bound_schemas) == 1
+        assert first._construct_system_prompt() is second._construct_system_prompt()
+        assert second._construct_task_prompt("fix it") == "Task: fix it\n"
@@ -0,0 +1,212 @@
+"""Tests for the ToolExecutor and async tool execution in CodingAgent."""
+import asyncio
+import threading
+import time
+from typing import Dict, Optional
+
+import pytest
+from langchain_core.messages.ai import AIMessage
+
+from alita.core.coding_agent import CodingAgent
+from alita.core.tool_executor import ToolExecutor
+from alita.core.tools.files.observation import Observation
+from alita.core.tools.finish import finish
+from alita.core.utils import ToolAccess
+
+
+def slow_sync_tool(seconds: float) -> Observation:
+    time.sleep(seconds)
+    return Observation(content=threading.current_thread().name)
+
+
+async def async_tool(text: str) -> Observation:
+    await asyncio.sleep(0)
+    return Observation(content=text.upper())
+
+
+def typed_tool(path: Optional[str], options: Dict[str, int], count: int = 1) -> Observation:
+    return Observation(content=repr((path, options, count)))
+
+
+EVENTS = []
+
+
+async def touch(path: str, mode: str) -> Observation:
+    EVENTS.append(("start", path, mode))
+    await asyncio.sleep(0.05)
+    EVENTS.append(("end", path, mode))
+    return Observation(content=f"{mode} {path}")
+
+
+def touch_access(args):
+    paths = frozenset([args["path"]])
+    return ToolAccess(reads=paths) if args["mode"] == "read" else ToolAccess(writes=paths)
+
+
+async def scan(label: str) -> Observation:
+    EVENTS.append(("start", "*", label))
+    await asyncio.sleep(0.05)
+    EVENTS.append(("end", "*", label))
+    return Observation(content=label)
+
+
+async def shell(label: str) -> Observation:
+    EVENTS.append(("start", "**", label))
+    await asyncio.sleep(0.05)
+    EVENTS.append(("end", "**", label))
+    return Observation(content=label)
+
+
+REGISTRY = {
+    "scan": scan,
+    "shell": shell,
+    "slow_sync_tool": slow_sync_tool,
+    "async_tool": async_tool,
+    "finish": finish,
+    "touch": touch,
+    "typed_tool": typed_tool,
+}
+ACCESS_REGISTRY = {
+    "scan": lambda args: ToolAccess(reads_all=True),
+    "shell": lambda args: ToolAccess(reads_all=True, writes_all=True),
+    "slow_sync_tool": lambda args: ToolAccess(),
+    "touch": touch_access,
+}
+
+
+class ScriptedModelClient:
+    """Answers every call with the next scripted AIMessage."""
+
+    def __init__(self, responses):
+        self._responses = list(responses)
+
+    def bind_tools(self, tools):
+        return self
+
+    async def ainvoke(self, prompt):
+        await asyncio.sleep(0)
+        return self._responses.pop(0)
+
+
+def tool_call_message(name, args, call_id="call_1"):
+    return AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": call_id}])
+
+
+class TestToolExecutor:
+    """Test cases for ToolExecutor."""
+
+    async def test_sync_tool_runs_off_the_event_loop(self):
+        executor = ToolExecutor(registry=REGISTRY)
+        observation = await executor.execute("slow_sync_tool", {"seconds": "0"})
+        assert observation.content.startswith("alita-tool")
+
+    async def test_async_tool_is_awaited(self):
+        executor = ToolExecutor(registry=REGISTRY)
+        observation = await executor.execute("async_tool", {"text": "hi"})
+        assert observation.content == "HI"
+
+    async def test_unknown_tool_returns_error_observation(self):
+        observation = await ToolExecutor(registry=REGISTRY).execute("missing", {})
+        assert observation.content == "Error: Function 'missing' not found in registry"
+
+    async def test_arguments_are_validated_against_annotations(self):
+        executor = ToolExecutor(registry=REGISTRY)
+        observation = await executor.execute("typed_tool", {"path": None, "options": {"a": "1"}, "count": "3", "extra": 1})
+        assert observation.content == "(None, {'a': 1}, 3)"
+        observation = await executor.execute("typed_tool", {"path": 5, "options": {}})
+        assert observation.content == "('5', {}, 1)"
+        observation = await executor.execute("typed_tool", {"path": "a", "options": "not a dict"})
+        assert observation.content.startswith("Error executing function call")
+
+    async def test_independent_calls_run_concurrently(self):
+        executor = ToolExecutor(registry=REGISTRY, access_registry=ACCESS_REGISTRY)
+        start = time.monotonic()
+        observations = await executor.execute_many([("slow_sync_tool", {"seconds": 0.2})] * 3)
+        assert time.monotonic() - start < 0.4
+        assert len(observations) == 3
+
+    async def test_conflicting_calls_keep_their_order(self):
+        EVENTS.clear()
+        executor = ToolExecutor(registry=REGISTRY, access_registry=ACCESS_REGISTRY)
+        observations = await executor.execute_many([
+            ("touch", {"path": "a", "mode": "read"}),
+            ("touch", {"path": "a", "mode": "read"}),
+            ("touch", {"path": "a", "mode": "write"}),
+            ("touch", {"path": "b", "mode": "write"}),
+            ("touch", {"path": "a", "mode": "write"}),
+        ])
+        assert [o.content for o in observations] == ["read a", "read a", "write a", "write b", "write a"]
+        # both reads and the write to b start together, the writes to a one after another
+        assert EVENTS[:3] == [("start", "a", "read"), ("start", "a", "read"), ("start", "b", "write")]
+        first_write = EVENTS.index(("start", "a", "write"))
+        assert max(i for i, event in enumerate(EVENTS) if event == ("end", "a", "read")) < first_write
+        assert EVENTS[first_write + 1:].index(("end", "a", "write")) < EVENTS[first_write + 1:].index(("start", "a", "write"))
+
+    async def test_reading_every_path_waits_for_writes(self):
+        EVENTS.clear()
+        executor = ToolExecutor(registry=REGISTRY, access_registry=ACCESS_REGISTRY)
+        await executor.execute_many([
+            ("touch", {"path": "a", "mode": "write"}),
+            ("scan", {"label": "first"}),
+            ("scan", {"label": "second"}),
+            ("touch", {"path": "b", "mode": "read"}),
+            ("touch", {"path": "b", "mode": "write"}),
+        ])
+        # the scans run together after the write to a, and the write to b after both scans
+        assert EVENTS[:4] == [("start", "a", "write"), ("start", "b", "read"), ("end", "a", "write"), ("end", "b", "read")]
+        assert {EVENTS[4], EVENTS[5]} == {("start", "*", "first"), ("start", "*", "second")}
+        assert EVENTS[-2:] == [("start", "b", "write"), ("end", "b", "write")]
+
+    async def test_writing_every_path_orders_against_file_calls(self):
+        EVENTS.clear()
+        executor = ToolExecutor(registry=REGISTRY, access_registry=ACCESS_REGISTRY)
+        await executor.execute_many([
+            ("touch", {"path": "a", "mode": "read"}),
+            ("shell", {"label": "first"}),
+            ("shell", {"label": "second"}),
+            ("touch", {"path": "a", "mode": "read"}),
+        ])
+        # the shells run together after the first read, the second read after both shells
+        assert EVENTS[:2] == [("start", "a", "read"), ("end", "a", "read")]
+        assert {EVENTS[2], EVENTS[3]} == {("start", "**", "first"), ("start", "**", "second")}
+        assert EVENTS[-2:] == [("start", "a", "read"), ("end", "a", "read")]
+
+    async def test_undeclared_tool_is_a_barrier(self):
+        EVENTS.clear()
+        executor = ToolExecutor(registry=REGISTRY, access_registry=ACCESS_REGISTRY)
+        await executor.execute_many([
+            ("touch", {"path": "a", "mode": "read"}),
+            ("async_tool", {"text": "x"}),
+            ("touch", {"path": "b", "mode": "read"}),
+        ])
+        assert EVENTS == [("start", "a", "read"), ("end", "a", "read"), ("start", "b", "read"), ("end", "b", "read")]
+
+    async def test_agents_share_one_loop(self):
+        def make_agent():
+            client = ScriptedModelClient([
+                tool_call_message("slow_sync_tool", {"seconds": 0.3}),
+                tool_call_message("finish", {"message": "done", "task_completed": "true"}),
+            ])
+            executor = ToolExecutor(registry=REGISTRY, access_registry=ACCESS_REGISTRY)
+            return CodingAgent(model_client=client, tools=[finish], tool_executor=executor)
+
+        start = time.monotonic()
+        await asyncio.gather(*(make_agent().run("task") for _ in range(3)))
+        assert time.monotonic() - start < 0.6
+
+
+class TestCodingAgentToolCalls:
+    """Test cases for running several tool calls per LLM turn."""
+
+    async def test_all_tool_calls_are_executed(self):
+        client = ScriptedModelClient([
+            AIMessage(content="", tool_calls=[
+                {"name": "async_tool", "args": {"text": "a"}, "id": "call_a"},
+                {"name": "async_tool", "args": {"text": "b"}, "id": "call_b"},
+            ]),
+            tool_call_message("finish", {"message": "done", "task_completed": "true"}),
+        ])
+        agent = CodingAgent(model_client=client, tools=[finish], tool_executor=ToolExecutor(registry=REGISTRY))
+        await agent.run("task")
+        tool_messages = [m for m in agent._conversation.messages if m.type == "tool"]
+        assert [(m.tool_call_id, m.artifact.content) for m in tool_messages] == [("call_a", "A"), ("call_b", "B")]
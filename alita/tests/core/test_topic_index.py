@@ -0,0 +1,61 @@
+"""Tests for the wildcard topic index."""
+from alita.core.events.event_stream import EventPayload, EventStream, PublishEvent, Topic
+from alita.core.events.topic_index import TopicIndex
+
+
+class TestTopicIndex:
+    def test_wildcards(self):
+        index = TopicIndex()
+        index.add('agent.coder.observation', 'exact')
+        index.add('agent.*.observation', 'single')
+        index.add('agent.#', 'multi')
+        index.add('#.observation', 'suffix')
+        assert index.match('agent.coder.observation') == ('exact', 'single', 'multi', 'suffix')
+        assert index.match('agent.planner.observation') == ('single', 'multi', 'suffix')
+        assert index.match('agent') == ('multi',)
+        assert index.match('agent.a.b.observation') == ('multi', 'suffix')
+        assert index.match('tool.observation') == ('suffix',)
+        assert index.match('other') == ()
+
+    def test_subscriber_matched_once(self):
+        index = TopicIndex()
+        index.add('a.*', 'p')
+        index.add('a.#', 'p')
+        assert index.match('a.b') == ('p',)
+
+    def test_cache_is_invalidated_on_change(self):
+        index = TopicIndex()
+        index.add('a.*', 'first')
+        assert index.match('a.b') == ('first',)
+        index.add('a.b', 'second')
+        assert index.match('a.b') == ('first', 'second')
+        assert index.remove('a.*', 'first')
+        assert index.match('a.b') == ('second',)
+        assert not index.remove('a.*', 'first')
+        assert sorted(index.patterns()) == ['a.b']
+        assert len(index) == 1
+
+
+class RecordingProcessor:
+    def __init__(self):
+        self.events = []
+
+    async def process_event(self, event):
+        self.events.append(event)
+
+
+class TestEventStreamRouting:
+    async def test_wildcard_subscription_and_unregister(self):
+        stream = EventStream()
+        processor = RecordingProcessor()
+        stream.register_processor(processor, [Topic('agent.*.observation')])
+        await stream.start()
+        for name in ('agent.coder.observation', 'agent.coder.action', 'nobody.listens'):
+            await stream.publish_event(PublishEvent(topic=Topic(name), payload=EventPayload(content=name), sender='x'))
+        await stream.wait_until_idle()
+        stream.unregister_processor(processor)
+        await stream.publish_event(
+            PublishEvent(topic=Topic('agent.coder.observation'), payload=EventPayload(content='late'), sender='x')
+        )
+        await stream.stop_when_idle()
+        assert [event.payload.content for event in processor.events] == ['agent.coder.observation']
@@ -0,0 +1,200 @@
+"""Tests for EventStream transports."""
+import asyncio
+import os
+import sys
+
+import pytest
+
+from alita.core.events.event_stream import DirectEvent, EventPayload, EventStream, PublishEvent, Topic
+from alita.core.events.transport import (
+    InProcessHub,
+    InProcessTransport,
+    TCPTransport,
+    TransportServer,
+    UnixSocketTransport,
+)
+
+
+class RecordingProcessor:
+    def __init__(self):
+        self.events = []
+
+    async def process_event(self, event):
+        self.events.append(event)
+
+
+class Planner(RecordingProcessor):
+    pass
+
+
+class Coder(RecordingProcessor):
+    pass
+
+
+# A hub, or a stream hosting an echoing Coder, in a process of its own.
+HUB_SCRIPT = """
+import asyncio, sys
+from alita.core.events.transport import TransportServer
+
+async def main():
+    await TransportServer().serve_unix(sys.argv[1])
+    print("ready", flush=True)
+    await asyncio.sleep(60)
+
+asyncio.run(main())
+"""
+
+PEER_SCRIPT = """
+import asyncio, sys
+from alita.core.events.event_stream import DirectEvent, EventPayload, EventStream, Topic
+from alita.core.events.transport import UnixSocketTransport
+
+class Coder:
+    def __init__(self, stream):
+        self.stream = stream
+
+    async def process_event(self, event):
+        await self.stream.publish_event(DirectEvent(
+            topic=Topic("plans"), payload=EventPayload(content="echo " + event.payload.content),
+            sender="Coder", receiver="Planner",
+        ))
+
+async def main():
+    stream = EventStream(transport=UnixSocketTransport(sys.argv[1]))
+    stream.register_processor(Coder(stream), [Topic("code")])
+    await stream.start()
+    print("ready", flush=True)
+    await asyncio.sleep(60)
+
+asyncio.run(main())
+"""
+
+
+async def spawn(script, *args):
+    """Start ``script`` in a new interpreter and wait until it prints "ready"."""
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, "-c", script, *args,
+        stdout=asyncio.subprocess.PIPE,
+        env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)},
+    )
+    line = await asyncio.wait_for(process.stdout.readline(), 20)
+    assert line == b"ready\n"
+    return process
+
+
+async def eventually(condition, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "condition not met in time"
+        await asyncio.sleep(0.01)
+
+
+@pytest.fixture(params=["in_process", "unix", "tcp"])
+async def transports(request, tmp_path):
+    server = None
+    if request.param == "in_process":
+        hub = InProcessHub()
+        yield lambda: InProcessTransport(hub)
+    elif request.param == "unix":
+        server = TransportServer()
+        path = str(tmp_path / "events.sock")
+        await server.serve_unix(path)
+        yield lambda: UnixSocketTransport(path)
+    else:
+        server = TransportServer()
+        host, port = await server.serve_tcp()
+        yield lambda: TCPTransport(host, port)
+    if server is not None:
+        await server.close()
+
+
+class TestTransport:
+    async def test_events_cross_streams(self, transports):
+        planning, coding = EventStream(transport=transports()), EventStream(transport=transports())
+        planner, coder = Planner(), Coder()
+        planning.register_processor(planner, [Topic('plans')])
+        await planning.start()
+        await coding.start()
+        # registering after start propagates the new subscription too
+        coding.register_processor(coder, [Topic('code')])
+        await eventually(lambda: planning._transport.wants(
+            PublishEvent(topic=Topic('code'), payload=EventPayload(content=''), sender='')
+        ))
+
+        await planning.publish_event(PublishEvent(topic=Topic('code'), payload=EventPayload(content='write it'), sender='Planner'))
+        await coding.publish_event(
+            DirectEvent(topic=Topic('plans'), payload=EventPayload(content='done'), sender='Coder', receiver='Planner')
+        )
+        # nobody subscribes to this topic; it stays local and is not an error
+        await planning.publish_event(PublishEvent(topic=Topic('nobody'), payload=EventPayload(content=''), sender='Planner'))
+
+        await eventually(lambda: coder.events and planner.events)
+        assert [event.payload.content for event in coder.events] == ['write it']
+        assert [event.payload.content for event in planner.events] == ['done']
+        await planning.stop()
+        await coding.stop()
+
+    async def test_unsubscribed_streams_get_nothing(self, transports):
+        sending, receiving = EventStream(transport=transports()), EventStream(transport=transports())
+        coder = Coder()
+        receiving.register_processor(coder, [Topic('code')])
+        await sending.start()
+        await receiving.start()
+        await asyncio.sleep(0.05)
+        assert not sending._transport.wants(
+            PublishEvent(topic=Topic('other'), payload=EventPayload(content=''), sender='')
+        )
+        await sending.publish_event(PublishEvent(topic=Topic('other'), payload=EventPayload(content=''), sender='x'))
+        await asyncio.sleep(0.05)
+        assert coder.events == []
+        await sending.stop()
+        await receiving.stop()
+
+
+class TestSocketTransport:
+    async def test_start_fails_when_hub_closes_first(self, tmp_path):
+        async def hang_up(reader, writer):
+            writer.close()
+
+        path = str(tmp_path / "events.sock")
+        server = await asyncio.start_unix_server(hang_up, path=path)
+        with pytest.raises(ConnectionError):
+            await asyncio.wait_for(UnixSocketTransport(path).start(), 5)
+        server.close()
+
+    async def test_start_times_out_without_answer(self, tmp_path):
+        connections = []
+
+        async def ignore(reader, writer):
+            connections.append(writer)
+
+        path = str(tmp_path / "events.sock")
+        server = await asyncio.start_unix_server(ignore, path=path)
+        with pytest.raises(TimeoutError):
+            await UnixSocketTransport(path, connect_timeout=0.1).start()
+        for writer in connections:
+            writer.close()
+        server.close()
+
+    async def test_hub_and_peer_in_other_processes(self, tmp_path):
+        path = str(tmp_path / "events.sock")
+        hub = await spawn(HUB_SCRIPT, path)
+        peer = None
+        try:
+            peer = await spawn(PEER_SCRIPT, path)
+            planning = EventStream(transport=UnixSocketTransport(path))
+            planner = Planner()
+            planning.register_processor(planner, [Topic('plans')])
+            await planning.start()
+            await eventually(lambda: planning._transport.wants(
+                PublishEvent(topic=Topic('code'), payload=EventPayload(content=''), sender='')
+            ), timeout=5)
+            await planning.publish_event(PublishEvent(topic=Topic('code'), payload=EventPayload(content='plan'), sender='Planner'))
+            await eventually(lambda: planner.events, timeout=5)
+            assert [event.payload.content for event in planner.events] == ['echo plan']
+            await planning.stop()
+        finally:
+            for process in (peer, hub):
+                if process is not None:
+                    process.kill()
+                    await process.wait()
@@ -0,0 +1,163 @@
+"""Tests for execute_bash_command_tmux and the tmux session pool."""
+import os
+import shutil
+import time
+
+import pytest
+
+from alita.core.tool_executor import ToolExecutor
+from alita.core.tools import tmux_session_pool
+from alita.core.tools.files import file_action_executor
+from alita.core.tools.bash_output import BoundedOutputBuffer
+from alita.core.tools.code_index import get_code_index
+from alita.core.tools.execute_bash_command_tmux import (
+    execute_bash_command_tmux,
+    run_bash_command,
+    stream_bash_command_tmux,
+)
+from alita.core.tools.tmux_session_pool import configure_default_pool, sticky_shell
+
+requires_tmux = pytest.mark.skipif(shutil.which("tmux") is None, reason="tmux is not installed")
+
+
+@pytest.fixture
+def pool():
+    pool = configure_default_pool(max_size=2, socket_name=f"alita-test-{os.getpid()}")
+    yield pool
+    pool.close()
+    pool.server.kill()
+    tmux_session_pool._default_pool = None
+
+
+@requires_tmux
+class TestExecuteBashCommandTmux:
+    """Test cases for execute_bash_command_tmux."""
+
+    def test_output_and_exit_code(self, pool):
+        observation = execute_bash_command_tmux("echo hello; echo 'it''s'; false")
+        assert observation.content == "hello\nits"
+        assert observation.exit_code == 1
+        assert observation.error is None
+
+    def test_sessions_are_reused(self, pool):
+        for _ in range(3):
+            assert execute_bash_command_tmux("true").exit_code == 0
+        assert pool.size == 1
+        assert pool.idle_count == 1
+
+    def test_state_is_reset_between_commands(self, pool, tmp_path):
+        execute_bash_command_tmux(f"cd {tmp_path}; export ALITA_TEST_VAR=1")
+        observation = execute_bash_command_tmux("echo ${ALITA_TEST_VAR:-unset}", work_dir=str(tmp_path))
+        assert observation.content == "unset"
+
+    def test_exit_does_not_kill_session(self, pool):
+        assert execute_bash_command_tmux("exit 3").exit_code == 3
+        assert execute_bash_command_tmux("echo alive").content == "alive"
+        assert pool.size == 1
+
+    def test_exit_does_not_kill_sticky_session(self, pool, tmp_path):
+        with sticky_shell():
+            observation = execute_bash_command_tmux(f"cd {tmp_path}; export ALITA_TEST_VAR=1; exit 3", timeout=5)
+            assert (observation.exit_code, observation.error) == (3, None)
+            observation = execute_bash_command_tmux("pwd; echo $ALITA_TEST_VAR")
+            assert observation.content == f"{tmp_path}\n1"
+            assert pool.size == 1
+
+    def test_sticky_shell_keeps_cwd_and_env(self, pool, tmp_path):
+        with sticky_shell():
+            execute_bash_command_tmux(f"cd {tmp_path}; export ALITA_TEST_VAR=1")
+            observation = execute_bash_command_tmux("pwd; echo $ALITA_TEST_VAR")
+        assert observation.content == f"{tmp_path}\n1"
+        assert pool.size == 0
+
+    async def test_command_runs_after_earlier_file_write(self, pool, tmp_path, monkeypatch):
+        path = tmp_path / "data.txt"
+        real_write_file = file_action_executor.write_file
+
+        def slow_write_file(path, content):
+            # Long enough for the command to overtake the write if it were not ordered after it
+            time.sleep(0.3)
+            return real_write_file(path, content)
+
+        monkeypatch.setattr(file_action_executor, "write_file", slow_write_file)
+        observations = await ToolExecutor().execute_many([
+            ("execute_file_action", {"action": {"type": "write", "path": str(path), "content": "new"}}),
+            ("execute_bash_command_tmux", {"command": f"cat {path}"}),
+        ])
+        assert observations[1].content == "new"
+
+    async def test_file_read_runs_after_earlier_command(self, pool, tmp_path):
+        path = tmp_path / "data.txt"
+        path.write_text("old\n")
+        observations = await ToolExecutor().execute_many([
+            ("execute_bash_command_tmux", {"command": f"sleep 0.3; echo new > {path}"}),
+            ("execute_file_action", {"action": {"type": "read", "path": str(path)}}),
+        ])
+        assert observations[1].content == "new\n"
+
+    def test_command_rescans_code_index(self, pool, tmp_path):
+        index = get_code_index(str(tmp_path))
+        assert not index.search('made_by_bash').hits
+        execute_bash_command_tmux("echo made_by_bash > module.py", work_dir=str(tmp_path))
+        index.wait_for_rescan()
+        assert [hit.line for hit in index.search('made_by_bash').hits] == ['made_by_bash']
+
+    async def test_sticky_commands_run_one_at_a_time(self, pool, tmp_path):
+        with sticky_shell():
+            observations = await ToolExecutor().execute_many([
+                ("execute_bash_command_tmux", {"command": f"cd {tmp_path}"}),
+                ("execute_bash_command_tmux", {"command": "pwd"}),
+            ])
+        assert observations[1].content == str(tmp_path)
+        assert pool.size == 0
+
+    def test_timeout_discards_session(self, pool):
+        observation = execute_bash_command_tmux("sleep 5", timeout=1)
+        assert observation.exit_code == -1
+        assert observation.error == "Command timed out"
+        assert pool.size == 0
+
+    def test_output_beyond_screen_is_captured(self, pool):
+        observation = execute_bash_command_tmux("seq 1 5000")
+        assert observation.content.splitlines() == [str(i) for i in range(1, 5001)]
+        assert not observation.truncated
+
+    def test_long_output_keeps_head_and_tail(self, pool):
+        # Budgets count raw terminal bytes, where each newline arrives as \r\n.
+        observation = run_bash_command("seq 1 100000", head_bytes=9, tail_bytes=15)
+        assert observation.content.startswith("1\n2\n3\n")
+        assert observation.content.endswith("99999\n100000")
+        assert observation.total_bytes == len("".join(f"{i}\r\n" for i in range(1, 100001)))
+        assert observation.dropped_bytes == observation.total_bytes - 24
+
+    async def test_stream_yields_output_incrementally(self, pool):
+        stream = stream_bash_command_tmux("for i in 1 2 3; do echo $i; sleep 0.05; done")
+        chunks = [chunk async for chunk in stream]
+        assert len(chunks) > 1
+        assert "".join(chunks) == "1\n2\n3\n"
+        assert stream.observation.exit_code == 0
+
+
+class TestBoundedOutputBuffer:
+    """Test cases for BoundedOutputBuffer."""
+
+    def test_small_output_is_kept_whole(self):
+        buffer = BoundedOutputBuffer(head_bytes=4, tail_bytes=4)
+        buffer.feed(b"abc")
+        buffer.feed(b"def")
+        assert buffer.render() == "abcdef"
+        assert not buffer.truncated
+
+    def test_character_split_at_head_limit_is_kept(self):
+        buffer = BoundedOutputBuffer(head_bytes=2, tail_bytes=4)
+        buffer.feed("aé!".encode())
+        assert buffer.render() == "aé!"
+        assert not buffer.truncated
+
+    def test_middle_is_dropped(self):
+        buffer = BoundedOutputBuffer(head_bytes=2, tail_bytes=3)
+        for chunk in (b"ab", b"cd", b"efghij", b"k"):
+            buffer.feed(chunk)
+        assert buffer.total_bytes == 11
+        assert buffer.dropped_bytes == 6
+        assert buffer.render() == "ab\n[... 6 bytes of output truncated ...]\nijk"
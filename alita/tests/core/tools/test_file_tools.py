@@ -0,0 +1,451 @@
+"""Tests for the file tools: ranged and previewed reads, line edits, diffs and batches."""
+import difflib
+import mmap
+import os
+import random
+
+import pytest
+
+from alita.core.tools.files import line_index
+from alita.core.tools.files import file_batch
+from alita.core.tools.files.file_action_executor import execute_file_action
+from alita.core.tools.files.file_observations import FileBatchObservation
+from alita.core.tools.files.file_cache import FileContentCache, configure_default_file_cache
+from alita.core.tools.files.file_stream import sniff_bytes
+from alita.core.tools.files.file_tools import add_lines, edit_file, read_file, remove_lines, write_file
+from alita.core.tools.files.line_diff import unified_diff
+from alita.core.tools.files.line_edits import LineEdit, apply_line_edits
+from alita.core.tools.files.line_index import LineIndex, FileVersion, read_range
+
+
+def write_lines(path, count, trailing_newline=True):
+    text = '\n'.join(f'line {i}' for i in range(count))
+    if trailing_newline:
+        text += '\n'
+    path.write_text(text)
+    return text
+
+
+class TestLineIndex:
+    def test_line_ranges_across_blocks(self, tmp_path):
+        path = tmp_path / 'big.txt'
+        text = write_lines(path, 5000)
+        lines = text.splitlines(keepends=True)
+        # Small blocks so that ranges cross many of them
+        index = LineIndex(str(path), FileVersion.of(os.stat(path)), block_size=256)
+        with open(path, 'rb') as f:
+            data = f.read()
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            assert index.line_count == 5000
+            for start, end in [(0, 1), (17, 18), (999, 1100), (10, 4990), (4999, 5000), (4990, 6000)]:
+                begin, stop = index.byte_range(mm, start, end)
+                assert data[begin:stop].decode() == ''.join(lines[start:end])
+            assert index.line_at(mm, data.index(b'line 1234')) == 1234
+
+    def test_no_trailing_newline(self, tmp_path):
+        path = tmp_path / 'short.txt'
+        write_lines(path, 3, trailing_newline=False)
+        result = read_range(str(path), start_line=2)
+        assert result.content == b'line 2'
+        assert result.total_lines == 3
+
+    def test_index_rebuilt_after_change(self, tmp_path):
+        path = tmp_path / 'changing.txt'
+        write_lines(path, 10)
+        assert read_range(str(path), 9, 10).content == b'line 9\n'
+        with open(path, 'a') as f:
+            f.write('appended\n')
+        assert read_range(str(path), 10, 11).content == b'appended\n'
+        assert line_index.get_line_index(str(path)).line_count == 11
+
+    def test_empty_file(self, tmp_path):
+        path = tmp_path / 'empty.txt'
+        path.write_text('')
+        result = read_range(str(path), 0, 10)
+        assert result.content == b''
+        assert result.total_lines == 0
+
+
+class TestReadFile:
+    def test_line_range(self, tmp_path):
+        path = tmp_path / 'log.txt'
+        write_lines(path, 100)
+        observation = read_file(str(path), start_line=50, end_line=52)
+        assert observation.content == 'line 50\nline 51\n'
+        assert (observation.start_line, observation.end_line, observation.total_lines) == (50, 52, 100)
+        assert str(observation).startswith(f'[Read lines 50-52 of 100 from {path} is successful.]')
+
+    def test_byte_range(self, tmp_path):
+        path = tmp_path / 'log.txt'
+        text = write_lines(path, 100)
+        start = text.index('line 10\n')
+        observation = read_file(str(path), start_byte=start, end_byte=start + 4)
+        assert observation.content == 'line'
+        assert observation.start_line == 10
+
+    def test_whole_file_unchanged(self, tmp_path):
+        path = tmp_path / 'log.txt'
+        text = write_lines(path, 5)
+        observation = read_file(str(path))
+        assert observation.content == text
+        assert observation.total_lines is None
+
+    def test_read_action(self, tmp_path):
+        path = tmp_path / 'log.txt'
+        write_lines(path, 20)
+        observation = execute_file_action({'type': 'read', 'path': str(path), 'start_line': 3, 'end_line': 4})
+        assert observation.content == 'line 3\n'
+
+
+class TestLineEdits:
+    def test_many_edits_in_one_pass(self, tmp_path):
+        path = tmp_path / 'module.py'
+        write_lines(path, 10)
+        result = apply_line_edits(str(path), [
+            LineEdit.delete(8, 10),
+            LineEdit.insert(0, ['header']),
+            LineEdit(3, 5, ['replaced']),
+        ])
+        expected = ['header'] + [f'line {i}' for i in range(3)] + ['replaced'] + [f'line {i}' for i in range(5, 8)]
+        assert path.read_text() == '\n'.join(expected) + '\n'
+        hunks = [(hunk.start_line, hunk.old_text, hunk.new_text) for hunk in result.hunks]
+        assert hunks == [(0, '', 'header\n'), (3, 'line 3\nline 4\n', 'replaced\n'), (8, 'line 8\nline 9\n', '')]
+
+    def test_overlapping_edits_rejected(self, tmp_path):
+        path = tmp_path / 'module.py'
+        text = write_lines(path, 10)
+        with pytest.raises(ValueError):
+            apply_line_edits(str(path), [LineEdit.delete(2, 5), LineEdit.delete(4, 6)])
+        assert path.read_text() == text
+        assert os.listdir(tmp_path) == ['module.py']
+
+    def test_line_endings_preserved(self, tmp_path):
+        path = tmp_path / 'crlf.txt'
+        path.write_bytes(b'a\r\nb\r\nc')
+        apply_line_edits(str(path), [LineEdit.insert(3, ['d'])])
+        assert path.read_bytes() == b'a\r\nb\r\nc\r\nd'
+        apply_line_edits(str(path), [LineEdit.delete(2, 4)])
+        assert path.read_bytes() == b'a\r\nb'
+
+    def test_mode_preserved(self, tmp_path):
+        path = tmp_path / 'run.sh'
+        write_lines(path, 2)
+        os.chmod(path, 0o755)
+        apply_line_edits(str(path), [LineEdit.insert(0, ['#!/bin/sh'])])
+        assert os.stat(path).st_mode & 0o777 == 0o755
+
+
+class TestAddRemoveLines:
+    def test_trailing_newline_kept(self, tmp_path):
+        path = tmp_path / 'module.py'
+        write_lines(path, 3)
+        observation = add_lines(str(path), ['new'], position=1)
+        assert path.read_text() == 'line 0\nnew\nline 1\nline 2\n'
+        assert (observation.start_line, observation.old_content, observation.new_content) == (1, '', 'new\n')
+        observation = remove_lines(str(path), 0, 2)
+        assert path.read_text() == 'line 1\nline 2\n'
+        assert observation.old_content == 'line 0\nnew\n'
+
+    def test_add_lines_creates_file(self, tmp_path):
+        path = tmp_path / 'new.txt'
+        observation = add_lines(str(path), ['a', 'b'], position=0)
+        assert path.read_text() == 'a\nb\n'
+        assert not observation.prev_exist
+
+    def test_remove_lines_missing_file(self, tmp_path):
+        with pytest.raises(FileNotFoundError):
+            remove_lines(str(tmp_path / 'missing.txt'), 0, 1)
+
+    def test_edits_go_through_symlink(self, tmp_path):
+        target, link = tmp_path / 'real.txt', tmp_path / 'link.txt'
+        write_lines(target, 2)
+        link.symlink_to(target)
+        add_lines(str(link), ['new'], position=1)
+        remove_lines(str(link), 0, 1)
+        assert link.is_symlink()
+        assert target.read_text() == 'new\nline 1\n'
+        assert sorted(os.listdir(tmp_path)) == ['link.txt', 'real.txt']
+
+
+class TestLargeAndBinaryFiles:
+    def test_sniff(self):
+        assert sniff_bytes(b'plain text\n').encoding == 'utf-8'
+        # A multi-byte character cut off at the end of the prefix is still UTF-8
+        assert sniff_bytes('caf\u00e9'.encode()[:-1]).encoding == 'utf-8'
+        assert sniff_bytes('\ufeffhi'.encode('utf-8')).encoding == 'utf-8-sig'
+        assert sniff_bytes('hi'.encode('utf-16')).encoding == 'utf-16'
+        assert sniff_bytes(b'caf\xe9\n').encoding == 'latin-1'
+        assert sniff_bytes(b'\x7fELF\x02\x01\x00\x00').binary
+
+    def test_binary_file_preview(self, tmp_path):
+        path = tmp_path / 'blob.bin'
+        path.write_bytes(bytes(range(256)) * 40)
+        observation = read_file(str(path))
+        assert observation.binary
+        assert observation.total_bytes == 10240
+        assert observation.content.startswith('Binary file, 10240 bytes.\n00000000  00 01 02')
+        assert str(observation).startswith(f'[Read preview of binary file {path} (10240 bytes, 9728 omitted).]')
+
+    def test_large_text_file_preview(self, tmp_path):
+        path = tmp_path / 'big.log'
+        write_lines(path, 100000)
+        observation = read_file(str(path))
+        assert not observation.binary
+        head = observation.content.partition('... ')[0]
+        tail = observation.content.rpartition(' ...\n')[2]
+        assert head.startswith('line 0\n') and head.endswith('\n')
+        assert tail.endswith('line 99999\n') and tail.startswith('line ')
+        first_omitted = head.count('\n')
+        last_omitted = 100000 - tail.count('\n')
+        assert f'lines {first_omitted}-{last_omitted} of 100000' in observation.content
+        assert observation.dropped_bytes == path.stat().st_size - len(head) - len(tail)
+
+    def test_ranged_read_uses_sniffed_encoding(self, tmp_path):
+        path = tmp_path / 'legacy.txt'
+        path.write_bytes(b'caf\xe9\nna\xefve\n')
+        assert read_file(str(path)).content == 'caf\u00e9\nna\u00efve\n'
+        assert read_file(str(path), start_line=1).content == 'na\u00efve\n'
+        assert read_file(str(path), start_byte=3, end_byte=4).content == '\u00e9'
+
+
+@pytest.fixture
+def file_cache():
+    return configure_default_file_cache()
+
+
+class TestFileContentCache:
+    def test_repeat_read_and_edit_after_read_hit(self, tmp_path, file_cache):
+        path = tmp_path / 'module.py'
+        path.write_text('old\n')
+        assert read_file(str(path)).content == 'old\n'
+        assert read_file(str(path)).content == 'old\n'
+        observation = edit_file(str(path), 'new\n')
+        assert observation.old_content == 'old\n'
+        assert read_file(str(path)).content == 'new\n'
+        metrics = file_cache.metrics()
+        assert (metrics.hits, metrics.misses) == (3, 1)
+
+    def test_outside_change_is_seen(self, tmp_path, file_cache):
+        path = tmp_path / 'module.py'
+        write_file(str(path), 'first\n')
+        with open(path, 'a') as f:
+            f.write('appended by a bash command\n')
+        assert read_file(str(path)).content == 'first\nappended by a bash command\n'
+        assert file_cache.metrics().misses == 1
+        add_lines(str(path), ['top'], 0)
+        assert read_file(str(path)).content.startswith('top\n')
+
+    def test_byte_budget_eviction(self, tmp_path):
+        cache = FileContentCache(max_bytes=250, max_entry_bytes=100)
+        for name in 'abcd':
+            (tmp_path / name).write_bytes(name.encode() * 100)
+            cache.read(str(tmp_path / name))
+        (tmp_path / 'big').write_bytes(b'x' * 101)
+        cache.read(str(tmp_path / 'big'))
+        metrics = cache.metrics()
+        assert (metrics.entries, metrics.bytes, metrics.evictions) == (2, 200, 2)
+        cache.read(str(tmp_path / 'd'))
+        assert cache.metrics().hits == 1
+
+
+class TestEditDiffs:
+    def test_matches_difflib_on_simple_edits(self):
+        old = [f'line {i}' for i in range(2000)]
+        new = list(old)
+        new[10] = 'changed'
+        del new[500:505]
+        new.insert(1500, 'added')
+        expected = '\n'.join(difflib.unified_diff(old, new, 'a.py', 'a.py', n=2, lineterm=''))
+        assert unified_diff(old, new, 'a.py', context=2) == expected
+
+    def test_diff_reproduces_new_lines(self):
+        rng = random.Random(0)
+        for _ in range(200):
+            old = [rng.choice('abcdef') for _ in range(rng.randrange(30))]
+            new = [line for line in old if rng.random() > 0.2]
+            for _ in range(rng.randrange(4)):
+                new.insert(rng.randrange(len(new) + 1), rng.choice('xyz'))
+            if new == old:
+                continue
+            # A diff with all lines as context lists every line of the new file
+            diff = unified_diff(old, new, context=len(old) + len(new))
+            assert [line[1:] for line in diff.splitlines()[1:] if line[0] in ' +'] == new
+
+    def test_edit_observation_shows_diff(self, tmp_path, file_cache):
+        path = tmp_path / 'module.py'
+        path.write_text(''.join(f'line {i}\n' for i in range(100)))
+        observation = edit_file(str(path), ''.join(f'line {i}\n' if i != 50 else 'fifty\n' for i in range(100)))
+        text = str(observation)
+        assert text.splitlines()[:4] == [f'[Edit of {path} is successful.]', f'--- {path}', f'+++ {path}', '@@ -48,7 +48,7 @@']
+        assert '-line 50' in text and '+fifty' in text and 'line 40' not in text
+        assert observation.get_diff() is observation.get_diff()
+        assert observation.get_edit_groups(1) == [{
+            'before_edits': [' 50|line 49', '-51|line 50', ' 52|line 51'],
+            'after_edits': [' 50|line 49', '+51|fifty', ' 52|line 51'],
+        }]
+
+    def test_line_edit_diff_uses_file_line_numbers(self, tmp_path):
+        path = tmp_path / 'module.py'
+        write_lines(path, 100)
+        observation = remove_lines(str(path), 70, 72)
+        assert observation.get_diff().splitlines()[2:] == ['@@ -71,2 +70,0 @@', '-line 70', '-line 71']
+
+
+class TestFileBatch:
+    def test_sequential_line_edits_become_one_splice(self, tmp_path):
+        path = tmp_path / 'module.py'
+        write_lines(path, 10)
+        observation = execute_file_action([
+            {'type': 'remove_lines', 'path': str(path), 'start': 2, 'end': 4},
+            # Line numbers follow the previous action: line 2 is now "line 4"
+            {'type': 'add_lines', 'path': str(path), 'lines': ['new'], 'position': 3},
+            {'type': 'add_lines', 'path': str(path), 'lines': ['top'], 'position': 0},
+        ])
+        expected = ['top', 'line 0', 'line 1', 'line 4', 'new'] + [f'line {i}' for i in range(5, 10)]
+        assert path.read_text() == '\n'.join(expected) + '\n'
+        assert isinstance(observation, FileBatchObservation)
+        assert observation.observations[0].get_diff().splitlines() == [
+            f'--- {path}', f'+++ {path}', '@@ -0,0 +1 @@', '+top', '@@ -3,2 +3,0 @@', '-line 2', '-line 3',
+            '@@ -5,0 +5 @@', '+new',
+        ]
+
+    def test_several_files_and_reads(self, tmp_path):
+        first, second, created = tmp_path / 'a.py', tmp_path / 'b.py', tmp_path / 'c.py'
+        write_lines(first, 3)
+        write_lines(second, 3)
+        observation = execute_file_action([
+            {'type': 'edit', 'path': str(first), 'new_content': 'replaced\n'},
+            {'type': 'add_lines', 'path': str(first), 'lines': ['added'], 'position': 1},
+            {'type': 'read', 'path': str(second)},
+            {'type': 'write', 'path': str(created), 'content': 'fresh\n'},
+            {'type': 'read', 'path': str(first)},
+        ])
+        assert first.read_text() == 'replaced\nadded\n'
+        assert created.read_text() == 'fresh\n'
+        assert observation.paths == [str(first), str(second), str(created)]
+        contents = [o.content for o in observation.observations]
+        assert contents[0] == 'replaced\nadded\n'
+        assert contents[2] == 'line 0\nline 1\nline 2\n'
+
+    def test_ranged_reads_after_edits(self, tmp_path):
+        path = tmp_path / 'module.py'
+        write_lines(path, 3)
+        observation = execute_file_action([
+            {'type': 'add_lines', 'path': str(path), 'lines': ['new'], 'position': 1},
+            {'type': 'read', 'path': str(path), 'start_byte': 7, 'end_byte': 11},
+            {'type': 'read', 'path': str(path), 'start_line': 2},
+        ])
+        by_bytes, by_lines = observation.observations[:2]
+        assert (by_bytes.content, by_bytes.start_line, by_bytes.end_line, by_bytes.total_lines) == ('new\n', 1, 2, 4)
+        assert (by_lines.content, by_lines.start_line, by_lines.end_line) == ('line 1\nline 2\n', 2, 4)
+        assert by_bytes.content == read_file(str(path), start_byte=7, end_byte=11).content
+
+    def test_edits_after_a_read_keep_line_endings(self, tmp_path):
+        path = tmp_path / 'windows.txt'
+        path.write_bytes(b'one\r\ntwo\r\nthree\r\n')
+        observation = execute_file_action([
+            {'type': 'add_lines', 'path': str(path), 'lines': ['new'], 'position': 1},
+            {'type': 'read', 'path': str(path)},
+            {'type': 'remove_lines', 'path': str(path), 'start': 2, 'end': 3},
+        ])
+        assert path.read_bytes() == b'one\r\nnew\r\nthree\r\n'
+        assert observation.observations[0].content == 'one\nnew\ntwo\nthree\n'
+
+    def test_edits_after_a_read_keep_undecodable_bytes(self, tmp_path):
+        path = tmp_path / 'legacy.txt'
+        path.write_bytes(b'caf\xe9\nna\xefve\n')
+        observation = execute_file_action([
+            {'type': 'remove_lines', 'path': str(path), 'start': 1, 'end': 2},
+            {'type': 'read', 'path': str(path)},
+            {'type': 'add_lines', 'path': str(path), 'lines': ['end'], 'position': 1},
+        ])
+        assert path.read_bytes() == b'caf\xe9\nend\n'
+        assert observation.observations[0].content == 'caf\u00e9\n'
+
+    def test_edits_after_a_read_split_on_newlines_only(self, tmp_path):
+        path = tmp_path / 'paged.txt'
+        path.write_bytes(b'page one\x0cpage two\nlast')
+        observation = execute_file_action([
+            {'type': 'read', 'path': str(path)},
+            {'type': 'add_lines', 'path': str(path), 'lines': ['middle'], 'position': 1},
+            {'type': 'read', 'path': str(path), 'start_line': 1},
+            # Positions before the start are clamped, as line edits clamp them
+            {'type': 'add_lines', 'path': str(path), 'lines': ['first'], 'position': -5},
+        ])
+        assert path.read_bytes() == b'first\npage one\x0cpage two\nmiddle\nlast'
+        by_lines = observation.observations[1]
+        assert (by_lines.content, by_lines.start_line, by_lines.total_lines) == ('middle\nlast', 1, 3)
+
+    def test_negative_positions_after_a_write(self, tmp_path):
+        path = tmp_path / 'module.py'
+        execute_file_action([
+            {'type': 'write', 'path': str(path), 'content': 'a\nb\n'},
+            {'type': 'add_lines', 'path': str(path), 'lines': ['top'], 'position': -1},
+            {'type': 'remove_lines', 'path': str(path), 'start': -3, 'end': 1},
+        ])
+        assert path.read_text() == 'a\nb\n'
+
+    def test_failure_changes_no_file(self, tmp_path):
+        path = tmp_path / 'module.py'
+        text = write_lines(path, 3)
+        with pytest.raises(FileNotFoundError):
+            execute_file_action([
+                {'type': 'add_lines', 'path': str(path), 'lines': ['x'], 'position': 0},
+                {'type': 'remove_lines', 'path': str(tmp_path / 'missing.py'), 'start': 0, 'end': 1},
+            ])
+        assert path.read_text() == text
+        assert os.listdir(tmp_path) == ['module.py']
+
+    def test_symlinked_files(self, tmp_path):
+        target, link, other = tmp_path / 'real.txt', tmp_path / 'link.txt', tmp_path / 'other.txt'
+        write_lines(target, 2)
+        link.symlink_to(target)
+        execute_file_action([
+            {'type': 'add_lines', 'path': str(link), 'lines': ['new'], 'position': 1},
+            # The same file under its own name, in the numbering the edit through the link left
+            {'type': 'remove_lines', 'path': str(target), 'start': 0, 'end': 1},
+            {'type': 'write', 'path': str(other), 'content': 'other\n'},
+        ])
+        assert link.is_symlink()
+        assert target.read_text() == 'new\nline 1\n'
+
+    def test_rollback_restores_symlink_target(self, tmp_path, monkeypatch):
+        target, link, other = tmp_path / 'real.txt', tmp_path / 'link.txt', tmp_path / 'other.txt'
+        write_lines(target, 2)
+        write_lines(other, 2)
+        link.symlink_to(target)
+        real_replace = os.replace
+
+        def failing_replace(source, destination):
+            if str(destination) == str(other) and source.endswith('.tmp'):
+                raise OSError('disk full')
+            real_replace(source, destination)
+
+        monkeypatch.setattr(file_batch.os, 'replace', failing_replace)
+        with pytest.raises(OSError):
+            execute_file_action([
+                {'type': 'write', 'path': str(link), 'content': 'new\n'},
+                {'type': 'write', 'path': str(other), 'content': 'new\n'},
+            ])
+        assert link.is_symlink()
+        assert target.read_text() == other.read_text() == 'line 0\nline 1\n'
+        assert sorted(os.listdir(tmp_path)) == ['link.txt', 'other.txt', 'real.txt']
+
+    def test_rollback_when_a_rename_fails(self, tmp_path, monkeypatch):
+        paths = [tmp_path / f'{name}.py' for name in 'abc']
+        for path in paths:
+            write_lines(path, 3)
+        real_replace = os.replace
+        renamed = []
+
+        def failing_replace(source, destination):
+            if str(destination) == str(paths[2]) and source.endswith('.tmp') and len(renamed) == 2:
+                raise OSError('disk full')
+            renamed.append(destination)
+            real_replace(source, destination)
+
+        monkeypatch.setattr(file_batch.os, 'replace', failing_replace)
+        with pytest.raises(OSError):
+            execute_file_action([{'type': 'write', 'path': str(path), 'content': 'new\n'} for path in paths])
+        assert [path.read_text() for path in paths] == ['line 0\nline 1\nline 2\n'] * 3
+        assert sorted(os.listdir(tmp_path)) == ['a.py', 'b.py', 'c.py']
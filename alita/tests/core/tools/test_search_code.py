@@ -0,0 +1,111 @@
+"""Tests for the trigram code index and the search_code tool."""
+import os
+
+import pytest
+
+from alita.core.tool_executor import ToolExecutor
+from alita.core.tools.code_index import CodeIndex, required_trigrams
+from alita.core.tools.files.file_action_executor import execute_file_action
+from alita.core.tools.files.file_tools import add_lines, edit_file
+from alita.core.tools.search_code import search_code
+
+
+@pytest.fixture
+def tree(tmp_path):
+    (tmp_path / 'pkg').mkdir()
+    (tmp_path / 'pkg' / 'app.py').write_text('def main():\n    run_server(port=8080)\n\n\ndef run_server(port):\n    pass\n')
+    (tmp_path / 'pkg' / 'util.py').write_text('RETRIES = 3\n')
+    (tmp_path / 'image.png').write_bytes(b'\x89PNG\r\n\x1a\n\x00\x00run_server')
+    (tmp_path / 'node_modules').mkdir()
+    (tmp_path / 'node_modules' / 'dep.js').write_text('run_server()\n')
+    return tmp_path
+
+
+def test_required_trigrams():
+    assert required_trigrams('Port', regex=False) == {'por', 'ort'}
+    # Literal runs of the regex, including inside groups and required repeats
+    assert required_trigrams(r'def (run)_\w+\(', regex=True) == {'def', 'ef ', 'run'}
+    assert required_trigrams(r'a|bcd', regex=True) == set()
+    assert required_trigrams(r'(abc)?', regex=True) == set()
+
+
+def test_literal_and_regex_search(tree):
+    index = CodeIndex(str(tree))
+    result = index.search('run_server')
+    assert [(os.path.basename(hit.path), hit.line_number) for hit in result.hits] == [('app.py', 2), ('app.py', 5)]
+    # Only app.py has every trigram of the query
+    assert result.candidates == 1
+    assert len(index) == 2
+    result = index.search(r'retries\s*=\s*\d', regex=True, ignore_case=True)
+    assert [hit.line for hit in result.hits] == ['RETRIES = 3']
+
+
+def test_limit_and_context(tree):
+    index = CodeIndex(str(tree))
+    result = index.search('run_server', max_results=1, context_lines=1)
+    assert result.truncated
+    hit, = result.hits
+    assert hit.before == [(1, 'def main():')]
+    assert hit.after == [(3, '')]
+
+
+def test_rescan_picks_up_changes(tree):
+    index = CodeIndex(str(tree), refresh_interval=0)
+    assert not index.search('timeout').hits
+    (tree / 'pkg' / 'util.py').write_text('RETRIES = 3\ntimeout = 10\n')
+    (tree / 'pkg' / 'app.py').unlink()
+    # The search starts a rescan in the background instead of waiting for one
+    index.search('timeout')
+    index.wait_for_rescan()
+    assert [hit.line for hit in index.search('timeout').hits] == ['timeout = 10']
+    assert not index.search('run_server').hits
+    index.wait_for_rescan()
+    assert index.refresh(force=True) == 0
+
+
+def test_search_does_not_walk_the_tree(tree, monkeypatch):
+    index = CodeIndex(str(tree), refresh_interval=60)
+    index.search('run_server')
+    walks = []
+    walk = index._walk
+    monkeypatch.setattr(index, '_walk', lambda: walks.append(1) or walk())
+    (tree / 'pkg' / 'util.py').write_text('timeout = 10\n')
+    assert not index.search('timeout').hits
+    assert not walks
+    # As reported after a bash command that ran there
+    index.mark_stale(str(tree / 'pkg'))
+    index.wait_for_rescan()
+    assert walks == [1]
+    assert [hit.line for hit in index.search('timeout').hits] == ['timeout = 10']
+
+
+def test_search_code_tool(tree, monkeypatch):
+    monkeypatch.chdir(tree)
+    # Overlapping context is merged into one group
+    observation = search_code('run_server', path='pkg', context_lines=1)
+    assert observation.content.splitlines() == [
+        'pkg/app.py-1-def main():',
+        'pkg/app.py:2:    run_server(port=8080)',
+        'pkg/app.py-3-',
+        'pkg/app.py-4-',
+        'pkg/app.py:5:def run_server(port):',
+        'pkg/app.py-6-    pass',
+    ]
+    assert str(observation).startswith("[Search for 'run_server' found 2 matching lines.]")
+
+
+async def test_edit_then_search_immediately(tree, monkeypatch):
+    monkeypatch.chdir(tree)
+    assert search_code('run_server').matches == 2
+    # Well within the index's rescan interval
+    edit_file(str(tree / 'pkg' / 'util.py'), 'RETRIES = 3\nrun_server(port=1)\n')
+    add_lines(str(tree / 'pkg' / 'new.py'), ['run_server()'], position=0)
+    execute_file_action([{'type': 'remove_lines', 'path': str(tree / 'pkg' / 'app.py'), 'start': 0, 'end': 2}])
+    assert search_code('run_server').content.splitlines() == [
+        'pkg/app.py:3:def run_server(port):', 'pkg/new.py:1:run_server()', 'pkg/util.py:2:run_server(port=1)',
+    ]
+    observations = await ToolExecutor().execute_many([
+        ('execute_file_action', {'action': {'type': 'write', 'path': str(tree / 'late.py'), 'content': 'late_name\n'}}),
+        ('search_code', {'query': 'late_name'}),
+    ])
+    assert observations[1].content == 'late.py:1:late_name'
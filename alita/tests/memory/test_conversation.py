@@ -0,0 +1,85 @@
+"""Tests for the Conversation message history and its compaction."""
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+from alita.core.tools.files.file_observations import FileReadObservation
+from alita.core.tools.files.observation import Observation
+from alita.memory.compaction import SUMMARY_HEADER, CompactionConfig, ContextCompactor
+from alita.memory.conversation import Conversation
+
+
+class TestConversation:
+    """Test cases for Conversation."""
+
+    def test_messages_keep_their_types_and_order(self):
+        conversation = Conversation()
+        conversation.add_system("system")
+        conversation.add_user("Task: x")
+        conversation.add_assistant(AIMessage(content="", tool_calls=[{"name": "t", "args": {}, "id": "call_1"}]))
+        conversation.add_tool_result("t", Observation(content="out"), tool_call_id="call_1")
+
+        messages = conversation.render()
+        assert [type(m) for m in messages] == [SystemMessage, HumanMessage, AIMessage, ToolMessage]
+        assert messages[3].tool_call_id == "call_1"
+        assert messages[3].artifact == Observation(content="out")
+
+    def test_tool_result_without_id_is_a_user_message(self):
+        conversation = Conversation()
+        message = conversation.add_tool_result("t", "out")
+        assert isinstance(message, HumanMessage)
+        assert message.content == "EXECUTION RESULT of [t]:\nout"
+
+    def test_take_delta_returns_only_new_messages(self):
+        conversation = Conversation()
+        conversation.add_system("system")
+        conversation.add_user("Task: x")
+        assert [m.content for m in conversation.take_delta()] == ["system", "Task: x"]
+        conversation.add_user("more")
+        assert [m.content for m in conversation.take_delta()] == ["more"]
+        assert conversation.take_delta() == []
+
+
+class TestContextCompactor:
+    """Test cases for ContextCompactor."""
+
+    def _run_turns(self, conversation, compactor, turns):
+        for turn in range(turns):
+            call_id = f"call_{turn}"
+            conversation.add_assistant(AIMessage(content="", tool_calls=[
+                {"name": "execute_file_action", "args": {"action": {"type": "read", "path": f"/f{turn}"}}, "id": call_id},
+            ]))
+            observation = FileReadObservation(path=f"/f{turn}", content="x" * 4000)
+            conversation.add_tool_result("execute_file_action", observation, tool_call_id=call_id)
+            compactor.compact(conversation)
+
+    def test_large_results_are_stubbed_first(self):
+        conversation = Conversation()
+        conversation.add_system("system")
+        conversation.add_user("Task: x")
+        compactor = ContextCompactor(CompactionConfig(max_tokens=4000, target_tokens=3500, keep_recent_turns=2))
+        self._run_turns(conversation, compactor, 4)
+
+        assert conversation.total_tokens <= 4000
+        stub = conversation.messages[3]
+        assert isinstance(stub, ToolMessage) and stub.tool_call_id == "call_0"
+        assert stub.content.startswith("[Contents of /f0 (")
+        assert conversation.messages[-1].artifact.content == "x" * 4000
+
+    def test_prompt_stays_bounded_and_pairs_stay_intact(self):
+        conversation = Conversation()
+        conversation.add_system("system")
+        conversation.add_user("Task: x")
+        compactor = ContextCompactor(CompactionConfig(max_tokens=3000, keep_recent_turns=2, max_summary_lines=6))
+        self._run_turns(conversation, compactor, 100)
+
+        assert conversation.total_tokens <= 3000
+        messages = conversation.messages
+        assert [m.content for m in messages[:2]] == ["system", "Task: x"]
+        assert messages[2].content.startswith(SUMMARY_HEADER)
+        summary_lines = messages[2].content.split("\n")
+        evicted_turns = 100 - sum(isinstance(m, AIMessage) for m in messages)
+        assert summary_lines[1] == f"[{2 * evicted_turns - 6} older lines omitted]"
+        assert len(summary_lines) == 2 + 6
+        for index, message in enumerate(messages):
+            if isinstance(message, ToolMessage):
+                assert messages[index - 1].tool_calls[0]["id"] == message.tool_call_id
+        assert messages[-1].tool_call_id == "call_99"
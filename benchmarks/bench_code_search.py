@@ -0,0 +1,113 @@
+"""
+Code search on a large tree: trigram index versus a fresh grep per query.
+
+Generates a tree of small source files, builds the index once, then times
+queries against the warm index, a metadata rescan with nothing changed, and
+``grep -rn`` started anew for every query, as the agent did through bash.
+Agent searches are usually more than the refresh interval apart, so each one
+starts a background rescan. The "after interval" rows time such searches: the
+search alone, running while the previous search's rescan walks the tree, and
+the search together with the rescan it starts. The page cache is warm for
+both; grep still has to read every file.
+
+Usage:
+    python -m benchmarks.bench_code_search [--files 100000] [--queries 20]
+"""
+import argparse
+import os
+import random
+import subprocess
+import tempfile
+import time
+
+from alita.core.tools.code_index import CodeIndex
+
+
+WORDS = (
+    "handler", "request", "response", "session", "config", "stream", "event", "buffer", "worker", "client",
+    "server", "parse", "render", "index", "cache", "token", "retry", "timeout", "queue", "result",
+)
+
+
+def make_tree(root: str, files: int, rng: random.Random) -> list:
+    """Write ``files`` modules of ~20 lines; returns the rare identifiers planted in a few of them."""
+    planted = [f"needle_{i:04d}" for i in range(50)]
+    for number in range(files):
+        directory = os.path.join(root, f"pkg{number // 1000:03d}")
+        os.makedirs(directory, exist_ok=True)
+        lines = []
+        for _ in range(6):
+            name = "_".join(rng.sample(WORDS, 2))
+            lines.append(f"def {name}_{rng.randrange(1000)}(self, {rng.choice(WORDS)}):")
+            lines.append(f"    return self.{rng.choice(WORDS)}.{rng.choice(WORDS)}({rng.randrange(100)})")
+            lines.append("")
+        if number % (files // len(planted) or 1) == 0 and planted:
+            lines.append(f"{planted[number * len(planted) // files]} = True")
+        with open(os.path.join(directory, f"module_{number}.py"), "w") as f:
+            f.write("\n".join(lines) + "\n")
+    return planted
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--files", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as root:
+        start = time.perf_counter()
+        planted = make_tree(root, args.files, rng)
+        print(f"{args.files} files written in {time.perf_counter() - start:.1f}s")
+
+        index = CodeIndex(root)
+        start = time.perf_counter()
+        index.refresh(force=True)
+        print(f"index built in {time.perf_counter() - start:.1f}s ({len(index)} files)")
+        start = time.perf_counter()
+        index.refresh(force=True)
+        print(f"rescan, nothing changed: {time.perf_counter() - start:.2f}s")
+
+        queries = [(rng.choice(planted), False) for _ in range(args.queries // 2)]
+        queries += [(rf"{rng.choice(planted)}\s*=", True) for _ in range(args.queries - len(queries))]
+
+        start = time.perf_counter()
+        indexed_hits = 0
+        for query, regex in queries:
+            indexed_hits += len(index.search(query, regex=regex, max_results=1000).hits)
+        indexed = (time.perf_counter() - start) / len(queries)
+
+        # Every search finds the last rescan older than the interval, as after an agent's turn,
+        # and starts one; the next search runs while it walks the tree
+        index.refresh_interval = 0
+        searching = 0.0
+        for query, regex in queries:
+            query_start = time.perf_counter()
+            index.search(query, regex=regex, max_results=1000)
+            searching += time.perf_counter() - query_start
+        index.wait_for_rescan()
+        contended = searching / len(queries)
+        start = time.perf_counter()
+        for query, regex in queries:
+            index.search(query, regex=regex, max_results=1000)
+            index.wait_for_rescan()
+        rescanned = (time.perf_counter() - start) / len(queries)
+
+        start = time.perf_counter()
+        grep_hits = 0
+        for query, regex in queries:
+            flag = "-E" if regex else "-F"
+            pattern = query.replace(r"\s", "[[:space:]]") if regex else query
+            output = subprocess.run(["grep", "-rn", flag, pattern, root], capture_output=True, text=True).stdout
+            grep_hits += len(output.splitlines())
+        grep = (time.perf_counter() - start) / len(queries)
+
+        print(f"{len(queries)} queries, {indexed_hits} hits indexed / {grep_hits} hits grep")
+        print(f"  index search                  {indexed * 1e3:9.2f} ms/query")
+        print(f"  after interval, during rescan {contended * 1e3:9.2f} ms/query")
+        print(f"  after interval, plus rescan   {rescanned * 1e3:9.2f} ms/query")
+        print(f"  grep -rn                      {grep * 1e3:9.2f} ms/query")
+
+
+if __name__ == "__main__":
+    main()
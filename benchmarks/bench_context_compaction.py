@@ -0,0 +1,98 @@
+"""
+Prompt size over a scripted 100-turn agent run, with and without compaction.
+
+The model is scripted to read a large file and run a command with long output
+on alternate turns, then finish. Tools are fakes, so no network, tmux or disk
+is involved.
+
+Usage:
+    python -m benchmarks.bench_context_compaction [--turns 100] [--max-tokens 48000]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import time
+
+from langchain_core.messages.ai import AIMessage
+
+from alita.core.coding_agent import CodingAgent
+from alita.core.tool_executor import ToolExecutor
+from alita.core.tools.bash_observations import BashObservation
+from alita.core.tools.files.file_observations import FileReadObservation
+from alita.core.tools.finish import finish
+from alita.memory.compaction import CompactionConfig, ContextCompactor
+from alita.memory.conversation import estimate_tokens, message_text
+
+
+def fake_read(action):
+    return FileReadObservation(path=action["path"], content="def f():\n    return 1\n" * 800)
+
+
+def fake_bash(command: str):
+    return BashObservation(content="log line\n" * 1500, command=command, exit_code=0, error=None)
+
+
+REGISTRY = {"execute_file_action": fake_read, "execute_bash_command_tmux": fake_bash, "finish": finish}
+
+
+class ScriptedModelClient:
+    """Plays back a fixed sequence of tool calls and records the prompt size of every call."""
+
+    def __init__(self, turns: int) -> None:
+        self.turns = turns
+        self.prompt_tokens = []
+        self.prompt_messages = []
+
+    def bind_tools(self, tools):
+        return self
+
+    async def ainvoke(self, messages):
+        turn = len(self.prompt_tokens)
+        self.prompt_tokens.append(sum(estimate_tokens(message_text(m)) for m in messages))
+        self.prompt_messages.append(len(messages))
+        if turn >= self.turns - 1:
+            call = {"name": "finish", "args": {"message": "done", "task_completed": "true"}}
+        elif turn % 2:
+            call = {"name": "execute_bash_command_tmux", "args": {"command": f"make test-{turn}"}}
+        else:
+            call = {"name": "execute_file_action", "args": {"action": {"type": "read", "path": f"/src/module_{turn}.py"}}}
+        return AIMessage(content=f"Step {turn}: looking further.", tool_calls=[{**call, "id": f"call_{turn}"}])
+
+
+async def run(turns: int, max_tokens: int) -> ScriptedModelClient:
+    client = ScriptedModelClient(turns)
+    agent = CodingAgent(
+        model_client=client,
+        tools=[finish],
+        tool_executor=ToolExecutor(registry=REGISTRY),
+        compactor=ContextCompactor(CompactionConfig(max_tokens=max_tokens)),
+    )
+    await agent.run("Investigate the code base and explain the execution flow.")
+    return client
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--turns", type=int, default=100)
+    parser.add_argument("--max-tokens", type=int, default=48000)
+    args = parser.parse_args()
+
+    results = {}
+    for label, budget in (("uncompacted", 10 ** 12), ("compacted", args.max_tokens)):
+        start = time.perf_counter()
+        # the agent prints a line per iteration
+        with contextlib.redirect_stdout(io.StringIO()):
+            results[label] = asyncio.run(run(args.turns, budget))
+        print(f"{label:>12}: {time.perf_counter() - start:.2f}s for {args.turns} turns")
+
+    print(f"\n{'turn':>6} {'uncompacted tokens':>20} {'compacted tokens':>18} {'compacted messages':>20}")
+    plain, compacted = results["uncompacted"], results["compacted"]
+    for turn in list(range(0, args.turns, 10)) + [args.turns - 1]:
+        print(f"{turn + 1:>6} {plain.prompt_tokens[turn]:>20} {compacted.prompt_tokens[turn]:>18} {compacted.prompt_messages[turn]:>20}")
+    print(f"\nmax prompt: uncompacted {max(plain.prompt_tokens)} tokens, "
+          f"compacted {max(compacted.prompt_tokens)} tokens (budget {args.max_tokens})")
+
+
+if __name__ == "__main__":
+    main()
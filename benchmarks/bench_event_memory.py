@@ -0,0 +1,80 @@
+"""
+Memory held by 100k events and 100k observations, slotted versus plain dataclasses.
+
+The plain versions are rebuilt from the same fields without slots, so each
+instance carries a __dict__ as the classes did before. Large payloads are
+shared between instances, as they are when an observation is passed around,
+so the numbers are the per-object overhead.
+
+Usage:
+    python -m benchmarks.bench_event_memory [--count 100000]
+"""
+import argparse
+import dataclasses
+import gc
+import tracemalloc
+
+from alita.core.events.event_stream import EventPayload, PublishEvent, Topic
+from alita.core.tools.bash_observations import BashObservation
+from alita.core.tools.files.file_observations import FileEditObservation, FileReadObservation
+
+
+def unslotted(cls):
+    """A plain dataclass with the same fields as ``cls``."""
+    fields = []
+    for field in dataclasses.fields(cls):
+        if field.default is not dataclasses.MISSING:
+            fields.append((field.name, field.type, dataclasses.field(default=field.default)))
+        else:
+            fields.append((field.name, field.type))
+    return dataclasses.make_dataclass(f"Plain{cls.__name__}", fields)
+
+
+def measure(factory, count: int) -> int:
+    """Bytes allocated by ``count`` objects from ``factory``."""
+    gc.collect()
+    tracemalloc.start()
+    objects = [factory(i) for i in range(count)]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+    return size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--count", type=int, default=100000)
+    args = parser.parse_args()
+
+    topic = Topic('agent.coder.observation')
+    payload = EventPayload(content='x' * 256)
+    file_text = 'line of code\n' * 2000
+    output = 'log line\n' * 500
+
+    cases = {
+        "PublishEvent": lambda cls: lambda i: cls(topic=topic, payload=payload, sender='coder'),
+        "BashObservation": lambda cls: lambda i: cls(content=output, command='make test', exit_code=0, error=None),
+        "FileReadObservation": lambda cls: lambda i: cls(content=file_text, path='/src/module.py'),
+        "FileEditObservation": lambda cls: lambda i: cls(
+            content=file_text, path='/src/module.py', prev_exist=True, old_content=file_text, new_content=file_text
+        ),
+    }
+    classes = {
+        "PublishEvent": PublishEvent,
+        "BashObservation": BashObservation,
+        "FileReadObservation": FileReadObservation,
+        "FileEditObservation": FileEditObservation,
+    }
+    print(f"{'type':<22} {'plain MB':>9} {'slotted MB':>11} {'bytes/obj':>18}")
+    for name, make in cases.items():
+        cls = classes[name]
+        plain = measure(make(unslotted(cls)), args.count)
+        slotted = measure(make(cls), args.count)
+        print(
+            f"{name:<22} {plain / 1e6:>9.1f} {slotted / 1e6:>11.1f} "
+            f"{plain // args.count:>8} -> {slotted // args.count:<6}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+EventStream idle CPU and publish-to-dispatch latency.
+
+Idle CPU is measured over a set of started streams with nothing to do, once with
+the old dispatcher that polled its queue every 100ms and once with the current
+one. Latency is measured by publishing at a fixed rate and timing each event from
+publish_event() to the start of process_event(). Burst throughput compares
+publish_event() with per-event delivery against publish_many() with process_batch().
+
+Usage:
+    python -m benchmarks.bench_event_stream [--streams 200] [--idle-seconds 2] [--rates 1000 10000 100000] [--burst 100000]
+"""
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+
+from alita.core.events.event_stream import EventPayload, EventStream, PublishEvent, Topic
+
+
+TOPIC = Topic('bench')
+
+
+class PollingEventStream(EventStream):
+    """The dispatcher loop as it was: wait_for(queue.get(), 0.1) to check the stop flag."""
+
+    async def _process_event(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                event = await asyncio.wait_for(self._event_queue.get(), timeout=0.1)
+            except asyncio.TimeoutError:
+                continue
+            await self._dispatch(event)
+
+
+class LatencyProcessor:
+    def __init__(self) -> None:
+        self.published_at = {}
+        self.latencies = []
+
+    async def process_event(self, event) -> None:
+        self.latencies.append(time.perf_counter() - self.published_at.pop(id(event)))
+
+
+async def measure_idle(stream_class, streams: int, seconds: float) -> tuple:
+    """Return (CPU seconds used while idle, seconds stop() took)."""
+    event_streams = [stream_class() for _ in range(streams)]
+    for stream in event_streams:
+        stream.register_processor(LatencyProcessor(), [TOPIC])
+        await stream.start()
+    await asyncio.sleep(0.2)
+    cpu_start = time.process_time()
+    await asyncio.sleep(seconds)
+    cpu = time.process_time() - cpu_start
+    stop_start = time.perf_counter()
+    await asyncio.gather(*(stream.stop() for stream in event_streams))
+    return cpu, time.perf_counter() - stop_start
+
+
+async def measure_latency(rate: int, seconds: float) -> tuple:
+    """Publish ``rate`` events/s for ``seconds``; return (latencies, achieved events/s)."""
+    stream = EventStream()
+    processor = LatencyProcessor()
+    stream.register_processor(processor, [TOPIC])
+    await stream.start()
+    tick = 0.001
+    per_tick = max(1, round(rate * tick))
+    total = int(rate * seconds)
+    start = time.perf_counter()
+    published = 0
+    while published < total:
+        for _ in range(min(per_tick, total - published)):
+            event = PublishEvent(topic=TOPIC, payload=EventPayload(content=''), sender='bench')
+            processor.published_at[id(event)] = time.perf_counter()
+            await stream.publish_event(event)
+            published += 1
+        # Pace to the target rate; sleeping also lets the dispatcher run.
+        delay = start + published / rate - time.perf_counter()
+        await asyncio.sleep(max(0.0, delay))
+    await stream.stop_when_idle()
+    return processor.latencies, published / (time.perf_counter() - start)
+
+
+class CountingProcessor:
+    def __init__(self) -> None:
+        self.count = 0
+
+    async def process_event(self, event) -> None:
+        self.count += 1
+
+
+class BatchCountingProcessor(CountingProcessor):
+    async def process_batch(self, events) -> None:
+        self.count += len(events)
+
+
+async def measure_burst(events: int, batched: bool) -> float:
+    """Return events/s for publishing ``events`` at once and processing all of them."""
+    stream = EventStream()
+    processor = BatchCountingProcessor() if batched else CountingProcessor()
+    stream.register_processor(processor, [TOPIC])
+    await stream.start()
+    burst = [PublishEvent(topic=TOPIC, payload=EventPayload(content=''), sender='bench') for _ in range(events)]
+    start = time.perf_counter()
+    if batched:
+        await stream.publish_many(burst)
+    else:
+        for event in burst:
+            await stream.publish_event(event)
+    await stream.stop_when_idle()
+    assert processor.count == events
+    return events / (time.perf_counter() - start)
+
+
+def percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def run(args) -> None:
+    print(f"Idle CPU, {args.streams} streams for {args.idle_seconds:.1f}s")
+    for name, stream_class in (("polling (100ms wait_for)", PollingEventStream), ("wake-on-event", EventStream)):
+        cpu, stop_time = await measure_idle(stream_class, args.streams, args.idle_seconds)
+        print(f"  {name:<26} cpu {cpu * 1000:8.1f} ms   stop {stop_time * 1000:7.1f} ms")
+
+    print(f"\nPublish-to-dispatch latency, {args.latency_seconds:.1f}s per rate")
+    print(f"  {'target/s':>10} {'achieved/s':>11} {'p50 us':>9} {'p99 us':>9} {'max us':>9}")
+    for rate in args.rates:
+        latencies, achieved = await measure_latency(rate, args.latency_seconds)
+        print(
+            f"  {rate:>10} {achieved:>11.0f} {statistics.median(latencies) * 1e6:>9.1f} "
+            f"{percentile(latencies, 0.99) * 1e6:>9.1f} {max(latencies) * 1e6:>9.1f}"
+        )
+
+    print(f"\nBurst of {args.burst} events")
+    for name, batched in (("publish_event + process_event", False), ("publish_many + process_batch", True)):
+        print(f"  {name:<31} {await measure_burst(args.burst, batched):>10.0f} events/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--streams", type=int, default=200)
+    parser.add_argument("--idle-seconds", type=float, default=2.0)
+    parser.add_argument("--latency-seconds", type=float, default=1.0)
+    parser.add_argument("--rates", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--burst", type=int, default=100000)
+    args = parser.parse_args()
+    # Keep per-event logging out of the measurements
+    logging.getLogger("alita.core.events.event_stream").setLevel(logging.WARNING)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
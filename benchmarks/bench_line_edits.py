@@ -0,0 +1,84 @@
+"""
+Line edits on a large file: splice engine versus the old whole-file rewrite.
+
+The baseline is what add_lines/remove_lines used to do: read the file,
+splitlines(), insert into or delete from the list, join and write it back.
+The splice engine copies unchanged bytes from an mmap into a temp file and
+renames it over the original. Peak Python allocations are measured with
+tracemalloc; the mmap itself is not a Python allocation.
+
+Usage:
+    python -m benchmarks.bench_line_edits [--size-mb 100] [--edits 100]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from alita.core.tools.files.line_edits import LineEdit, apply_line_edits
+
+
+def make_file(path: str, size_mb: int) -> int:
+    line = b'2024-01-01T00:00:00 INFO request handled in 12ms by worker 7\n'
+    count = size_mb * 1024 * 1024 // len(line)
+    with open(path, 'wb') as f:
+        for _ in range(count // 10000):
+            f.write(line * 10000)
+        f.write(line * (count % 10000))
+    return count
+
+
+def rewrite_whole_file(path: str, edits) -> None:
+    with open(path, 'r', encoding='utf-8') as f:
+        file_lines = f.read().splitlines()
+    # Apply from the bottom so earlier line numbers stay valid
+    for edit in sorted(edits, key=lambda edit: edit.start, reverse=True):
+        file_lines[edit.start:edit.end] = edit.lines
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(file_lines))
+
+
+def measure(function, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    function(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--size-mb", type=int, default=100)
+    parser.add_argument("--edits", type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'big.log')
+        lines = make_file(path, args.size_mb)
+        rng = random.Random(0)
+        starts = sorted(rng.sample(range(0, lines - 2, 3), args.edits))
+        cases = {
+            "1 insert": [LineEdit.insert(lines // 2, ['inserted line'])],
+            "1 delete": [LineEdit.delete(lines // 2, lines // 2 + 1)],
+            f"{args.edits} mixed edits": [
+                LineEdit(start, start + 1, ['replaced']) if i % 2 else LineEdit.insert(start, ['inserted'])
+                for i, start in enumerate(starts)
+            ],
+        }
+        print(f"{args.size_mb} MB, {lines} lines")
+        print(f"{'case':<18} {'rewrite s':>10} {'peak MB':>8} {'splice s':>9} {'peak MB':>8}")
+        for name, edits in cases.items():
+            rewrite_time, rewrite_peak = measure(rewrite_whole_file, path, edits)
+            splice_time, splice_peak = measure(apply_line_edits, path, edits)
+            print(
+                f"{name:<18} {rewrite_time:>10.3f} {rewrite_peak / 1e6:>8.1f} "
+                f"{splice_time:>9.3f} {splice_peak / 1e6:>8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Topic routing cost with thousands of wildcard subscriptions.
+
+Builds an index of agent subscriptions (exact, ``*`` and ``#`` patterns) and
+times match() for concrete topics on a cold cache and on a warm one.
+
+Usage:
+    python -m benchmarks.bench_topic_index [--agents 1000] [--lookups 200000]
+"""
+import argparse
+import random
+import time
+
+from alita.core.events.topic_index import TopicIndex
+
+
+KINDS = ("observation", "action", "status", "log")
+
+
+def build_index(agents: int) -> TopicIndex:
+    index = TopicIndex()
+    for agent in range(agents):
+        index.add(f"agent.{agent}.observation", f"agent-{agent}")
+        index.add(f"agent.{agent}.action", f"agent-{agent}")
+        index.add(f"team.{agent % 50}.#", f"team-{agent % 50}")
+    index.add("agent.*.status", "monitor")
+    index.add("#.log", "logger")
+    return index
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--agents", type=int, default=1000)
+    parser.add_argument("--lookups", type=int, default=200000)
+    args = parser.parse_args()
+
+    index = build_index(args.agents)
+    rng = random.Random(0)
+    topics = [f"agent.{rng.randrange(args.agents)}.{rng.choice(KINDS)}" for _ in range(args.lookups)]
+    distinct = list(dict.fromkeys(topics))
+
+    start = time.perf_counter()
+    for topic in distinct:
+        index.match(topic)
+    cold = (time.perf_counter() - start) / len(distinct)
+
+    start = time.perf_counter()
+    for topic in topics:
+        index.match(topic)
+    warm = (time.perf_counter() - start) / len(topics)
+
+    print(f"{len(index)} subscriptions, {len(distinct)} distinct topics")
+    print(f"  uncached match  {cold * 1e6:7.2f} us/lookup")
+    print(f"  cached match    {warm * 1e6:7.2f} us/lookup")
+
+
+if __name__ == "__main__":
+    main()